@@ -1,6 +1,4 @@
-from .end_model import EndModel
-from .label_model import LabelModel, MajorityClassVoter, MajorityLabelVoter, RandomVoter
-from .tuners import RandomSearchTuner
+from metal.lazy_imports import lazy_attributes
 
 __all__ = [
     "EndModel",
@@ -12,3 +10,16 @@ __all__ = [
 ]
 
 __version__ = "0.4.1"
+
+# The models (and torch) are only imported when first used
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "EndModel": ".end_model",
+        "LabelModel": ".label_model",
+        "MajorityClassVoter": ".label_model",
+        "MajorityLabelVoter": ".label_model",
+        "RandomVoter": ".label_model",
+        "RandomSearchTuner": ".tuners",
+    },
+)
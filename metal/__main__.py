@@ -0,0 +1,3 @@
+from metal.cli import main
+
+main()
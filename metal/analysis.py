@@ -2,7 +2,6 @@ from collections import Counter, defaultdict
 
 import numpy as np
 import scipy.sparse as sparse
-from pandas import DataFrame, Series
 
 from metal.utils import arraylike_to_numpy
 
@@ -140,6 +139,8 @@ def lf_summary(L, Y=None, lf_names=None, est_accs=None):
         Y: an [n] or [n, 1] np.ndarray of gold labels.
             If provided, the empirical accuracy for each LF will be calculated
     """
+    from pandas import DataFrame, Series
+
     n, m = L.shape
     if lf_names is not None:
         col_names = ["j"]
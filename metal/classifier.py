@@ -1,5 +1,7 @@
+import copy
 import os
 import random
+import sys
 import warnings
 
 import numpy as np
@@ -7,27 +9,61 @@ import torch
 import torch.nn as nn
 import torch.optim as optim
 from scipy.sparse import issparse
-from torch.utils.data import DataLoader, Dataset, TensorDataset
+from torch.utils.data import DataLoader, Dataset, RandomSampler, TensorDataset
+from torch.utils.data.distributed import DistributedSampler
 
 from metal.analysis import confusion_matrix
-from metal.logging import Checkpointer, Logger, LogWriter, TensorBoardWriter
+from metal.distributed import (
+    all_reduce_gradients,
+    broadcast_flag,
+    broadcast_lr,
+    is_distributed,
+    synchronize,
+    train_distributed,
+)
+from metal.logging import (
+    AsyncEvaluator,
+    Checkpointer,
+    Logger,
+    LogWriter,
+    TensorBoardWriter,
+)
 from metal.metrics import metric_score
-from metal.utils import place_on_gpu, recursive_merge_dicts
-
-# Import tqdm_notebook if in Jupyter notebook
-try:
-    from IPython import get_ipython
-
-    if "IPKernelApp" not in get_ipython().config:
-        raise ImportError("console")
-except (AttributeError, ImportError):
-    from tqdm import tqdm
-else:
-    # Only use tqdm notebook if not in travis testing
-    if "CI" not in os.environ:
-        from tqdm import tqdm_notebook as tqdm
-    else:
+from metal.serialization import is_model_file, load_model, save_model
+from metal.utils import (
+    MetalDataset,
+    TensorBatchLoader,
+    autocast,
+    inference_mode,
+    num_rows,
+    place_on_gpu,
+    recursive_merge_dicts,
+    sparse_collate_fn,
+    sparse_to_torch,
+)
+
+
+def _get_tqdm():
+    """Returns tqdm_notebook if in a Jupyter notebook, else tqdm"""
+    # A notebook kernel has always imported IPython already, so don't pay for
+    # importing it otherwise
+    try:
+        if "IPython" not in sys.modules:
+            raise ImportError("console")
+        from IPython import get_ipython
+
+        if "IPKernelApp" not in get_ipython().config:
+            raise ImportError("console")
+    except (AttributeError, ImportError):
         from tqdm import tqdm
+    else:
+        # Only use tqdm notebook if not in travis testing
+        if "CI" not in os.environ:
+            from tqdm import tqdm_notebook as tqdm
+        else:
+            from tqdm import tqdm
+    return tqdm
+
 
 global warnings_given
 warnings_given = set([])
@@ -60,6 +96,17 @@ class Classifier(nn.Module):
     # the optimizer is used
     implements_l2 = False
 
+    # The components set up for training, which are not needed for inference
+    _training_components = [
+        "optimizer",
+        "lr_scheduler",
+        "logger",
+        "checkpointer",
+        "writer",
+        "evaluator",
+        "training_state",
+    ]
+
     def __init__(self, k, config):
         super().__init__()
         self.config = config
@@ -106,6 +153,73 @@ class Classifier(nn.Module):
         else:
             return Y_p
 
+    def predict_stream(
+        self, data, break_ties="random", return_probs=False, batch_size=None, **kwargs
+    ):
+        """Yields predicted (int) labels batch by batch, with bounded memory
+
+        Args:
+            data: the unlabeled input, as either an iterable of X batches (e.g.,
+                a generator or an unlabeled DataLoader) or an in-memory X
+                (see _iter_batches())
+            break_ties: A tie-breaking policy (see Classifier._break_ties())
+            return_probs: Yield the predicted probabilities as well
+            batch_size: the batch size for splitting an in-memory X; defaults
+                to eval_batch_size
+
+        Yields:
+            Y_p: An n_b-dim np.ndarray of predictions in {1,...k} per batch
+            [Optionally: Y_s: An [n_b, k] np.ndarray of predicted probabilities]
+        """
+        for Xb in self._iter_batches(data, batch_size):
+            yield self.predict(
+                Xb, break_ties=break_ties, return_probs=return_probs, **kwargs
+            )
+
+    def predict_proba_stream(self, data, batch_size=None, **kwargs):
+        """Yields predicted probabilistic labels batch by batch, with bounded
+        memory
+
+        Args:
+            data: the unlabeled input, as either an iterable of X batches (e.g.,
+                a generator or an unlabeled DataLoader) or an in-memory X
+                (see _iter_batches())
+            batch_size: the batch size for splitting an in-memory X; defaults
+                to eval_batch_size
+
+        Yields:
+            An [n_b, k] np.ndarray of probabilities per batch
+        """
+        for Xb in self._iter_batches(data, batch_size):
+            yield self._to_numpy(self.predict_proba(Xb, **kwargs))
+
+    def _iter_batches(self, data, batch_size=None):
+        """Yields X batches from data for the predict_*stream() methods
+
+        If data is a torch.Tensor, np.ndarray, or scipy.sparse matrix, it is
+        split into batches of batch_size rows; otherwise it is iterated over.
+        Batches which are 1-element tuples or lists (e.g., as produced by a
+        DataLoader over a TensorDataset(X)) are unpacked.
+        """
+        if isinstance(data, (torch.Tensor, np.ndarray)) or issparse(data):
+            if issparse(data):
+                data = data.tocsr()
+            batch_size = batch_size or self._get_eval_batch_size()
+            batches = (
+                data[start : start + batch_size]
+                for start in range(0, num_rows(data), batch_size)
+            )
+        else:
+            batches = data
+
+        for Xb in batches:
+            if isinstance(Xb, (tuple, list)) and len(Xb) == 1:
+                Xb = Xb[0]
+            # Optionally move to device
+            if self.config["device"] != "cpu" and isinstance(Xb, torch.Tensor):
+                Xb = place_on_gpu(Xb)
+            yield Xb
+
     def score(
         self,
         data,
@@ -184,15 +298,35 @@ class Classifier(nn.Module):
 
         If valid_data is not provided, then no checkpointing or
         evaluation on the dev set will occur.
+
+        If train_config["n_procs"] > 1, training is data-parallel across that
+        many processes (see metal.distributed.train_distributed), and loss_fn
+        is recreated in each process with _get_loss_fn().
         """
+        train_config = self.config["train_config"]
+        distributed = is_distributed()
+        if train_config.get("n_procs", 1) > 1 and not distributed:
+            return train_distributed(self, train_data, valid_data, restore_state)
+        hogwild = distributed and train_config["dist_config"].get("hogwild", False)
+
         # Set model to train mode
         self.train()
-        train_config = self.config["train_config"]
 
         # Convert data to DataLoaders
+        # In distributed training, each process trains on its own shard
         train_loader = self._create_data_loader(train_data)
-        valid_loader = self._create_data_loader(valid_data)
-        epoch_size = len(train_loader.dataset)
+        if distributed:
+            train_loader = self._shard_data_loader(train_loader)
+        # There is no need to shuffle the valid split (and doing so would draw
+        # from the global RNG, e.g., on the background evaluation thread)
+        valid_loader = self._create_data_loader(
+            valid_data, batch_size=self._get_eval_batch_size(), shuffle=False
+        )
+        sampler = getattr(train_loader, "sampler", None)
+        if isinstance(sampler, DistributedSampler):
+            epoch_size = len(sampler)
+        else:
+            epoch_size = len(train_loader.dataset)
 
         # Move model to GPU
         if self.config["verbose"] and self.config["device"] != "cpu":
@@ -205,6 +339,7 @@ class Classifier(nn.Module):
         self._set_checkpointer(train_config)
         self._set_optimizer(train_config)
         self._set_scheduler(train_config)
+        self._set_evaluator(train_config)
 
         # Restore model if necessary
         if restore_state:
@@ -212,16 +347,27 @@ class Classifier(nn.Module):
         else:
             start_iteration = 0
 
+        # Optionally record the outputs of the training forward passes so that
+        # standard train metrics can be calculated online (see Logger)
+        record_hook = None
+        if self.logger.record_train_outputs:
+            record_hook = self.register_forward_hook(_record_train_outputs)
+
         # Train the model
         metrics_hist = {}  # The most recently seen value for all metrics
+        stop_early = False
+        last_iteration = start_iteration - 1
         for epoch in range(start_iteration, train_config["n_epochs"]):
+            last_iteration = epoch
+            if isinstance(sampler, DistributedSampler):
+                sampler.set_epoch(epoch)
             progress_bar = (
                 train_config["progress_bar"]
                 and self.config["verbose"]
                 and self.logger.log_unit == "epochs"
             )
 
-            t = tqdm(
+            t = _get_tqdm()(
                 enumerate(train_loader),
                 total=len(train_loader),
                 disable=(not progress_bar),
@@ -241,7 +387,9 @@ class Classifier(nn.Module):
                 self.optimizer.zero_grad()
 
                 # Forward pass to calculate the average loss per example
-                loss = loss_fn(*data)
+                self._train_outputs = None
+                with self._autocast():
+                    loss = loss_fn(*data)
                 if torch.isnan(loss):
                     msg = "Loss is NaN. Consider reducing learning rate."
                     raise Exception(msg)
@@ -249,10 +397,16 @@ class Classifier(nn.Module):
                 # Backward pass to calculate gradients
                 # Loss is an average loss per example
                 loss.backward()
+                if distributed and not hogwild:
+                    all_reduce_gradients(self)
 
                 # Perform optimizer step
                 self.optimizer.step()
 
+                # Store the outputs of this forward pass for online train metrics
+                if self._train_outputs is not None:
+                    self.logger.add_train_batch(self, self._train_outputs, data[-1])
+
                 # Calculate metrics, log, and checkpoint as necessary
                 metrics_dict = self._execute_logging(
                     train_loader, valid_loader, loss, batch_size
@@ -262,14 +416,57 @@ class Classifier(nn.Module):
                 # tqdm output
                 t.set_postfix(loss=metrics_dict["train/loss"])
 
+                # Stop early if the checkpoint metric has stopped improving
+                stop_early = bool(self.checkpointer and self.checkpointer.should_stop())
+                if distributed and not hogwild:
+                    stop_early = broadcast_flag(stop_early)
+                if stop_early:
+                    break
+
+            # In Hogwild training, the processes only synchronize between epochs
+            if hogwild:
+                stop_early = broadcast_flag(stop_early)
+            if stop_early:
+                if self.config["verbose"]:
+                    print(
+                        f"Stopping early at {self.logger.unit_total} "
+                        f"{self.logger.log_unit}: no improvement in "
+                        f"{self.checkpointer.checkpoint_metric} for "
+                        f"{self.checkpointer.patience} evaluations."
+                    )
+                break
+
             # Apply learning rate scheduler
             self._update_scheduler(epoch, metrics_hist)
+            if distributed:
+                broadcast_lr(self.optimizer)
+
+        # Don't restore the best model into the shared weights while other
+        # processes may still be updating them
+        if hogwild:
+            synchronize()
 
+        if record_hook is not None:
+            record_hook.remove()
+        self._train_outputs = None
         self.eval()
 
+        # Wait for and log any metrics still being calculated in the background
+        if self.evaluator:
+            self._deliver_async(self.evaluator.close())
+            self.evaluator = None
+
+        # Keep the state after the last epoch (e.g., to continue training from
+        # it later), since restoring the best model below overwrites it
+        self.training_state = None
+        if train_config.get("keep_training_state", False):
+            self.training_state = self._bundle_training_state(last_iteration)
+
         # Restore best model if applicable
         if self.checkpointer:
-            self.checkpointer.load_best_model(model=self)
+            if self.checkpointer.checkpoint_best:
+                self.checkpointer.load_best_model(model=self)
+            self.checkpointer.close()
 
         # Write log if applicable
         if self.writer:
@@ -296,28 +493,79 @@ class Classifier(nn.Module):
         )
         raise NotImplementedError(msg)
 
-    def save(self, destination, **kwargs):
+    def save(self, destination, format="torch", **kwargs):
         """Serialize and save a model.
 
+        By default, the whole model is pickled with torch.save(), and kwargs
+        are passed to torch.save(). With format="metal", it is saved in metal's
+        own versioned format instead (see metal.serialization): its config and
+        architecture as JSON, followed by a flat blob of its weights, which
+        load() memory-maps. Models that cannot be rebuilt from their config
+        (see _get_architecture()) have their structure pickled in that format
+        as well, so only load those from trusted sources.
+
         Example:
             end_model = EndModel(...)
             end_model.train_model(...)
             end_model.save("my_end_model.pkl")
         """
-        with open(destination, "wb") as f:
-            torch.save(self, f, **kwargs)
+        if format == "metal":
+            save_model(self, destination, exclude=self._training_components)
+        elif format == "torch":
+            with open(destination, "wb") as f:
+                torch.save(self, f, **kwargs)
+        else:
+            raise ValueError(f"Unrecognized format: {format}")
 
     @staticmethod
-    def load(source, **kwargs):
+    def load(source, mmap=True, **kwargs):
         """Deserialize and load a model.
 
+        Args:
+            source: the path of a model saved with save()
+            mmap: if True, memory-map the weights of a model saved in metal's
+                format (see metal.serialization) rather than reading them
+            kwargs: passed to torch.load() for a model saved with
+                format="torch"
+
         Example:
             end_model = EndModel.load("my_end_model.pkl")
             end_model.score(...)
         """
+        if is_model_file(source):
+            return load_model(source, mmap=mmap)
         with open(source, "rb") as f:
             return torch.load(f, **kwargs)
 
+    def _inference_copy(self):
+        """Returns a deep copy of the model without its training components
+        (optimizer, lr_scheduler, logger, checkpointer, writer, evaluator)"""
+        excluded = {
+            k: self.__dict__.pop(k)
+            for k in self._training_components
+            if k in self.__dict__
+        }
+        try:
+            return copy.deepcopy(self)
+        finally:
+            self.__dict__.update(excluded)
+
+    def _get_architecture(self):
+        """Returns a JSON-serializable dict from which _from_architecture() can
+        rebuild the structure of this model, given its config
+
+        Returns None if the model cannot be rebuilt that way (e.g., because
+        it has custom modules), in which case save(format="metal") pickles its
+        structure instead.
+        """
+        return None
+
+    @classmethod
+    def _from_architecture(cls, config, architecture):
+        """Returns a model built from config and the output of
+        _get_architecture(), whose weights are then loaded separately"""
+        raise NotImplementedError
+
     def update_config(self, update_dict):
         """Updates self.config with the values in a given update dictionary"""
         self.config = recursive_merge_dicts(self.config, update_dict)
@@ -363,12 +611,13 @@ class Classifier(nn.Module):
         """
         self.load_state_dict(restore_state["model"])
         self.optimizer.load_state_dict(restore_state["optimizer"])
-        self.lr_scheduler.load_state_dict(restore_state["lr_scheduler"])
+        if self.lr_scheduler is not None and restore_state["lr_scheduler"]:
+            self.lr_scheduler.load_state_dict(restore_state["lr_scheduler"])
         start_iteration = restore_state["iteration"] + 1
         if self.config["verbose"]:
             print(f"Restored checkpoint to iteration {start_iteration}.")
 
-        if restore_state["best_model_found"]:
+        if restore_state.get("best_model_found") and self.checkpointer:
             # Update checkpointer with appropriate information about best model
             # Note that the best model found so far may not be the model in the
             # checkpoint that is currently being loaded.
@@ -383,10 +632,53 @@ class Classifier(nn.Module):
                 )
         return start_iteration
 
+    def _bundle_training_state(self, iteration):
+        """Returns the state of the model and its optimizer and lr scheduler
+        after the given iteration (i.e., epoch), as in a checkpoint (see
+        Checkpointer.bundle_state()), from which training can be continued by
+        passing it as restore_state to _train_model()
+
+        Unlike a checkpoint, it doesn't include the checkpointer's best model
+        so far, so the continued training selects its best model only among
+        its own epochs.
+        """
+        return {
+            "iteration": iteration,
+            "model": copy.deepcopy(self.state_dict()),
+            "optimizer": copy.deepcopy(self.optimizer.state_dict()),
+            "lr_scheduler": self.lr_scheduler.state_dict()
+            if self.lr_scheduler
+            else None,
+            "score": None,
+        }
+
+    def _accepts_sparse_input(self):
+        """Returns True if forward() accepts [n, d] torch.sparse inputs, in which
+        case scipy.sparse inputs are kept sparse (and converted to torch.sparse
+        tensors one batch at a time) rather than densified"""
+        return False
+
+    def _densify_sparse_input(self, X):
+        """Converts a scipy.sparse X to a dense torch.Tensor, unless the model
+        accepts sparse inputs (see _accepts_sparse_input())"""
+        if issparse(X) and not self._accepts_sparse_input():
+            X = self._to_torch(X)
+            return X.float() if X.is_floating_point() else X
+        return X
+
     def _create_dataset(self, *data):
         """Converts input data to the appropriate Dataset"""
-        # Make sure data is a tuple of dense tensors
-        data = [self._to_torch(x, dtype=torch.FloatTensor) for x in data]
+        # Keep scipy.sparse inputs sparse if the model accepts them; they are
+        # converted to torch.sparse tensors one batch at a time by the
+        # MetalDataset
+        if any(issparse(x) for x in data) and self._accepts_sparse_input():
+            data = [x if issparse(x) else self._to_torch(x) for x in data]
+            return MetalDataset(*data)
+
+        # Make sure data is a tuple of dense tensors; floating point inputs are
+        # cast to float, but e.g. int indices or labels keep their dtype
+        data = [self._to_torch(x) for x in data]
+        data = [x.float() if x.is_floating_point() else x for x in data]
         return TensorDataset(*data)
 
     def _create_data_loader(self, data, **kwargs):
@@ -402,15 +694,67 @@ class Classifier(nn.Module):
             "pin_memory": self.config["device"] != "cpu",
         }
         # Return data as DataLoader
-        if isinstance(data, DataLoader):
+        if isinstance(data, (DataLoader, TensorBatchLoader)):
             return data
         elif isinstance(data, Dataset):
             return DataLoader(data, **config)
         elif isinstance(data, (tuple, list)):
-            return DataLoader(self._create_dataset(*data), **config)
+            dataset = self._create_dataset(*data)
+            # If the data is already in memory as Tensors (or scipy.sparse
+            # matrices), slice out batches directly rather than collating them
+            # item by item
+            in_memory = isinstance(dataset, TensorDataset) or self._in_memory(data)
+            if in_memory and set(config).issubset(TensorBatchLoader.supported_kwargs):
+                return TensorBatchLoader(dataset, **config)
+            if any(issparse(x) for x in data):
+                config.setdefault("collate_fn", sparse_collate_fn)
+            return DataLoader(dataset, **config)
         else:
             raise ValueError("Input data type not recognized.")
 
+    def _shard_data_loader(self, loader):
+        """Returns a copy of loader which loads only this process's shard of
+        its dataset in distributed training (see metal.distributed)"""
+        if isinstance(loader, TensorBatchLoader):
+            shuffle = loader.shuffle
+        elif loader.batch_size is not None:
+            shuffle = isinstance(loader.sampler, RandomSampler)
+        else:
+            raise ValueError(
+                "Cannot shard a DataLoader with a custom batch_sampler for "
+                "distributed training."
+            )
+        # Every process must shuffle with the same seed to get disjoint shards
+        seed = self.seed if self.seed is not None else 0
+        sampler = DistributedSampler(loader.dataset, shuffle=shuffle, seed=seed)
+        if isinstance(loader, TensorBatchLoader):
+            return TensorBatchLoader(
+                loader.dataset,
+                batch_size=loader.batch_size,
+                drop_last=loader.drop_last,
+                sampler=sampler,
+            )
+        return DataLoader(
+            loader.dataset,
+            batch_size=loader.batch_size,
+            sampler=sampler,
+            num_workers=loader.num_workers,
+            collate_fn=loader.collate_fn,
+            pin_memory=loader.pin_memory,
+            drop_last=loader.drop_last,
+        )
+
+    @staticmethod
+    def _in_memory(data):
+        """Returns True if data is a torch.Tensor or scipy.sparse matrix, or a
+        (nested) list or tuple of these"""
+        if isinstance(data, torch.Tensor) or issparse(data):
+            return True
+        elif isinstance(data, (tuple, list)):
+            return len(data) > 0 and all(Classifier._in_memory(x) for x in data)
+        else:
+            return False
+
     def _set_seed(self, seed):
         self.seed = seed
         if self.config["device"] != "cpu":
@@ -419,6 +763,8 @@ class Classifier(nn.Module):
         torch.manual_seed(seed)
         np.random.seed(seed)
         random.seed(seed)
+        # A dedicated RNG for e.g. random tie-breaking at prediction time
+        self.rng = np.random.RandomState(seed)
 
     def _set_writer(self, train_config):
         if train_config["writer"] is None:
@@ -438,6 +784,15 @@ class Classifier(nn.Module):
             verbose=self.config["verbose"],
         )
 
+    def _set_evaluator(self, train_config):
+        logger_config = train_config["logger_config"]
+        if logger_config.get("log_async", False):
+            self.evaluator = AsyncEvaluator(
+                self, num_threads=logger_config.get("log_async_num_threads", 1)
+            )
+        else:
+            self.evaluator = None
+
     def _set_checkpointer(self, train_config):
         if train_config["checkpoint"]:
             self.checkpointer = Checkpointer(
@@ -524,7 +879,6 @@ class Classifier(nn.Module):
                     self.lr_scheduler.step()
 
     def _execute_logging(self, train_loader, valid_loader, loss, batch_size):
-        self.eval()
         self.running_loss += loss.item() * batch_size
         self.running_examples += batch_size
 
@@ -533,12 +887,26 @@ class Classifier(nn.Module):
         # Always add average loss
         metrics_dict["train/loss"] = self.running_loss / self.running_examples
 
+        # Log and checkpoint the metrics of any finished background calculation
+        async_metrics = {}
+        if self.evaluator:
+            async_metrics = self._deliver_async(self.evaluator.collect())
+
         if self.logger.check(batch_size):
-            logger_metrics = self.logger.calculate_metrics(
-                self, train_loader, valid_loader, metrics_dict
-            )
-            metrics_dict.update(logger_metrics)
-            self.logger.log(metrics_dict)
+            if self.evaluator:
+                self._execute_logging_async(train_loader, valid_loader, metrics_dict)
+            else:
+                self.eval()
+                logger_metrics = self.logger.calculate_metrics(
+                    self,
+                    train_loader,
+                    valid_loader,
+                    metrics_dict,
+                    self._get_full_valid_check(),
+                )
+                metrics_dict.update(logger_metrics)
+                self.logger.log(metrics_dict)
+                self.train()
 
             # Reset running loss and examples counts
             self.running_loss = 0.0
@@ -547,9 +915,53 @@ class Classifier(nn.Module):
         # Checkpoint if applicable
         self._checkpoint(metrics_dict)
 
-        self.train()
+        return {**async_metrics, **metrics_dict}
+
+    def _execute_logging_async(self, train_loader, valid_loader, metrics_dict):
+        """Starts calculating the metrics for this log on a background thread,
+        using a snapshot of the model's current weights"""
+        # Only one calculation may be in flight at a time
+        self._deliver_async(self.evaluator.collect(wait=True))
+        shadow = self.evaluator.snapshot(self)
+        calculate = self.logger.prepare_metrics(
+            shadow, train_loader, valid_loader, self._get_full_valid_check()
+        )
+        totals = (self.logger.unit_total, self.logger.example_total)
+        self.evaluator.submit(calculate, info=(dict(metrics_dict), totals))
+        self.logger.reset()
+
+    def _deliver_async(self, results):
+        """Logs and checkpoints the results of a background metrics calculation
+
+        Returns:
+            The logged metrics_dict (empty if results is None)
+        """
+        if results is None:
+            return {}
+        logger_metrics, (metrics_dict, totals) = results
+        metrics_dict.update(logger_metrics)
+        self.logger.log(metrics_dict, totals)
+        # Checkpoint the weights these metrics were calculated with, along with
+        # the optimizer and lr_scheduler states saved at the same time
+        if self.checkpointer:
+            self.checkpointer.checkpoint(
+                metrics_dict,
+                totals[0],
+                self.evaluator.shadow,
+                self.evaluator.optimizer,
+                self.evaluator.lr_scheduler,
+            )
         return metrics_dict
 
+    def _get_full_valid_check(self):
+        """Returns a function that checks if subsampled valid metrics would
+        produce a new best checkpoint (see Logger.calculate_metrics()), or
+        None if there is no Checkpointer"""
+        if not self.checkpointer:
+            return None
+        iteration = self.logger.unit_total
+        return lambda m: self.checkpointer.is_best_candidate(m, iteration)
+
     def _checkpoint(self, metrics_dict):
         if self.checkpointer is None:
             return
@@ -574,32 +986,55 @@ class Classifier(nn.Module):
             Y: A Tensor of labels
             [Optionally: Y_s: An [n, k] np.ndarray of predicted probabilities]
         """
-        data_loader = self._create_data_loader(data)
-        Y_p = []
+        data_loader = self._create_data_loader(
+            data, batch_size=self._get_eval_batch_size(), shuffle=False
+        )
         Y = []
         Y_s = []
 
-        # Do batch evaluation by default, getting the predictions and labels
-        for batch_num, data in enumerate(data_loader):
-            Xb, Yb = data
-            Y.append(self._to_numpy(Yb))
+        # Do batch evaluation by default, getting the probabilities and labels;
+        # these are only converted to np.ndarrays (and predictions) at the end
+        with inference_mode():
+            for batch_num, data in enumerate(data_loader):
+                Xb, Yb = data
+                Y.append(Yb)
 
-            # Optionally move to device
-            if self.config["device"] != "cpu":
-                Xb = place_on_gpu(Xb)
+                # Optionally move to device
+                if self.config["device"] != "cpu":
+                    Xb = place_on_gpu(Xb)
 
-            # Append predictions and labels from DataLoader
-            Y_pb, Y_sb = self.predict(
-                Xb, break_ties=break_ties, return_probs=True, **kwargs
-            )
-            Y_p.append(self._to_numpy(Y_pb))
-            Y_s.append(self._to_numpy(Y_sb))
-        Y_p, Y, Y_s = map(self._stack_batches, [Y_p, Y, Y_s])
+                Y_s.append(self._predict_proba_batch(Xb, **kwargs))
+        Y, Y_s = map(self._stack_batches, [Y, Y_s])
+
+        if self.multitask:
+            Y_p = [self._break_ties(Y_ts, break_ties).astype(int) for Y_ts in Y_s]
+        else:
+            Y_p = self._break_ties(Y_s, break_ties).astype(int)
         if return_probs:
             return Y_p, Y, Y_s
         else:
             return Y_p, Y
 
+    def _predict_proba_batch(self, X, **kwargs):
+        """Predicts probabilities for a batch X in _get_predictions()
+
+        Subclasses may override this to return torch.Tensors (e.g., left on the
+        GPU) rather than np.ndarrays, which are then concatenated and converted
+        once, rather than once per batch.
+        """
+        return self.predict_proba(X, **kwargs)
+
+    def _get_eval_batch_size(self):
+        """Returns the batch size to use for predicting and scoring"""
+        train_config = self.config["train_config"]
+        eval_batch_size = train_config.get("eval_batch_size", None)
+        return eval_batch_size or train_config["data_loader_config"]["batch_size"]
+
+    def _autocast(self):
+        """Returns a context manager running forward passes in the configured
+        precision (see metal.utils.autocast)"""
+        return autocast(self.config.get("precision", "fp32"), self.config["device"])
+
     def _break_ties(self, Y_s, break_ties="random"):
         """Break ties in each row of a tensor according to the specified policy
 
@@ -613,29 +1048,36 @@ class Classifier(nn.Module):
                 [int]: ties will be broken by using this label
         """
         n, k = Y_s.shape
-        Y_h = np.zeros(n)
         diffs = np.abs(Y_s - Y_s.max(axis=1).reshape(-1, 1))
 
         TOL = 1e-5
-        for i in range(n):
-            max_idxs = np.where(diffs[i, :] < TOL)[0]
-            if len(max_idxs) == 1:
-                Y_h[i] = max_idxs[0] + 1
-            # Deal with "tie votes" according to the specified policy
-            elif break_ties == "random":
-                Y_h[i] = np.random.choice(max_idxs) + 1
-            elif break_ties == "abstain":
-                Y_h[i] = 0
-            elif isinstance(break_ties, int):
-                Y_h[i] = break_ties
-            else:
-                ValueError(f"break_ties={break_ties} policy not recognized.")
+        max_mask = diffs < TOL
+        # The first (and for untied rows, only) index within TOL of the max
+        Y_h = max_mask.argmax(axis=1) + 1
+        tied = max_mask.sum(axis=1) > 1
+        if not tied.any():
+            return Y_h
+
+        # Deal with "tie votes" according to the specified policy
+        if break_ties == "random":
+            # Draw a random key for each entry, then take the argmax of the keys
+            # over just the tied entries of each row
+            rng = getattr(self, "rng", np.random)
+            keys = rng.random_sample((int(tied.sum()), k))
+            keys[~max_mask[tied]] = -1
+            Y_h[tied] = keys.argmax(axis=1) + 1
+        elif break_ties == "abstain":
+            Y_h[tied] = 0
+        elif isinstance(break_ties, int):
+            Y_h[tied] = break_ties
+        else:
+            raise ValueError(f"break_ties={break_ties} policy not recognized.")
         return Y_h
 
     @staticmethod
     def _to_numpy(Z):
         """Converts a None, list, np.ndarray, or torch.Tensor to np.ndarray;
-        also handles converting sparse input to dense."""
+        also handles converting sparse (scipy or torch) input to dense."""
         if Z is None:
             return Z
         elif issparse(Z):
@@ -645,6 +1087,8 @@ class Classifier(nn.Module):
         elif isinstance(Z, list):
             return np.array(Z)
         elif isinstance(Z, torch.Tensor):
+            if Z.is_sparse:
+                Z = Z.to_dense()
             return Z.cpu().numpy()
         else:
             msg = (
@@ -654,13 +1098,14 @@ class Classifier(nn.Module):
             raise Exception(msg)
 
     @staticmethod
-    def _to_torch(Z, dtype=None):
+    def _to_torch(Z, dtype=None, sparse=False):
         """Converts a None, list, np.ndarray, or torch.Tensor to torch.Tensor;
-        also handles converting sparse input to dense."""
+        scipy.sparse input is converted to a dense tensor, or to a
+        torch.sparse tensor if sparse=True."""
         if Z is None:
             return None
         elif issparse(Z):
-            Z = torch.from_numpy(Z.toarray())
+            Z = sparse_to_torch(Z) if sparse else torch.from_numpy(Z.toarray())
         elif isinstance(Z, torch.Tensor):
             pass
         elif isinstance(Z, list):
@@ -714,6 +1159,9 @@ class Classifier(nn.Module):
         """Stack a list of np.ndarrays along the first axis, returning an
         np.ndarray; note this is mainly for smooth hanlding of the multi-task
         setting."""
+        # Concatenate batches of torch.Tensors before converting them
+        if all(isinstance(Xb, torch.Tensor) for Xb in X):
+            return Classifier._to_numpy(torch.cat(X))
         X = [Classifier._to_numpy(Xb) for Xb in X]
         if len(X[0].shape) == 1:
             return np.hstack(X)
@@ -721,3 +1169,12 @@ class Classifier(nn.Module):
             return np.vstack(X)
         else:
             raise ValueError(f"Can't stack {len(X[0].shape)}-dim batches.")
+
+
+def _record_train_outputs(module, input, output):
+    """A forward hook storing the detached outputs of train-mode forward passes"""
+    if module.training:
+        if isinstance(output, (list, tuple)):
+            module._train_outputs = [o.detach().float() for o in output]
+        else:
+            module._train_outputs = output.detach().float()
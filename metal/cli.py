@@ -0,0 +1,279 @@
+"""The `metal` command-line interface, for batch jobs with label models
+
+Usage:
+    metal fit-label-model L_train.npz --k 2 --output label_model.metal
+    metal predict label_model.metal L_train.npz --output Y_train_probs.npy
+    metal score label_model.metal L_dev.npz Y_dev.npy --metric accuracy f1
+    metal lf-summary L_dev.npz --Y Y_dev.npy
+
+Label matrices are read from scipy.sparse .npz files (see
+scipy.sparse.save_npz()) or from dense .npy files; gold labels are read from
+.npy files. The predict and score commands process the label matrix in chunks
+of rows, optionally in a pool of worker processes (--n-jobs), each of which
+loads the model once. A .npy label matrix is memory-mapped (by each worker),
+so that only the current chunks are in memory, and the workers are only sent
+the row range of each chunk. A .npz label matrix can't be memory-mapped: it
+is loaded once, into the main process, which sends each chunk of rows to a
+worker.
+
+Probabilistic labels are written to a .npy file, or otherwise (e.g., to "-"
+for stdout) as a raw stream of little-endian floats, k per row.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+import scipy.sparse as sparse
+
+DTYPES = ["float16", "float32", "float64"]
+
+
+def load_label_matrix(path):
+    """Returns the label matrix at path: a CSR matrix for a .npz file, or a
+    (read-only) memory-mapped np.ndarray for a .npy file"""
+    if path.endswith(".npz"):
+        return sparse.load_npz(path).tocsr()
+    elif path.endswith(".npy"):
+        return np.load(path, mmap_mode="r")
+    else:
+        raise ValueError(f"Unrecognized label matrix file (not .npz or .npy): {path}")
+
+
+def load_labels(path):
+    """Returns the gold labels in the .npy file at path as an n-dim array"""
+    return np.load(path).ravel()
+
+
+def predict_proba_chunks(model_path, L, chunk_size=100000, n_jobs=1, model=None):
+    """Yields (start, Y_s) for each chunk of rows of the label matrix, in order
+
+    Args:
+        model_path: the path of a model saved with Classifier.save()
+        L: the label matrix, as returned by load_label_matrix()
+        chunk_size: the number of rows per chunk
+        n_jobs: the number of worker processes; if 1, predict in this process
+        model: the model at model_path, if already loaded, to predict with in
+            this process
+    """
+    n = L.shape[0]
+    ranges = [(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+    if n_jobs == 1:
+        _worker["model"] = model if model is not None else _load_model(model_path)
+        _worker["L"] = L
+        yield from map(_predict_chunk, [(start, end, None) for start, end in ranges])
+        return
+
+    if isinstance(L, np.memmap):
+        # The workers memory-map the .npy file themselves
+        L_path = L.filename
+        chunks = ((start, end, None) for start, end in ranges)
+    else:
+        L_path = None
+        chunks = ((start, end, L[start:end]) for start, end in ranges)
+    # Split the cores between the workers, so they don't oversubscribe them
+    num_threads = max(1, (os.cpu_count() or 1) // n_jobs)
+    initargs = (model_path, L_path, num_threads)
+    with multiprocessing.Pool(n_jobs, _init_worker, initargs) as pool:
+        yield from pool.imap(_predict_chunk, chunks)
+
+
+# The model and (memory-mapped) label matrix of a worker process (see
+# _init_worker())
+_worker = {}
+
+
+def _load_model(model_path):
+    from metal.classifier import Classifier
+
+    return Classifier.load(model_path)
+
+
+def _init_worker(model_path, L_path, num_threads):
+    import torch
+
+    torch.set_num_threads(num_threads)
+    _worker["model"] = _load_model(model_path)
+    _worker["L"] = load_label_matrix(L_path) if L_path is not None else None
+
+
+def _predict_chunk(chunk):
+    """Returns (start, Y_s) for the chunk (start, end, L_chunk), where L_chunk
+    is the rows of the label matrix, or None to read them from _worker["L"]"""
+    start, end, L_chunk = chunk
+    if L_chunk is None:
+        L_chunk = _worker["L"][start:end]
+    return start, np.asarray(_worker["model"].predict_proba(sparse.csr_matrix(L_chunk)))
+
+
+def fit_label_model(args):
+    from metal.label_model import LabelModel, MajorityLabelVoter
+
+    L_train = sparse.csr_matrix(load_label_matrix(args.L_train))
+    if args.model == "majority-vote":
+        model = MajorityLabelVoter(k=args.k, seed=args.seed, verbose=args.verbose)
+    else:
+        model = LabelModel(k=args.k, seed=args.seed, verbose=args.verbose)
+
+    kwargs = {}
+    if args.config is not None:
+        with open(args.config) as f:
+            kwargs.update(json.load(f))
+    for key in ["n_epochs", "lr", "l2"]:
+        if getattr(args, key) is not None:
+            kwargs[key] = getattr(args, key)
+    if args.Y_dev is not None:
+        kwargs["Y_dev"] = load_labels(args.Y_dev)
+    if args.class_balance is not None:
+        kwargs["class_balance"] = np.array(args.class_balance)
+    model.train_model(L_train, **kwargs)
+    model.save(args.output)
+
+
+def predict(args):
+    L = load_label_matrix(args.L)
+    chunks = predict_proba_chunks(
+        args.model, L, chunk_size=args.chunk_size, n_jobs=args.n_jobs
+    )
+    dtype = np.dtype(args.dtype).newbyteorder("<")
+    if args.output.endswith(".npy"):
+        n = L.shape[0]
+        Y_s = None
+        for start, Y_s_chunk in chunks:
+            if Y_s is None:
+                # The .npy file is created once the first chunk gives k
+                shape = (n, Y_s_chunk.shape[1])
+                Y_s = np.lib.format.open_memmap(
+                    args.output, mode="w+", dtype=dtype, shape=shape
+                )
+            Y_s[start : start + len(Y_s_chunk)] = Y_s_chunk
+        if Y_s is not None:
+            Y_s.flush()
+    else:
+        f = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+        try:
+            for _, Y_s_chunk in chunks:
+                f.write(Y_s_chunk.astype(dtype).tobytes())
+        finally:
+            if f is not sys.stdout.buffer:
+                f.close()
+
+
+def score(args):
+    from metal.metrics import metric_score
+
+    model = _load_model(args.model)
+    chunks = predict_proba_chunks(
+        args.model,
+        load_label_matrix(args.L),
+        chunk_size=args.chunk_size,
+        n_jobs=args.n_jobs,
+        model=model,
+    )
+    Y_s = np.concatenate([Y_s_chunk for _, Y_s_chunk in chunks])
+    Y = load_labels(args.Y)
+    break_ties = int(args.break_ties) if args.break_ties.isdigit() else args.break_ties
+    Y_p = model._break_ties(Y_s, break_ties)
+    for metric in args.metric:
+        value = metric_score(Y, Y_p, metric, probs=Y_s, ignore_in_gold=[0])
+        print(f"{metric}: {value:.4f}")
+
+
+def lf_summary(args):
+    from metal import analysis
+
+    L = sparse.csr_matrix(load_label_matrix(args.L))
+    Y = load_labels(args.Y) if args.Y is not None else None
+    lf_names = None
+    if args.lf_names is not None:
+        with open(args.lf_names) as f:
+            lf_names = [line.strip() for line in f if line.strip()]
+    df = analysis.lf_summary(L, Y=Y, lf_names=lf_names)
+    if args.output is not None:
+        df.to_csv(args.output)
+    else:
+        print(df.to_string())
+
+
+def _positive_int(value):
+    value = int(value)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be a positive integer: {value}")
+    return value
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        prog="metal", description="Batch jobs with Snorkel MeTaL label models."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    p = subparsers.add_parser(
+        "fit-label-model", help="Train a label model on a label matrix."
+    )
+    p.add_argument("L_train", help="The label matrix (.npz or .npy).")
+    p.add_argument("--k", type=int, required=True, help="The number of classes.")
+    p.add_argument("--output", required=True, help="The path to save the model to.")
+    p.add_argument(
+        "--model", choices=["label-model", "majority-vote"], default="label-model"
+    )
+    p.add_argument("--Y-dev", help="Gold dev labels (.npy) for the class balance.")
+    p.add_argument("--class-balance", type=float, nargs="+")
+    p.add_argument("--n-epochs", type=int)
+    p.add_argument("--lr", type=float)
+    p.add_argument("--l2", type=float)
+    p.add_argument("--seed", type=int)
+    p.add_argument("--config", help="A JSON file of other train_model() kwargs.")
+    p.add_argument("--verbose", action="store_true")
+    p.set_defaults(func=fit_label_model)
+
+    def add_chunk_args(p):
+        p.add_argument("--chunk-size", type=_positive_int, default=100000)
+        p.add_argument(
+            "--n-jobs", type=_positive_int, default=1, help="Worker processes."
+        )
+
+    p = subparsers.add_parser(
+        "predict", help="Write the probabilistic labels for a label matrix."
+    )
+    p.add_argument("model", help="A saved model.")
+    p.add_argument("L", help="The label matrix (.npz or .npy).")
+    p.add_argument(
+        "--output",
+        required=True,
+        help="A .npy file, or a file (or - for stdout) for a raw stream.",
+    )
+    p.add_argument("--dtype", choices=DTYPES, default="float32")
+    add_chunk_args(p)
+    p.set_defaults(func=predict)
+
+    p = subparsers.add_parser("score", help="Score a model on a label matrix.")
+    p.add_argument("model", help="A saved model.")
+    p.add_argument("L", help="The label matrix (.npz or .npy).")
+    p.add_argument("Y", help="The gold labels (.npy).")
+    p.add_argument("--metric", nargs="+", default=["accuracy"])
+    p.add_argument(
+        "--break-ties", default="random", help='"random", "abstain", or a label.'
+    )
+    add_chunk_args(p)
+    p.set_defaults(func=score)
+
+    p = subparsers.add_parser("lf-summary", help="Summarize the LFs of a label matrix.")
+    p.add_argument("L", help="The label matrix (.npz or .npy).")
+    p.add_argument("--Y", help="Gold labels (.npy), for empirical accuracies.")
+    p.add_argument("--lf-names", help="A text file with the name of each LF per line.")
+    p.add_argument("--output", help="A .csv file; if not given, print the summary.")
+    p.set_defaults(func=lf_summary)
+
+    return parser
+
+
+def main(argv=None):
+    args = get_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,11 @@ class SparseLogisticRegression(EndModel):
         output_dim: The cardinality of the classifier
         padding_idx: If not None, the embedding initialized to 0 so no gradient
             will pass through it.
+
+    Since its gradients are sparse, this model can be trained Hogwild-style in
+    several processes that share its weights, e.g. with
+    train_model(..., optimizer="sgd", n_procs=4, dist_config={"hogwild": True})
+    (see metal.distributed.train_distributed).
     """
 
     def __init__(self, input_dim, output_dim=2, padding_idx=0, **kwargs):
@@ -1,6 +1,4 @@
-from .lstm_module import LSTMModule, Encoder, EmbeddingsEncoder
-from .resnet_cifar10 import ResNetModule
-from .sparse_linear_module import SparseLinearModule
+from metal.lazy_imports import lazy_attributes
 
 __all__ = [
     "LSTMModule",
@@ -9,3 +7,14 @@ __all__ = [
     "ResNetModule",
     "SparseLinearModule",
 ]
+
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "LSTMModule": ".lstm_module",
+        "Encoder": ".lstm_module",
+        "EmbeddingsEncoder": ".lstm_module",
+        "ResNetModule": ".resnet_cifar10",
+        "SparseLinearModule": ".sparse_linear_module",
+    },
+)
@@ -173,13 +173,11 @@ class LSTMModule(nn.Module):
             nn.init.xavier_normal_(att_param)
             self.attention_param = att_param
 
-    def _attention(self, output):
-        # output is of shape (seq_length, hidden_size)
-        score = torch.matmul(output, self.attention_param).squeeze()
-        score = F.softmax(score, dim=0).view(output.size(0), 1)
-        scored_output = output * score
-        condensed_output = torch.sum(scored_output, dim=0)
-        return condensed_output
+    def _attention(self, outputs, mask):
+        # outputs is of shape (batch_size, max_seq_length, hidden_size)
+        score = torch.matmul(outputs, self.attention_param).squeeze(2)
+        score = F.softmax(score.masked_fill(~mask, float("-inf")), dim=1)
+        return torch.sum(outputs * score.unsqueeze(2), dim=1)
 
     def reset_parameters(self):
         # Note: Classifier.reset() calls reset_parameters() recursively on all
@@ -193,58 +191,56 @@ class LSTMModule(nn.Module):
         Args:
             outputs: (torch.FloatTensor) the hidden state outputs from the
                 lstm, with shape [batch_size, max_seq_length, hidden_size]
+            seq_lengths: (torch.LongTensor) the length of each sequence
+                before padding starts
         """
-        batch_size = outputs.shape[0]
-        reduced = []
-        # Necessary to iterate over batch because of different sequence lengths
-        for i in range(batch_size):
-            if self.lstm_reduction == "mean":
-                # Average over all non-padding reduced
-                # Use dim=0 because first dimension disappears after indexing
-                reduced.append(outputs[i, : seq_lengths[i], :].mean(dim=0))
-            elif self.lstm_reduction == "max":
-                # Max-pool over all non-padding reduced
-                # Use dim=0 because first dimension disappears after indexing
-                reduced.append(outputs[i, : seq_lengths[i], :].max(dim=0)[0])
-            elif self.lstm_reduction == "last":
-                # Take the last output of the sequence (before padding starts)
-                # NOTE: maybe better to take first and last?
-                reduced.append(outputs[i, seq_lengths[i] - 1, :])
-            elif self.lstm_reduction == "attention":
-                reduced.append(self._attention(outputs[i, : seq_lengths[i], :]))
-            else:
-                msg = (
-                    f"Did not recognize lstm kwarg 'lstm_reduction' == "
-                    f"{self.lstm_reduction}"
-                )
-                raise ValueError(msg)
-        return torch.stack(reduced, dim=0)
+        # Mask out the padding at the end of each sequence
+        positions = torch.arange(outputs.shape[1], device=outputs.device)
+        mask = positions.unsqueeze(0) < seq_lengths.unsqueeze(1)
+        if self.lstm_reduction == "mean":
+            # Average over all non-padding outputs
+            total = (outputs * mask.unsqueeze(2)).sum(dim=1)
+            return total / seq_lengths.unsqueeze(1).to(outputs.dtype)
+        elif self.lstm_reduction == "max":
+            # Max-pool over all non-padding outputs
+            masked = outputs.masked_fill(~mask.unsqueeze(2), float("-inf"))
+            return masked.max(dim=1)[0]
+        elif self.lstm_reduction == "last":
+            # Take the last output of the sequence (before padding starts)
+            # NOTE: maybe better to take first and last?
+            idxs = (seq_lengths - 1).view(-1, 1, 1).expand(-1, 1, outputs.shape[2])
+            return outputs.gather(1, idxs).squeeze(1)
+        # NOTE: hasattr() is resolved when compiling with TorchScript, so the
+        # other reductions do not need an attention_param
+        elif self.lstm_reduction == "attention" and hasattr(self, "attention_param"):
+            return self._attention(outputs, mask)
+        else:
+            msg = (
+                f"Did not recognize lstm kwarg 'lstm_reduction' == "
+                f"{self.lstm_reduction}"
+            )
+            raise ValueError(msg)
 
     def forward(self, X):
         """Applies one step of an lstm (plus reduction) to the input X, which
-        is handled by self.encoder"""
-        # Identify the first non-zero integer from the right (i.e., the length
-        # of the sequence before padding starts).
-        batch_size, max_seq = X.shape[0], X.shape[1]
-        seq_lengths = torch.zeros(batch_size, dtype=torch.long)
-        for i in range(batch_size):
-            for j in range(max_seq - 1, -1, -1):
-                if not torch.all(X[i, j] == 0):
-                    seq_lengths[i] = j + 1
-                    break
+        is handled by self.encoder
 
-        # Sort by length because pack_padded_sequence requires it
-        # Save original order to restore before returning
-        seq_lengths, perm_idx = seq_lengths.sort(0, descending=True)
-        X = X[perm_idx]
-        inv_perm_idx = torch.tensor(
-            [i for i, _ in sorted(enumerate(perm_idx), key=lambda idx: idx[1])],
-            dtype=torch.long,
-        )
+        This method can be compiled with torch.jit.script (see
+        EndModel.export_scripted()).
+        """
+        # Identify the first non-zero item from the right (i.e., the length
+        # of the sequence before padding starts).
+        nonzero = X.reshape(X.shape[0], X.shape[1], -1).ne(0).any(dim=2)
+        positions = torch.arange(1, X.shape[1] + 1, device=X.device)
+        seq_lengths = (nonzero.long() * positions).max(dim=1)[0]
 
-        # Encode and pack input sequence
+        # Encode and pack input sequence (pack_padded_sequence sorts by length
+        # and pad_packed_sequence restores the original order)
         X_packed = rnn_utils.pack_padded_sequence(
-            self.encoder.encode(X), seq_lengths, batch_first=True
+            self.encoder.encode(X),
+            seq_lengths.cpu(),
+            batch_first=True,
+            enforce_sorted=False,
         )
 
         # Run LSTM
@@ -252,5 +248,4 @@ class LSTMModule(nn.Module):
 
         # Unpack and reduce outputs
         outputs_unpacked, _ = rnn_utils.pad_packed_sequence(outputs, batch_first=True)
-        reduced = self._reduce_output(outputs_unpacked, seq_lengths)
-        return reduced[inv_perm_idx, :]
+        return self._reduce_output(outputs_unpacked, seq_lengths)
@@ -2,9 +2,13 @@ import math
 
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 
 
 class SparseLinearModule(nn.Module):
+    # The forward pass also accepts [n, vocab_size] torch.sparse inputs
+    accepts_sparse_input = True
+
     def __init__(self, embed_size, vocab_size, padding_idx=0):
         super().__init__()
         self.vocab_size = vocab_size
@@ -28,6 +32,32 @@ class SparseLinearModule(nn.Module):
         Args:
             X: an [n, h] torch.LongTensor containing up to h indices of features
                 whose weights should be looked up and used in a sparse linear
-                multiplication.
+                multiplication; or an [n, vocab_size] torch.sparse tensor of
+                feature values (e.g., a batch from a scipy.sparse matrix).
         """
+        if X.is_sparse:
+            return self._forward_sparse(X)
         return self.W(X).sum(dim=1) + self.b
+
+    def _forward_sparse(self, X):
+        """Multiply an [n, vocab_size] torch.sparse feature matrix by W
+
+        We use embedding_bag with per-sample weights (rather than a sparse-dense
+        matmul) so that the gradient of W is still sparse. Note that with this
+        input format, column padding_idx is treated like any other feature.
+        """
+        X = X.coalesce()
+        indices = X.indices()
+        rows, cols = indices[0], indices[1]
+        n = X.shape[0]
+        offsets = torch.zeros(n, dtype=torch.long, device=X.device)
+        offsets[1:] = torch.bincount(rows, minlength=n).cumsum(0)[:-1]
+        out = F.embedding_bag(
+            cols,
+            self.W.weight,
+            offsets,
+            mode="sum",
+            per_sample_weights=X.values().to(self.W.weight.dtype),
+            sparse=self.W.sparse,
+        )
+        return out + self.b
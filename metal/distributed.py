@@ -0,0 +1,183 @@
+import os
+import socket
+import tempfile
+
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as mp
+
+
+def is_distributed():
+    """Returns True if called in a process of a data-parallel training run"""
+    return dist.is_available() and dist.is_initialized()
+
+
+def train_distributed(model, train_data, valid_data=None, restore_state={}):
+    """Trains model with data-parallel training in n_procs local processes
+
+    Each process trains a replica of the model on its own shard of the train
+    data (see Classifier._shard_data_loader), and the gradients are averaged
+    across the processes after every backward pass (see all_reduce_gradients),
+    so the replicas stay in sync. Only the process with rank 0 logs, evaluates
+    on the valid set, and checkpoints; its final (or best) weights are loaded
+    into model once all processes have finished.
+
+    If dist_config["hogwild"] is True, the model's weights are instead put in
+    shared memory, and each process updates them directly with its own
+    optimizer, without locks or gradient averaging (Hogwild!). This suits
+    models with sparse gradients (e.g., SparseLogisticRegression with the
+    "sgd" or "sparseadam" optimizer), whose updates rarely collide. The
+    processes then only synchronize between epochs, so early stopping takes
+    effect at the end of an epoch.
+
+    Note that log units of "examples" and "batches" count the examples and
+    batches seen by each process (i.e., in each shard), not in total.
+
+    Args:
+        model: the Classifier to train; it must implement _get_loss_fn(), which
+            is called in each process to recreate the loss function
+        train_data: a tuple of Tensors (X,Y), a Dataset, or a DataLoader of
+            X (data) and Y (labels) for the train split
+        valid_data: a tuple of Tensors (X,Y), a Dataset, or a DataLoader of
+            X (data) and Y (labels) for the dev split
+        restore_state: a dictionary containing model weights (optimizer, main
+            network) and training information
+    """
+    if model.config["device"] != "cpu":
+        raise ValueError("Distributed training is only supported on CPU.")
+    train_config = model.config["train_config"]
+    n_procs = train_config["n_procs"]
+    dist_config = train_config["dist_config"]
+    num_threads = dist_config["num_threads"] or max(1, (os.cpu_count() or 1) // n_procs)
+    port = dist_config["master_port"] or _find_free_port()
+    init_method = f"tcp://{dist_config['master_addr']}:{port}"
+    if dist_config.get("hogwild"):
+        model.share_memory()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        state_path = os.path.join(tmp_dir, "model.pth")
+        mp.spawn(
+            _train_worker,
+            args=(
+                model,
+                n_procs,
+                dist_config["backend"],
+                init_method,
+                num_threads,
+                train_data,
+                valid_data,
+                restore_state,
+                state_path,
+            ),
+            nprocs=n_procs,
+        )
+        model.load_state_dict(torch.load(state_path))
+    model.eval()
+
+
+def _train_worker(
+    rank,
+    model,
+    world_size,
+    backend,
+    init_method,
+    num_threads,
+    train_data,
+    valid_data,
+    restore_state,
+    state_path,
+):
+    """Trains this process's replica of the model (see train_distributed)"""
+    dist.init_process_group(
+        backend, init_method=init_method, rank=rank, world_size=world_size
+    )
+    try:
+        torch.set_num_threads(num_threads)
+        # The replicas start from identical weights (they are all copies of
+        # the same model), but e.g. dropout should differ between them
+        if model.seed is not None:
+            torch.manual_seed(model.seed + rank)
+        if rank != 0:
+            # Only the first process logs, evaluates, and checkpoints
+            valid_data = None
+            model.update_config(
+                {
+                    "verbose": False,
+                    "train_config": {
+                        "checkpoint": False,
+                        "writer": None,
+                        "logger_config": {
+                            "log_train_metrics": ["loss"],
+                            "log_train_metrics_func": None,
+                            "log_valid_every": 0,
+                            "log_valid_metrics_func": None,
+                            "log_async": False,
+                        },
+                    },
+                }
+            )
+        model._train_model(
+            train_data,
+            model._get_loss_fn(),
+            valid_data=valid_data,
+            restore_state=restore_state,
+        )
+        if rank == 0:
+            torch.save(model.state_dict(), state_path)
+    finally:
+        dist.destroy_process_group()
+
+
+def all_reduce_gradients(model):
+    """Averages the gradients of model's parameters across all processes"""
+    world_size = dist.get_world_size()
+    dense_grads = []
+    for param in model.parameters():
+        if not param.requires_grad:
+            continue
+        if param.grad is None:
+            # Every process must contribute the same set of gradients
+            param.grad = torch.zeros_like(param)
+        if param.grad.is_sparse:
+            dist.all_reduce(param.grad)
+            param.grad.div_(world_size)
+        else:
+            dense_grads.append(param.grad)
+    if not dense_grads:
+        return
+
+    # Reduce the dense gradients in a single flat buffer
+    flat = torch.cat([grad.reshape(-1) for grad in dense_grads])
+    dist.all_reduce(flat)
+    flat.div_(world_size)
+    offset = 0
+    for grad in dense_grads:
+        grad.copy_(flat[offset : offset + grad.numel()].view_as(grad))
+        offset += grad.numel()
+
+
+def synchronize():
+    """Waits for all processes to reach this point"""
+    dist.barrier()
+
+
+def broadcast_flag(flag):
+    """Returns the value of flag in the process with rank 0"""
+    flag = torch.tensor([int(bool(flag))])
+    dist.broadcast(flag, src=0)
+    return bool(flag.item())
+
+
+def broadcast_lr(optimizer):
+    """Sets the learning rates of optimizer to those in the process with rank 0
+    (where the lr scheduler sees the valid metrics)"""
+    lrs = torch.tensor([group["lr"] for group in optimizer.param_groups]).double()
+    dist.broadcast(lrs, src=0)
+    for group, lr in zip(optimizer.param_groups, lrs.tolist()):
+        group["lr"] = lr
+
+
+def _find_free_port():
+    with socket.socket() as s:
+        s.bind(("", 0))
+        return s.getsockname()[1]
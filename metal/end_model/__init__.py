@@ -1,6 +1,20 @@
-from .end_model import EndModel
-from .identity_module import IdentityModule
-from .logreg import LogisticRegression
-from .loss import SoftCrossEntropyLoss
+from metal.lazy_imports import lazy_attributes
 
-__all__ = ["EndModel", "IdentityModule", "LogisticRegression", "SoftCrossEntropyLoss"]
+__all__ = [
+    "EndModel",
+    "IdentityModule",
+    "LogisticRegression",
+    "SoftCrossEntropyLoss",
+    "SparseInputLinear",
+]
+
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "EndModel": ".end_model",
+        "IdentityModule": ".identity_module",
+        "LogisticRegression": ".logreg",
+        "SoftCrossEntropyLoss": ".loss",
+        "SparseInputLinear": ".sparse_input_linear",
+    },
+)
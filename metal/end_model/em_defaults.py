@@ -29,6 +29,9 @@ em_default_config = {
     "skip_head": False,
     # Device
     "device": "cpu",
+    # Precision of the forward passes (see metal.utils.autocast)
+    # ['fp32', 'bf16']; parameters, optimizer state, and losses stay fp32
+    "precision": "fp32",
     # TRAINING
     "train_config": {
         # Loss function config
@@ -37,10 +40,23 @@ em_default_config = {
         "progress_bar": False,
         # Dataloader
         "data_loader_config": {"batch_size": 32, "num_workers": 1, "shuffle": True},
+        # The batch size for predicting and scoring (including on the valid set
+        # during training), if the data is not already a DataLoader
+        "eval_batch_size": 4096,
         # Loss weights
         "loss_weights": None,
         # Train Loop
         "n_epochs": 10,
+        "keep_training_state": False,  # If True, keep the state after the last epoch (before the best model is restored) in model.training_state, from which training can be continued with restore_state
+        # Data-parallel training (CPU only; see metal/distributed.py)
+        "n_procs": 1,  # If > 1, train in this many local processes, each on a shard of the train data, averaging gradients between them
+        "dist_config": {
+            "backend": "gloo",
+            "master_addr": "127.0.0.1",
+            "master_port": None,  # If None, use a free port
+            "num_threads": None,  # Threads per process; if None, split the cores evenly between the processes
+            "hogwild": False,  # If True, the processes share the model's weights in memory and update them without locks or gradient averaging (Hogwild), e.g. for SparseLogisticRegression
+        },
         # 'grad_clip': 0.0,
         "l2": 0.0,
         "validation_metric": "accuracy",
@@ -84,11 +100,17 @@ em_default_config = {
                 "loss"
             ],  # Metrics to calculate and report every `log_train_every` units. This can include built-in and user-defined metrics.
             "log_train_metrics_func": None,  # A function or list of functions that map a model + train_loader to a dictionary of custom metrics
+            "log_train_online": True,  # If True, calculate standard train metrics from the predictions made during training instead of re-predicting on the full train set
             "log_valid_every": 1,  # How frequently to evaluate on valid set (must be multiple of log_freq)
             "log_valid_metrics": [
                 "accuracy"
             ],  # Metrics to calculate and report every `log_valid_every` units; this can include built-in and user-defined metrics
             "log_valid_metrics_func": None,  # A function or list of functions that maps a model + valid_loader to a dictionary of custom metrics
+            "log_valid_sample_size": None,  # If an int, calculate valid metrics on a fixed random subsample of this many examples, except on the first log of each epoch and for candidate best checkpoints (which use the full valid set)
+            "log_valid_sample_stratify": False,  # If True, stratify the valid subsample by label
+            "log_valid_sample_confidence": 0.95,  # The level of the (bootstrap) confidence intervals reported as "{metric}_ci" for subsampled valid metrics
+            "log_async": False,  # If True, calculate metrics on a background thread with a snapshot of the model's weights, so training continues meanwhile
+            "log_async_num_threads": 1,  # The number of threads torch may use for background metrics calculation
         },
         # LogWriter/Tensorboard (see metal/logging/writer.py for descriptions)
         "writer": None,  # [None, "json", "tensorboard"]
@@ -108,6 +130,9 @@ em_default_config = {
             "checkpoint_metric_mode": "max",  # ['max', 'min']
             "checkpoint_dir": "checkpoints",
             "checkpoint_runway": 0,
+            "checkpoint_keep": 5,  # If not None, keep only this many of the most recent checkpoint_every checkpoints on disk
+            "early_stopping_patience": None,  # If not None, stop training once checkpoint_metric has not improved (in checkpoint_metric_mode) for this many evaluations, and restore the best model
+            "early_stopping_min_delta": 0.0,  # The minimum change in checkpoint_metric that counts as an improvement for early stopping
         },
     },
 }
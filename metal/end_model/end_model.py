@@ -1,12 +1,19 @@
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
+from scipy.sparse import issparse
+
+try:
+    from torch.ao.quantization import quantize_dynamic
+except ImportError:
+    from torch.quantization import quantize_dynamic
 
 from metal.classifier import Classifier
 from metal.end_model.em_defaults import em_default_config
 from metal.end_model.identity_module import IdentityModule
 from metal.end_model.loss import SoftCrossEntropyLoss
-from metal.utils import MetalDataset, pred_to_prob, recursive_merge_dicts
+from metal.end_model.sparse_input_linear import SparseInputLinear
+from metal.utils import MetalDataset, inference_mode, recursive_merge_dicts
 
 
 class EndModel(Classifier):
@@ -50,6 +57,10 @@ class EndModel(Classifier):
         super().__init__(k=layer_out_dims[-1], config=config)
 
         self._build(input_module, middle_modules, head_module)
+        # Whether the network can be rebuilt from the config alone
+        self._custom_modules = not (
+            input_module is None and middle_modules is None and head_module is None
+        )
 
         # Show network
         if self.config["verbose"]:
@@ -57,6 +68,17 @@ class EndModel(Classifier):
             self._print()
             print()
 
+    def _get_architecture(self):
+        if type(self) is not EndModel or getattr(self, "_custom_modules", True):
+            return None
+        return {}
+
+    @classmethod
+    def _from_architecture(cls, config, architecture):
+        model = cls(**{**config, "verbose": False, "device": "cpu"})
+        model.config = config
+        return model
+
     def _build(self, input_module, middle_modules, head_module):
         """
         TBD
@@ -109,7 +131,7 @@ class EndModel(Classifier):
         middle_layers = nn.ModuleList()
         for i in range(num_mid_layers):
             if middle_modules is None:
-                module = nn.Linear(*layer_out_dims[i : i + 2])
+                module = self._make_linear(i, *layer_out_dims[i : i + 2])
                 output_dim = layer_out_dims[i + 1]
             else:
                 module = middle_modules[i]
@@ -125,13 +147,24 @@ class EndModel(Classifier):
 
     def _build_task_head(self, head_module):
         if head_module is None:
-            head = nn.Linear(self.config["layer_out_dims"][-2], self.k)
+            num_layers = len(self.config["layer_out_dims"])
+            head = self._make_linear(
+                num_layers - 2, self.config["layer_out_dims"][-2], self.k
+            )
         else:
             # Note that if head module is provided, it must have input dim of
             # the last middle module and output dim of self.k, the cardinality
             head = head_module
         return head
 
+    def _make_linear(self, i, input_dim, output_dim):
+        """Returns a default linear layer for layer i; the first layer also
+        accepts torch.sparse input (e.g., from a scipy.sparse X)"""
+        if i == 0:
+            return SparseInputLinear(input_dim, output_dim)
+        else:
+            return nn.Linear(input_dim, output_dim)
+
     def _make_layer(self, module, prefix, layer_config, output_dim=None):
         if isinstance(module, IdentityModule):
             return module
@@ -177,25 +210,35 @@ class EndModel(Classifier):
         self.config = recursive_merge_dicts(self.config, update_dict)
 
     def _preprocess_Y(self, Y, k):
-        """Convert Y to prob labels if necessary"""
+        """Convert Y to an [n] tensor of int labels or [n, k] tensor of probs
+
+        Note that int labels are not converted to one-hot probs, since
+        SoftCrossEntropyLoss handles them directly (and faster).
+        """
         Y = Y.clone()
 
-        # If preds, convert to probs
+        # If preds, make sure they are an n-dim tensor of ints
         if Y.dim() == 1 or Y.shape[1] == 1:
-            Y = pred_to_prob(Y.long(), k=k)
+            Y = Y.view(-1).long()
         return Y
 
+    def _accepts_sparse_input(self):
+        return getattr(get_input_module(self.network), "accepts_sparse_input", False)
+
     def _create_dataset(self, *data):
-        return MetalDataset(*data)
+        X, Y = data
+        return MetalDataset(self._densify_sparse_input(X), Y)
 
     def _get_loss_fn(self):
         criteria = self.criteria.to(self.config["device"])
         # This self.preprocess_Y allows us to not handle preprocessing
         # in a custom dataloader, but decreases speed a bit
-        loss_fn = lambda X, Y: criteria(self.forward(X), self._preprocess_Y(Y, self.k))
+        loss_fn = lambda X, Y: criteria(self(X), self._preprocess_Y(Y, self.k))
         return loss_fn
 
-    def train_model(self, train_data, valid_data=None, log_writer=None, **kwargs):
+    def train_model(
+        self, train_data, valid_data=None, log_writer=None, restore_state={}, **kwargs
+    ):
         self.config = recursive_merge_dicts(self.config, kwargs)
 
         # If train_data is provided as a tuple (X, Y), we can make sure Y is in
@@ -214,9 +257,141 @@ class EndModel(Classifier):
 
         # Execute training procedure
         self._train_model(
-            train_loader, loss_fn, valid_data=valid_data, log_writer=log_writer
+            train_loader,
+            loss_fn,
+            valid_data=valid_data,
+            log_writer=log_writer,
+            restore_state=restore_state,
+        )
+
+    def export_quantized(
+        self, destination, data, metric="accuracy", tolerance=0.01, **kwargs
+    ):
+        """Saves a copy of the model with dynamic int8 quantization for CPU serving
+
+        The weights of the nn.Linear and nn.LSTM layers (e.g., the middle and
+        head layers, and those of an LSTMModule) are quantized to int8, and
+        their activations are quantized on the fly at inference time, which
+        makes these layers about 4x smaller and typically faster on CPU. This
+        includes the first linear layer (a SparseInputLinear), so the quantized
+        model densifies scipy.sparse inputs.
+
+        Before it is saved, the quantized model is scored on data, and if its
+        score is more than tolerance below that of this model, a ValueError is
+        raised instead. The copy is saved without the training components
+        (optimizer, logger, checkpointer, etc.) and can be loaded with
+        Classifier.load().
+
+        Args:
+            destination: the path to save the quantized model to
+            data: a tuple of Tensors (X,Y), a Dataset, or a DataLoader of
+                X (data) and Y (labels) for the dev split
+            metric: the (single) metric to compare the models with
+            tolerance: the maximum decrease in metric allowed
+            kwargs: passed to score() (e.g., reduce="mean" for multitask)
+
+        Returns:
+            the quantized model
+        """
+        if self.config["device"] != "cpu":
+            raise ValueError("Quantized export is only supported on CPU.")
+        self.eval()
+        # quantize_dynamic only matches the exact types of the layers
+        quantized = quantize_dynamic(
+            _swap_sparse_input_linears(self._inference_copy()),
+            {nn.Linear, nn.LSTM},
+            dtype=torch.qint8,
+            inplace=True,
         )
+        score = self.score(data, metric=metric, verbose=False, **kwargs)
+        quantized_score = quantized.score(data, metric=metric, verbose=False, **kwargs)
+        if self.config["verbose"]:
+            print(f"{metric}: {score:.3f} (fp32), {quantized_score:.3f} (int8)")
+        if score - quantized_score > tolerance:
+            raise ValueError(
+                f"Quantization reduced {metric} from {score:.3f} to "
+                f"{quantized_score:.3f}, by more than tolerance={tolerance}."
+            )
+        quantized.save(destination, format="torch")
+        return quantized
+
+    def export_scripted(self, destination=None):
+        """Returns a TorchScript module computing the model's probabilities
+
+        The module maps a batch X to the output of predict_proba() as a Tensor
+        (or, for multitask models, a t-length list of Tensors), with the
+        softmax included. It is compiled with torch.jit.script, so it runs
+        without the Python interpreter overhead of the forward pass, and it
+        keeps data-dependent behavior such as LSTMModule's sequence lengths and
+        torch.sparse input to the first layer (or a SparseLinearModule). It
+        can be loaded with torch.jit.load() without importing metal.
+
+        Custom input, middle, or head modules must themselves be compatible
+        with torch.jit.script.
+
+        Args:
+            destination: if not None, the path to save the module to
+        """
+        # The module is only for inference, so its parameters need no gradients
+        scripted = torch.jit.script(self._scriptable().requires_grad_(False))
+        if destination is not None:
+            scripted.save(destination)
+        return scripted
+
+    def _scriptable(self):
+        """Returns a copy of the network, plus softmax, for torch.jit.script"""
+        model = self._inference_copy().cpu()
+        model.eval()
+        return _ScriptedEndModel(model.network)
 
     def predict_proba(self, X):
         """Returns a [n, k] tensor of probs (probabilistic labels)."""
-        return F.softmax(self.forward(X), dim=1).data.cpu().numpy()
+        if issparse(X):
+            X = self._to_torch(X, sparse=self._accepts_sparse_input())
+        return self._predict_proba_batch(X).cpu().numpy()
+
+    def _predict_proba_batch(self, X):
+        with inference_mode(), self._autocast():
+            return F.softmax(self(X).float(), dim=1)
+
+
+def _swap_sparse_input_linears(module):
+    """Replaces the SparseInputLinear layers in module with nn.Linear layers
+    with the same parameters, returning module"""
+    for name, child in module.named_children():
+        if isinstance(child, SparseInputLinear):
+            linear = nn.Linear(
+                child.in_features, child.out_features, bias=child.bias is not None
+            )
+            linear.weight, linear.bias = child.weight, child.bias
+            setattr(module, name, linear)
+        else:
+            _swap_sparse_input_linears(child)
+    return module
+
+
+def get_input_module(module):
+    """Returns the first module (other than an IdentityModule) of the (nested)
+    lists, nn.Sequentials, and nn.ModuleLists in module that the input passes
+    through, or None if there is none"""
+    if isinstance(module, (list, nn.Sequential, nn.ModuleList)):
+        for m in module:
+            m = get_input_module(m)
+            if m is not None:
+                return m
+        return None
+    elif isinstance(module, IdentityModule):
+        return None
+    else:
+        return module
+
+
+class _ScriptedEndModel(nn.Module):
+    """The network of an EndModel followed by a softmax (see export_scripted)"""
+
+    def __init__(self, network):
+        super().__init__()
+        self.network = network
+
+    def forward(self, x):
+        return F.softmax(self.network(x), dim=1)
@@ -16,7 +16,8 @@ class SoftCrossEntropyLoss(nn.Module):
 
     Accepts:
         input: An [n, k] float tensor of prediction logits (not probabilities)
-        target: An [n, k] float tensor of target probabilities
+        target: An [n, k] float tensor of target probabilities, or an [n]
+            tensor of (int) labels in {1,...,k}
     """
 
     def __init__(self, weight=None, reduction="mean"):
@@ -31,15 +32,22 @@ class SoftCrossEntropyLoss(nn.Module):
         self.reduction = reduction
 
     def forward(self, input, target):
-        n, k = input.shape
-        # Note that t.new_zeros, t.new_full put tensor on same device as t
-        cum_losses = input.new_zeros(n)
-        for y in range(k):
-            cls_idx = input.new_full((n,), y, dtype=torch.long)
-            y_loss = F.cross_entropy(input, cls_idx, reduction="none")
+        # Compute the loss in float32 even if the logits are in a lower
+        # precision (e.g., under bf16 autocast)
+        input = input.float()
+        if target.dim() == 1:
+            # Hard (int) labels in {1,...,k}: use the standard cross entropy
+            cum_losses = F.cross_entropy(
+                input, target.long() - 1, weight=self.weight, reduction="none"
+            )
+        else:
+            # Fold the class weights into the targets and take a single
+            # log_softmax rather than computing one cross entropy per class
+            target = target.float()
             if self.weight is not None:
-                y_loss = y_loss * self.weight[y]
-            cum_losses += target[:, y].float() * y_loss
+                target = target * self.weight
+            cum_losses = -(target * F.log_softmax(input, dim=1)).sum(dim=1)
+
         if self.reduction == "none":
             return cum_losses
         elif self.reduction == "mean":
@@ -0,0 +1,22 @@
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+
+class SparseInputLinear(nn.Linear):
+    """A linear layer that also accepts [n, d] torch.sparse inputs
+
+    Sparse inputs (e.g., batches of a scipy.sparse feature matrix) are
+    multiplied by the weights with a sparse-dense matmul, so they never need
+    to be densified; dense inputs are handled exactly as in nn.Linear.
+    """
+
+    accepts_sparse_input = True
+
+    def forward(self, x):
+        if not x.is_sparse:
+            return F.linear(x, self.weight, self.bias)
+        x = x.to(self.weight.dtype)
+        if self.bias is None:
+            return torch.sparse.mm(x, self.weight.t())
+        return torch.sparse.addmm(self.bias.expand(x.shape[0], -1), x, self.weight.t())
@@ -1,4 +1,13 @@
-from .baselines import MajorityClassVoter, MajorityLabelVoter, RandomVoter
-from .label_model import LabelModel
+from metal.lazy_imports import lazy_attributes
 
 __all__ = ["MajorityClassVoter", "MajorityLabelVoter", "RandomVoter", "LabelModel"]
+
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "MajorityClassVoter": ".baselines",
+        "MajorityLabelVoter": ".baselines",
+        "RandomVoter": ".baselines",
+        "LabelModel": ".label_model",
+    },
+)
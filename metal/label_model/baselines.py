@@ -1,4 +1,5 @@
 import numpy as np
+from scipy.sparse import csr_matrix, issparse
 
 from metal.label_model.label_model import LabelModel
 
@@ -58,18 +59,82 @@ class MajorityLabelVoter(RandomVoter):
     Note that in the case of ties, non-integer probabilities are possible.
     """
 
-    def train_model(self, *args, **kwargs):
-        pass
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lf_weights = None
 
-    def predict_proba(self, L):
-        L = self._to_numpy(L).astype(int)
-        n, m = L.shape
+    def _get_architecture(self):
+        if type(self) is not MajorityLabelVoter:
+            return None
+        lf_weights = self.lf_weights
+        if lf_weights is not None:
+            lf_weights = np.asarray(lf_weights, dtype=float).ravel().tolist()
+        return {"k": self.k, "lf_weights": lf_weights}
+
+    @classmethod
+    def _from_architecture(cls, config, architecture):
+        model = super()._from_architecture(config, {"k": architecture["k"]})
+        model.lf_weights = architecture["lf_weights"]
+        return model
+
+    def train_model(self, *args, lf_weights=None, **kwargs):
+        """
+        Args:
+            lf_weights: An optional [m] arraylike of per-LF vote weights (e.g.,
+                log-odds of estimated LF accuracies); if None, each
+                non-abstaining vote counts once.
+        """
+        self.lf_weights = lf_weights
+
+    def predict_proba(self, L, lf_weights=None, chunk_size=100000):
+        """
+        Args:
+            L: An [n, m] scipy.sparse matrix of labels
+            lf_weights: An optional [m] arraylike of per-LF vote weights; if
+                None, the weights passed to train_model() (if any) are used.
+            chunk_size: The number of rows of L to count votes for at once
+        Returns:
+            output: A [n, k] np.ndarray of probabilistic labels
+        """
+        if lf_weights is None:
+            lf_weights = self.lf_weights
+        if lf_weights is not None:
+            lf_weights = np.asarray(lf_weights, dtype=float).ravel()
+            if lf_weights.shape[0] != L.shape[1]:
+                raise ValueError(f"lf_weights must have shape {L.shape[1]}.")
+        if not issparse(L):
+            L = self._to_numpy(L)
+
+        n = L.shape[0]
         Y_p = np.zeros((n, self.k))
-        for i in range(n):
-            counts = np.zeros(self.k)
-            for j in range(m):
-                if L[i, j]:
-                    counts[L[i, j] - 1] += 1
-            Y_p[i, :] = np.where(counts == max(counts), 1, 0)
+        for start in range(0, n, chunk_size):
+            end = min(start + chunk_size, n)
+            Y_p[start:end] = self._vote_chunk(csr_matrix(L[start:end]), lf_weights)
+        return Y_p
+
+    def _vote_chunk(self, L, lf_weights):
+        """Counts (weighted) votes per class for a chunk of rows of a CSR label
+        matrix, returning the normalized [n_chunk, k] majority indicator."""
+        n = L.shape[0]
+        rows = np.repeat(np.arange(n), np.diff(L.indptr))
+        votes = L.data.astype(int)
+
+        # Drop any explicitly stored abstains
+        mask = votes != 0
+        rows, cols, votes = rows[mask], L.indices[mask], votes[mask]
+        if np.any(votes < 0) or np.any(votes > self.k):
+            raise ValueError(f"L must have values in {{0,1,...,{self.k}}}.")
+
+        bins = rows * self.k + votes - 1
+        counts = np.bincount(bins, minlength=n * self.k).reshape(n, self.k)
+        if lf_weights is not None:
+            # Classes without votes can't win, even if all weighted vote totals
+            # are negative (e.g., log-odds of LFs worse than chance)
+            weighted = np.bincount(
+                bins, weights=lf_weights[cols], minlength=n * self.k
+            ).reshape(n, self.k)
+            counts = np.where(counts > 0, weighted, -np.inf)
+
+        Y_p = np.where(counts == counts.max(axis=1).reshape(-1, 1), 1.0, 0.0)
         Y_p /= Y_p.sum(axis=1).reshape(-1, 1)
         return Y_p
@@ -1,6 +1,3 @@
-import networkx as nx
-
-
 def get_clique_tree(nodes, edges):
     """Given a set of int nodes i and edges (i,j), returns an nx.Graph object G
     which is a clique tree, where:
@@ -12,6 +9,8 @@ def get_clique_tree(nodes, edges):
     Note: This method is currently only implemented for chordal graphs; TODO:
     add a step to triangulate non-chordal graphs.
     """
+    import networkx as nx
+
     # Form the original graph G1
     G1 = nx.Graph()
     G1.add_nodes_from(nodes)
@@ -28,6 +28,41 @@ class LabelModel(Classifier):
         config = recursive_merge_dicts(lm_default_config, kwargs)
         super().__init__(k, config)
 
+    def _get_architecture(self):
+        if type(self) is not LabelModel:
+            return None
+        architecture = {"k": self.k}
+        # A trained model also needs the shapes of its params and the
+        # constants that predict_proba() uses
+        if hasattr(self, "mu"):
+            architecture.update(
+                {
+                    "m": self.m,
+                    "d": self.d,
+                    "deps": [list(dep) for dep in self.deps],
+                    "p": self.p.tolist(),
+                    "inv_form": self.inv_form,
+                }
+            )
+        return architecture
+
+    @classmethod
+    def _from_architecture(cls, config, architecture):
+        k = architecture["k"]
+        model = cls(k=k, **{**config, "verbose": False, "device": "cpu"})
+        model.config = config
+        if "d" in architecture:
+            model._set_class_balance(architecture["p"], None)
+            model.m = architecture["m"]
+            model.t = 1
+            model._set_dependencies([tuple(dep) for dep in architecture["deps"]])
+            model.d = architecture["d"]
+            model.inv_form = architecture["inv_form"]
+            model.mu = nn.Parameter(torch.zeros(model.d, k))
+            if model.inv_form:
+                model.Z = nn.Parameter(torch.zeros(model.d, k))
+        return model
+
     def _check_L(self, L):
         """Run some basic checks on L."""
         # TODO: Take this out?
@@ -256,6 +291,10 @@ class LabelModel(Classifier):
         Args:
             L: An [n,m] scipy.sparse label matrix with values in {0,1,...,k}
         """
+        # Batches of L are passed in as (possibly torch.sparse) torch.Tensors
+        # when scoring
+        if isinstance(L, torch.Tensor):
+            L = self._to_numpy(L)
         self._set_constants(L)
 
         L_aug = self._get_augmented_label_matrix(L)
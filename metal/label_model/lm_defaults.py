@@ -35,6 +35,7 @@ lm_default_config = {
             "log_train_every": 1,  # How often train loss is reported
             "log_train_metrics": ["train/loss"],
             "log_train_metrics_func": None,
+            "log_train_online": True,
             "log_valid_every": 0,
             "log_valid_metrics": [],
             "log_valid_metrics_func": None,
@@ -0,0 +1,35 @@
+"""Lazy (PEP 562) attributes for the metal packages
+
+Importing e.g. metal.end_model imports torch, which takes seconds, so the
+packages only import their submodules when one of their attributes is first
+accessed; e.g., `import metal` is nearly free, and `from metal import
+MajorityLabelVoter` only imports what the label model needs.
+"""
+import importlib
+
+
+def lazy_attributes(package, attributes):
+    """Returns the __getattr__ and __dir__ functions for a lazy package
+
+    Args:
+        package: the name of the package (i.e., its __name__)
+        attributes: a dict mapping each attribute name to the (relative) name
+            of the submodule to import it from
+
+    Example:
+        __getattr__, __dir__ = lazy_attributes(__name__, {"EndModel": ".end_model"})
+    """
+
+    def __getattr__(name):
+        if name not in attributes:
+            raise AttributeError(f"module {package!r} has no attribute {name!r}")
+        module = importlib.import_module(attributes[name], package)
+        value = getattr(module, name)
+        # Cache the attribute, so that __getattr__ is only called once for it
+        setattr(importlib.import_module(package), name, value)
+        return value
+
+    def __dir__():
+        return sorted(set(vars(importlib.import_module(package))) | set(attributes))
+
+    return __getattr__, __dir__
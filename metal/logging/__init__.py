@@ -1,6 +1,22 @@
-from .checkpointer import Checkpointer
-from .logger import Logger, Timer
-from .tensorboard import TensorBoardWriter
-from .writer import LogWriter
+from metal.lazy_imports import lazy_attributes
 
-__all__ = ["Checkpointer", "Logger", "LogWriter", "TensorBoardWriter", "Timer"]
+__all__ = [
+    "AsyncEvaluator",
+    "Checkpointer",
+    "Logger",
+    "LogWriter",
+    "TensorBoardWriter",
+    "Timer",
+]
+
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "AsyncEvaluator": ".async_evaluator",
+        "Checkpointer": ".checkpointer",
+        "Logger": ".logger",
+        "LogWriter": ".writer",
+        "TensorBoardWriter": ".tensorboard",
+        "Timer": ".logger",
+    },
+)
@@ -0,0 +1,94 @@
+import copy
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+
+class AsyncEvaluator(object):
+    """Calculates metrics on a background thread while training continues
+
+    At each log, the weights of the model are copied into a shadow copy of
+    the model, which the metrics are then calculated with on a worker thread.
+    The states of the optimizer and lr_scheduler are saved at the same time,
+    so that a checkpoint made from the results matches the shadow weights.
+    At most one calculation is in flight at a time: submitting a new one waits
+    for the previous one to finish.
+
+    Note that if metrics are calculated by iterating over a shuffled
+    DataLoader (e.g., the train loader, for custom train metrics or with
+    log_train_online=False), the shuffling draws from the global torch RNG on
+    the worker thread, so training is no longer exactly reproducible.
+
+    Args:
+        model: the Classifier being trained
+        num_threads: the number of threads for torch to use on the worker
+            thread (the training thread's setting is unaffected)
+    """
+
+    def __init__(self, model, num_threads=1):
+        self.shadow = model._inference_copy()
+        self.shadow.eval()
+        self.executor = ThreadPoolExecutor(
+            max_workers=1, initializer=torch.set_num_threads, initargs=(num_threads,)
+        )
+        self.optimizer = None
+        self.lr_scheduler = None
+        self.future = None
+        self.info = None
+
+    def snapshot(self, model):
+        """Copies the weights of model into the shadow model and returns it
+
+        The states of model.optimizer and model.lr_scheduler are saved in
+        self.optimizer and self.lr_scheduler (see StateSnapshot).
+
+        This must not be called while a calculation is in flight (see
+        collect()), since that calculation is using the shadow model.
+        """
+        if self.future is not None:
+            raise Exception("Cannot snapshot while a calculation is in flight.")
+        with torch.no_grad():
+            self.shadow.load_state_dict(model.state_dict())
+        self.optimizer = StateSnapshot(model.optimizer)
+        self.lr_scheduler = (
+            StateSnapshot(model.lr_scheduler) if model.lr_scheduler else None
+        )
+        return self.shadow
+
+    def submit(self, calculate, info=None):
+        """Starts calculate() (which must use the shadow model) in the
+        background; info is returned with its results by collect()"""
+        self.future = self.executor.submit(calculate)
+        self.info = info
+
+    def collect(self, wait=False):
+        """Returns the (metrics_dict, info) of the calculation in flight if it
+        has finished (or wait=True), else None"""
+        if self.future is None or not (wait or self.future.done()):
+            return None
+        metrics_dict = self.future.result()
+        results = (metrics_dict, self.info)
+        self.future = None
+        self.info = None
+        return results
+
+    def close(self):
+        """Waits for any calculation in flight and shuts down the worker
+
+        Returns:
+            The uncollected (metrics_dict, info), if any, else None
+        """
+        results = self.collect(wait=True)
+        self.executor.shutdown()
+        return results
+
+
+class StateSnapshot(object):
+    """A frozen copy of the state_dict() of an optimizer or lr_scheduler, which
+    may be passed to Checkpointer.checkpoint() in its place"""
+
+    def __init__(self, obj):
+        self.state = copy.deepcopy(obj.state_dict())
+
+    def state_dict(self):
+        return self.state
@@ -1,4 +1,7 @@
+import copy
 import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 import torch
 
@@ -11,18 +14,45 @@ class Checkpointer(object):
             checkpoint_runway (int): don't save any checkpoints for the first
                 this many iterations
             checkpoint_dir (str): the directory for saving checkpoints
+            checkpoint_keep (int): keep only this many of the most recent
+                periodic (checkpoint_every) checkpoints on disk; if None, keep
+                all of them
+            early_stopping_patience (int): if not None, stop training once
+                checkpoint_metric has not improved for this many evaluations
+            early_stopping_min_delta (float): the minimum change in
+                checkpoint_metric that counts as an improvement for early
+                stopping
+
+        The state of the best model is kept in memory, and all checkpoints are
+        written to disk on a background thread (via a temporary file that is
+        then renamed, so a checkpoint file is never partially written).
         """
         self.best_model_found = None
         self.best_iteration = None
         self.best_score = None
+        self.best_state = None
         self.verbose = verbose
 
+        # Background writing of checkpoints to disk
+        self.executor = None
+        self.pending = []
+        self.last_iteration = None
+        self.checkpoint_paths = []
+
         self.checkpoint_best = config["checkpoint_best"]
         self.checkpoint_every = config["checkpoint_every"]
         self.checkpoint_metric = config["checkpoint_metric"]
         self.checkpoint_metric_mode = config["checkpoint_metric_mode"]
         self.checkpoint_dir = config["checkpoint_dir"]
         self.checkpoint_runway = config["checkpoint_runway"]
+        self.checkpoint_keep = config.get("checkpoint_keep", None)
+
+        # Early stopping
+        self.patience = config.get("early_stopping_patience", None)
+        self.min_delta = config.get("early_stopping_min_delta", 0.0)
+        self.patience_score = None
+        self.patience_count = 0
+        self.patience_iteration = None
 
         # If abbreviated metric name was used, expand here to valid/ by default
         if "/" not in self.checkpoint_metric:
@@ -48,12 +78,17 @@ class Checkpointer(object):
             self.checkpoint_every
             and iteration > 0
             and iteration % self.checkpoint_every == 0
+            and iteration != self.last_iteration
         ):
             # Save the checkpoint regardless of performance
+            self.last_iteration = iteration
             score = None
             state = self.bundle_state(iteration, score, model, optimizer, lr_scheduler)
             checkpoint_path = f"{self.checkpoint_dir}/model_checkpoint_{iteration}.pth"
-            torch.save(state, checkpoint_path)
+            self._write(state, checkpoint_path, periodic=True)
+
+        if self.patience is not None and self.checkpoint_metric in metrics_dict:
+            self._update_patience(metrics_dict[self.checkpoint_metric], iteration)
 
         if self.checkpoint_best and self.checkpoint_metric in metrics_dict:
             score = metrics_dict[self.checkpoint_metric]
@@ -67,20 +102,80 @@ class Checkpointer(object):
                 self.best_iteration = iteration
                 self.best_score = score
 
-                # Save the checkpoint, overriding previous best if it exists
-                state = self.bundle_state(
+                # Keep the best state in memory, and save it to disk as well,
+                # overriding the previous best if it exists
+                self.best_state = self.bundle_state(
                     iteration, score, model, optimizer, lr_scheduler
                 )
                 checkpoint_path = f"{self.checkpoint_dir}/best_model.pth"
-                torch.save(state, checkpoint_path)
+                self._write(self.best_state, checkpoint_path)
+
+    def _write(self, state, path, periodic=False):
+        """Saves state to path on a background thread"""
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1)
+        # Bound the number of states waiting to be written
+        self.pending = [f for f in self.pending if not f.done()]
+        while len(self.pending) > 1:
+            self.pending.pop(0).result()
+        self.pending.append(self.executor.submit(self._save, state, path, periodic))
+
+    def _save(self, state, path, periodic):
+        # Write to a unique temporary file in the same directory, so that the
+        # rename is atomic and no other writer uses the same file
+        fd, tmp_path = tempfile.mkstemp(
+            suffix=".tmp", prefix=os.path.basename(path), dir=os.path.dirname(path)
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                torch.save(state, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        # Remove all but the most recent checkpoint_keep periodic checkpoints
+        if periodic:
+            self.checkpoint_paths.append(path)
+            if self.checkpoint_keep is not None:
+                while len(self.checkpoint_paths) > self.checkpoint_keep:
+                    old_path = self.checkpoint_paths.pop(0)
+                    if os.path.exists(old_path):
+                        os.remove(old_path)
+
+    def flush(self):
+        """Waits for all checkpoints to be written to disk"""
+        while self.pending:
+            self.pending.pop(0).result()
+
+    def close(self):
+        """Writes all pending checkpoints to disk and releases the background
+        writer and the in-memory copy of the best model state"""
+        self.flush()
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        self.best_state = None
+
+    def is_best_candidate(self, metrics_dict, iteration):
+        """Returns True if metrics_dict would produce a new best checkpoint"""
+        if self.checkpoint_runway and iteration < self.checkpoint_runway:
+            return False
+        if not self.checkpoint_best or self.checkpoint_metric not in metrics_dict:
+            return False
+        return self.is_best(metrics_dict[self.checkpoint_metric])
 
     def is_best(self, score):
-        if self.best_score is None:
+        return self._is_better(score, self.best_score)
+
+    def _is_better(self, score, reference, min_delta=0.0):
+        """Returns True if score improves on reference by more than min_delta"""
+        if reference is None:
             return True
         elif self.checkpoint_metric_mode == "max":
-            return score > self.best_score
+            return score > reference + min_delta
         elif self.checkpoint_metric_mode == "min":
-            return score < self.best_score
+            return score < reference - min_delta
         else:
             msg = (
                 f"Did not recognize checkpoint_metric_mode: "
@@ -88,12 +183,28 @@ class Checkpointer(object):
             )
             raise ValueError(msg)
 
+    def _update_patience(self, score, iteration):
+        # Count each iteration at most once
+        if iteration == self.patience_iteration:
+            return
+        self.patience_iteration = iteration
+        if self._is_better(score, self.patience_score, self.min_delta):
+            self.patience_score = score
+            self.patience_count = 0
+        else:
+            self.patience_count += 1
+
+    def should_stop(self):
+        """Returns True if training should stop early"""
+        return self.patience is not None and self.patience_count >= self.patience
+
     def bundle_state(self, iteration, score, model, optimizer, lr_scheduler):
-        # Save the state of the best model
+        # Copy the state of the model, since it will be saved in the background
+        # (and possibly kept in memory) while training continues
         state = {
             "iteration": iteration,
-            "model": model.state_dict(),
-            "optimizer": optimizer.state_dict(),
+            "model": copy.deepcopy(model.state_dict()),
+            "optimizer": copy.deepcopy(optimizer.state_dict()),
             "lr_scheduler": lr_scheduler.state_dict() if lr_scheduler else None,
             "score": score,
         }
@@ -113,14 +224,18 @@ class Checkpointer(object):
                 f"Restoring best model from iteration {self.best_iteration} "
                 f"with score {self.best_score:.3f}"
             )
+        state = self.best_state
+        if state is None:
+            # E.g., if training was resumed from a checkpoint
+            self.flush()
             state = torch.load(
                 f"{self.checkpoint_dir}/best_model.pth",
                 map_location=torch.device("cpu"),
             )
-            self.best_iteration = state["best_iteration"]
-            self.best_score = state["best_score"]
-            model.load_state_dict(state["model"])
-            return model
+        self.best_iteration = state["best_iteration"]
+        self.best_score = state["best_score"]
+        model.load_state_dict(state["model"])
+        return model
 
     def restore(self, destination):
         state = torch.load(f"{destination}")
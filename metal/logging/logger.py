@@ -1,7 +1,19 @@
 import time
 from collections import defaultdict
 
+import numpy as np
+import torch
+import torch.nn.functional as F
+from torch.utils.data import DataLoader, Subset
+
 from metal.metrics import METRICS as standard_metric_names, metric_score
+from metal.utils import TensorBatchLoader
+
+# The number of bootstrap resamples used for valid sample confidence intervals
+N_BOOTSTRAP = 200
+
+# The number of probability bins used to approximate the online train roc-auc
+N_ROC_AUC_BINS = 1000
 
 
 class Logger(object):
@@ -34,6 +46,21 @@ class Logger(object):
         # Calculate how many log_train steps to take per log_valid steps
         self.valid_every_X = self._calculate_valid_frequency()
 
+        # In online mode, standard train metrics are calculated from the outputs
+        # of the training forward passes (see add_train_batch()) rather than by
+        # re-predicting on the full train set
+        self.log_train_online = self.config.get("log_train_online", False)
+        self.record_train_outputs = self.log_train_online and bool(
+            self._get_standard_metrics(self.log_train_metrics)
+        )
+        self.train_stats = None
+
+        # Optionally calculate valid metrics on a fixed subsample of the valid
+        # set, except on the first log after each epoch ends
+        self.valid_sample_size = self.config.get("log_valid_sample_size", None)
+        self.valid_sample_loader = None
+        self.full_valid_epoch = 0
+
     def check(self, batch_size):
         """Returns True if the logging frequency has been met."""
         self.increment(batch_size)
@@ -61,8 +88,34 @@ class Logger(object):
         else:
             raise Exception(f"Unrecognized log_unit: {self.log_unit}")
 
-    def calculate_metrics(self, model, train_loader, valid_loader, metrics_dict):
-        """Add standard and custom metrics to metrics_dict"""
+    def calculate_metrics(
+        self, model, train_loader, valid_loader, metrics_dict, full_valid_check=None
+    ):
+        """Add standard and custom metrics to metrics_dict
+
+        Args:
+            model: the Classifier being trained
+            train_loader: a DataLoader for the train split
+            valid_loader: a DataLoader for the valid split, or None
+            metrics_dict: a dictionary of metrics calculated so far
+            full_valid_check: (optional) a function mapping a metrics_dict to
+                True if valid metrics calculated on a subsample of the valid
+                set should be recalculated on the full valid set (e.g., if
+                they would produce a new best checkpoint)
+        """
+        calculate = self.prepare_metrics(
+            model, train_loader, valid_loader, full_valid_check
+        )
+        return calculate()
+
+    def prepare_metrics(self, model, train_loader, valid_loader, full_valid_check=None):
+        """Returns a function that calculates the metrics for the current log
+
+        All Logger state that the calculation depends on is read (and updated)
+        here, so the returned function may be called later, e.g., on a
+        background thread while training continues. See calculate_metrics()
+        for a description of the arguments.
+        """
         # Check whether or not it's time for validation as well
         self.log_count += 1
         log_valid = (
@@ -70,37 +123,182 @@ class Logger(object):
             and self.valid_every_X
             and not (self.log_count % self.valid_every_X)
         )
+        sample_valid = log_valid and self._sample_valid(valid_loader)
+
+        # Take ownership of the statistics accumulated for online metrics
+        train_stats, self.train_stats = self.train_stats, None
+
+        def calculate():
+            metrics_dict = {}
+
+            # Calculate custom metrics
+            if self.config["log_train_metrics_func"] is not None:
+                func = self.config["log_train_metrics_func"]
+                func_list = func if isinstance(func, list) else [func]
+                for func in func_list:
+                    metrics_dict = self._calculate_custom_metrics(
+                        model, train_loader, func, metrics_dict, split="train"
+                    )
+
+            # Calculate standard metrics
+            if self.log_train_online and train_stats:
+                metrics_dict = self._calculate_online_metrics(
+                    model, train_stats, self.log_train_metrics, metrics_dict, "train"
+                )
+            else:
+                metrics_dict = self._calculate_standard_metrics(
+                    model, train_loader, self.log_train_metrics, metrics_dict, "train"
+                )
 
-        metrics_dict = {}
-
-        # Calculate custom metrics
-        if self.config["log_train_metrics_func"] is not None:
-            func = self.config["log_train_metrics_func"]
-            func_list = func if isinstance(func, list) else [func]
-            for func in func_list:
-                metrics_dict = self._calculate_custom_metrics(
-                    model, train_loader, func, metrics_dict, split="train"
+            if sample_valid:
+                if self.valid_sample_loader is None:
+                    self.valid_sample_loader = self._create_sample_loader(
+                        model, valid_loader
+                    )
+                valid_metrics = self._calculate_valid_metrics(
+                    model, self.valid_sample_loader, {}, sample=True
                 )
-        if self.config["log_valid_metrics_func"] is not None and log_valid:
+                if full_valid_check is not None and full_valid_check(
+                    {**metrics_dict, **valid_metrics}
+                ):
+                    valid_metrics = self._calculate_valid_metrics(
+                        model, valid_loader, {}
+                    )
+                metrics_dict.update(valid_metrics)
+            elif log_valid:
+                metrics_dict = self._calculate_valid_metrics(
+                    model, valid_loader, metrics_dict
+                )
+
+            return metrics_dict
+
+        return calculate
+
+    def _calculate_valid_metrics(self, model, data_loader, metrics_dict, sample=False):
+        """Add custom and standard valid metrics to metrics_dict
+
+        If sample=True, the confidence interval half-width of each standard
+        metric is added as well (e.g., "valid/accuracy_ci").
+        """
+        if self.config["log_valid_metrics_func"] is not None:
             func = self.config["log_valid_metrics_func"]
             func_list = func if isinstance(func, list) else [func]
             for func in func_list:
                 metrics_dict = self._calculate_custom_metrics(
-                    model, valid_loader, func, metrics_dict, split="valid"
+                    model, data_loader, func, metrics_dict, split="valid"
                 )
+        if sample:
+            metrics_dict = self._calculate_sample_metrics(
+                model, data_loader, self.log_valid_metrics, metrics_dict, "valid"
+            )
+        else:
+            metrics_dict = self._calculate_standard_metrics(
+                model, data_loader, self.log_valid_metrics, metrics_dict, "valid"
+            )
+        return metrics_dict
 
-        # Calculate standard metrics
-        metrics_dict = self._calculate_standard_metrics(
-            model, train_loader, self.log_train_metrics, metrics_dict, "train"
-        )
+    def _sample_valid(self, valid_loader):
+        """Returns True if valid metrics should be calculated on a subsample"""
+        if not self.valid_sample_size:
+            return False
+        if self.valid_sample_size >= len(valid_loader.dataset):
+            return False
+        # Always use the full valid set on the first log of each new epoch
+        epoch = self.example_total // self.epoch_size
+        if epoch > self.full_valid_epoch:
+            self.full_valid_epoch = epoch
+            return False
+        return True
+
+    def _create_sample_loader(self, model, data_loader):
+        """Returns a loader over a fixed random subsample of data_loader"""
+        dataset = data_loader.dataset
+        n = len(dataset)
+        rng = np.random.RandomState(getattr(model, "seed", None))
+        if self.config.get("log_valid_sample_stratify", False):
+            # Sample from each class in proportion to its frequency
+            Y = np.concatenate(
+                [self._label_array(model, Y_b) for X_b, Y_b in data_loader]
+            )
+            idxs = []
+            for y in np.unique(Y):
+                y_idxs = np.flatnonzero(Y == y)
+                size = max(1, int(round(self.valid_sample_size * len(y_idxs) / n)))
+                idxs.append(rng.choice(y_idxs, size=size, replace=False))
+            idxs = np.concatenate(idxs)
+        else:
+            idxs = rng.choice(n, size=self.valid_sample_size, replace=False)
+        subset = Subset(dataset, torch.from_numpy(np.sort(idxs)))
 
-        if log_valid:
-            metrics_dict = self._calculate_standard_metrics(
-                model, valid_loader, self.log_valid_metrics, metrics_dict, "valid"
+        if isinstance(data_loader, TensorBatchLoader):
+            return TensorBatchLoader(subset, batch_size=data_loader.batch_size)
+        else:
+            return DataLoader(
+                subset,
+                batch_size=data_loader.batch_size,
+                collate_fn=data_loader.collate_fn,
+                num_workers=data_loader.num_workers,
             )
 
+    @staticmethod
+    def _label_array(model, Y):
+        """Returns the [n] np.ndarray of labels to stratify a valid sample by
+
+        For multitask models, the labels of the first task are used.
+        """
+        if isinstance(Y, (list, tuple)):
+            Y = Y[0]
+        Y = model._to_numpy(Y)
+        if Y.ndim == 2 and Y.shape[1] > 1:
+            Y = Y.argmax(axis=1) + 1
+        return Y.reshape(-1)
+
+    def _calculate_sample_metrics(
+        self, model, data_loader, target_metrics, metrics_dict, split
+    ):
+        """Calculates standard metrics and bootstrap confidence intervals"""
+        target_standard_metrics = self._get_standard_metrics(target_metrics)
+        if not target_standard_metrics:
+            return metrics_dict
+
+        Y_p, Y, Y_s = model._get_predictions(data_loader, return_probs=True)
+        confidence = self.config.get("log_valid_sample_confidence", 0.95)
+        n = len(Y_p[0]) if model.multitask else len(Y_p)
+        rng = np.random.RandomState(getattr(model, "seed", None))
+        resamples = [rng.randint(n, size=n) for _ in range(N_BOOTSTRAP)]
+        for metric in target_standard_metrics:
+            score = self._score(model, Y_p, Y, Y_s, metric)
+            scores = [self._score(model, Y_p, Y, Y_s, metric, i) for i in resamples]
+            lower, upper = np.percentile(
+                scores, [50 * (1 - confidence), 50 * (1 + confidence)]
+            )
+            metrics_dict[self.add_split_prefix(metric, split)] = score
+            metrics_dict[self.add_split_prefix(f"{metric}_ci", split)] = float(
+                (upper - lower) / 2
+            )
         return metrics_dict
 
+    @staticmethod
+    def _score(model, Y_p, Y, Y_s, metric, idxs=None):
+        """Scores predictions (optionally at idxs), averaging over tasks for
+        multitask models as in MTClassifier.score()"""
+        if idxs is None:
+            idxs = slice(None)
+        if model.multitask:
+            task_scores = [
+                metric_score(
+                    Y[t][idxs],
+                    Y_p[t][idxs],
+                    metric,
+                    probs=Y_s[t][idxs],
+                    ignore_in_gold=[0],
+                )
+                for t in range(len(Y_p))
+            ]
+            return sum(task_scores) / len(task_scores)
+        else:
+            return metric_score(Y[idxs], Y_p[idxs], metric, probs=Y_s[idxs])
+
     def _calculate_custom_metrics(self, model, data_loader, func, metrics_dict, split):
         custom_metrics = func(model, data_loader)
         # Normalize all custom metrics to include split prefix
@@ -109,14 +307,66 @@ class Logger(object):
             metrics_dict[metric] = value
         return metrics_dict
 
-    def _calculate_standard_metrics(
-        self, model, data_loader, target_metrics, metrics_dict, split
+    def add_train_batch(self, model, outputs, Y):
+        """Accumulates the outputs of a training forward pass for online metrics
+
+        Only running sufficient statistics of each batch are kept (see
+        OnlineStats), so memory use does not grow with the logging period.
+
+        Args:
+            model: the Classifier being trained
+            outputs: the (detached) output of the model's forward pass: an
+                [n, k] Tensor of logits, or a t-length list of such Tensors
+                for multitask models
+            Y: the labels of the batch: an [n] Tensor of labels in {1,...,k} or
+                an [n, k] Tensor of probabilistic labels (or a t-length list
+                of these for multitask models)
+        """
+        if not model.multitask:
+            outputs, Y = [outputs], [Y]
+        if self.train_stats is None:
+            self.train_stats = [OnlineStats(o.shape[1]) for o in outputs]
+        for stats, outputs_t, Y_t in zip(self.train_stats, outputs, Y):
+            Y_s = F.softmax(outputs_t.float(), dim=1).cpu().numpy()
+            Y_p = model._break_ties(Y_s).astype(int)
+            # Score probabilistic labels against their most likely value
+            if Y_t.dim() == 2 and Y_t.shape[1] > 1:
+                Y_t = Y_t.argmax(dim=1) + 1
+            stats.update(Y_p, Y_t.view(-1).cpu().numpy().astype(int), Y_s)
+
+    def _calculate_online_metrics(
+        self, model, train_stats, target_metrics, metrics_dict, split
     ):
+        """Calculates standard metrics from statistics of the training batches
+
+        Note that since the model is updated after every batch, these metrics
+        are an average over the course of the logging period, not the score of
+        the current model.
+        """
+        target_standard_metrics = self._get_standard_metrics(target_metrics)
+        for metric in target_standard_metrics:
+            # Average over tasks for multitask models as in MTClassifier.score()
+            if model.multitask:
+                task_scores = [s.score(metric, ignore_in_gold=[0]) for s in train_stats]
+                score = sum(task_scores) / len(task_scores)
+            else:
+                score = train_stats[0].score(metric)
+            metrics_dict[self.add_split_prefix(metric, split)] = score
+        return metrics_dict
+
+    def _get_standard_metrics(self, target_metrics):
+        """Returns the unprefixed standard metrics among target_metrics"""
         target_standard_metrics = []
         for split_metric in target_metrics:
             metric = self.remove_split_prefix(split_metric)
             if metric in standard_metric_names:
                 target_standard_metrics.append(metric)
+        return target_standard_metrics
+
+    def _calculate_standard_metrics(
+        self, model, data_loader, target_metrics, metrics_dict, split
+    ):
+        target_standard_metrics = self._get_standard_metrics(target_metrics)
 
         # Only calculate predictions if at least one standard metric requires it
         if target_standard_metrics:
@@ -168,17 +418,29 @@ class Logger(object):
         else:
             return 0
 
-    def log(self, metrics_dict):
-        """Print calculated metrics and optionally write to file (json/tb)"""
+    def log(self, metrics_dict, totals=None):
+        """Print calculated metrics and optionally write to file (json/tb)
+
+        Args:
+            metrics_dict: a dictionary of metrics to log
+            totals: (optional) the (unit_total, example_total) at which the
+                metrics were calculated, if not the current ones (e.g., for
+                metrics calculated in the background). If provided, the
+                logging period is not reset.
+        """
+        unit_total, example_total = totals or (self.unit_total, self.example_total)
         if self.writer:
-            self.write_to_file(metrics_dict)
+            self.write_to_file(metrics_dict, unit_total)
 
         if self.verbose:
-            self.print_to_screen(metrics_dict)
-        self.reset()
+            self.print_to_screen(metrics_dict, unit_total, example_total)
+        if totals is None:
+            self.reset()
 
-    def print_to_screen(self, metrics_dict):
+    def print_to_screen(self, metrics_dict, unit_total=None, example_total=None):
         """Print all metrics in metrics_dict to screen"""
+        unit_total = self.unit_total if unit_total is None else unit_total
+        example_total = self.example_total if example_total is None else example_total
         score_strings = defaultdict(list)
         for split_metric, value in metrics_dict.items():
             split, metric = split_metric.split("/", 1)
@@ -188,9 +450,9 @@ class Logger(object):
             else:
                 score_strings[split].append(f"{metric}={value}")
 
-        header = f"{self.unit_total} {self.log_unit[:3]}"
+        header = f"{unit_total} {self.log_unit[:3]}"
         if self.log_unit != "epochs":
-            epochs = self.example_total / self.epoch_size
+            epochs = example_total / self.epoch_size
             header += f" ({epochs:0.2f} epo)"
         string = f"[{header}]:"
 
@@ -202,17 +464,99 @@ class Logger(object):
             string += f" VALID:[{valid_scores}]"
         print(string)
 
-    def write_to_file(self, metrics_dict):
+    def write_to_file(self, metrics_dict, unit_total=None):
+        unit_total = self.unit_total if unit_total is None else unit_total
         for metric, value in metrics_dict.items():
-            self.writer.add_scalar(metric, value, self.unit_total)
+            self.writer.add_scalar(metric, value, unit_total)
 
     def reset(self):
         self.unit_count = 0
         self.example_count = 0
+        self.train_stats = None
         if self.timer is not None:
             self.timer.update()
 
 
+class OnlineStats(object):
+    """Running sufficient statistics of the predictions for a single task
+
+    The standard metrics other than roc-auc depend only on the counts of each
+    (gold, pred) pair, which are kept in a [k+1, k+1] confusion matrix. For
+    roc-auc, histograms of the predicted probability of each class are kept
+    separately for the examples with and without that gold label; pairs of
+    examples falling in the same bin count as ties, so the score is accurate
+    to about 1 / N_ROC_AUC_BINS.
+    """
+
+    def __init__(self, k):
+        self.k = k
+        self.confusion = np.zeros((k + 1, k + 1), dtype=np.int64)
+        # prob_hist[y-1, 0] counts examples with gold label y; [y-1, 1] the rest
+        self.prob_hist = np.zeros((k, 2, N_ROC_AUC_BINS), dtype=np.int64)
+
+    def update(self, Y_p, Y, Y_s):
+        """Adds a batch of [n] predictions, [n] gold labels and [n, k] probs"""
+        k = self.k
+        self.confusion += np.bincount(
+            Y * (k + 1) + Y_p, minlength=(k + 1) ** 2
+        ).reshape(k + 1, k + 1)
+
+        # Like metrics.roc_auc_score(), only examples with a gold label count
+        labeled = Y > 0
+        bins = np.minimum(
+            (Y_s[labeled] * N_ROC_AUC_BINS).astype(int), N_ROC_AUC_BINS - 1
+        )
+        negative = Y[labeled].reshape(-1, 1) != np.arange(1, k + 1)
+        idxs = (np.arange(k) * 2 + negative) * N_ROC_AUC_BINS + bins
+        self.prob_hist += np.bincount(
+            idxs.reshape(-1), minlength=self.prob_hist.size
+        ).reshape(self.prob_hist.shape)
+
+    def score(self, metric, ignore_in_gold=[]):
+        """Returns the metric_score() of the accumulated predictions"""
+        if metric == "roc-auc":
+            return self._roc_auc_score()
+
+        confusion = self.confusion.copy()
+        confusion[ignore_in_gold, :] = 0
+        n = confusion.sum()
+        if not n:
+            return 0
+        if metric == "accuracy":
+            return np.trace(confusion) / n
+        elif metric == "coverage":
+            return confusion[:, 1:].sum() / n
+
+        # precision, recall, and f-scores use pos_label=1 and beta=1
+        TP = confusion[1, 1]
+        pre = TP / confusion[:, 1].sum() if TP else 0
+        rec = TP / confusion[1, :].sum() if TP else 0
+        if metric == "precision":
+            return pre
+        elif metric == "recall":
+            return rec
+        elif metric in ["f1", "fbeta"]:
+            return 2 * (pre * rec) / (pre + rec) if (pre or rec) else 0
+        else:
+            raise ValueError(f"The metric you provided ({metric}) is not supported.")
+
+    def _roc_auc_score(self):
+        """Returns the macro-averaged one-vs-rest ROC AUC over classes"""
+        scores = []
+        for positive, negative in self.prob_hist:
+            n_pos, n_neg = positive.sum(), negative.sum()
+            if not (n_pos and n_neg):
+                raise ValueError(
+                    "Only one class present in y_true. "
+                    "ROC AUC score is not defined in that case."
+                )
+            # P(positive scores above negative) + P(same bin) / 2
+            neg_below = np.cumsum(negative) - negative
+            wins = np.sum(positive * (neg_below + 0.5 * negative))
+            scores.append(wins / (n_pos * n_neg))
+        return float(np.mean(scores))
+
+
 class Timer(object):
     """Computes elapsed time."""
 
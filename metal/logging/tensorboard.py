@@ -1,5 +1,3 @@
-from tensorboardX import SummaryWriter
-
 from metal.logging.writer import LogWriter
 
 
@@ -26,7 +24,10 @@ class TensorBoardWriter(LogWriter):
             include_config=include_config,
         )
 
-        # Set up TensorBoard summary writer
+        # Set up TensorBoard summary writer (tensorboardX is only required if
+        # this writer is used)
+        from tensorboardX import SummaryWriter
+
         self.tb_writer = SummaryWriter(self.log_subdir, filename_suffix=f".{run_name}")
 
     def add_scalar(self, name, val, i):
@@ -1,5 +1,4 @@
 import numpy as np
-import sklearn.metrics as skm
 import torch
 
 from metal.utils import arraylike_to_numpy, pred_to_prob
@@ -166,7 +165,9 @@ def roc_auc_score(gold, probs, ignore_in_gold=[], ignore_in_pred=[]):
 
     # Convert gold to one-hot indicator format, using the k inferred from probs
     gold_s = pred_to_prob(torch.from_numpy(gold), k=probs.shape[1]).numpy()
-    return skm.roc_auc_score(gold_s, probs)
+    from sklearn.metrics import roc_auc_score
+
+    return roc_auc_score(gold_s, probs)
 
 
 def _drop_ignored(gold, pred, ignore_in_gold, ignore_in_pred):
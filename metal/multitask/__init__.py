@@ -1,8 +1,4 @@
-from .utils import MultiXYDataset, MultiYDataset
-from .task_graph import TaskGraph, TaskHierarchy
-from .mt_classifier import MTClassifier
-from .mt_end_model import MTEndModel
-from .mt_label_model import MTLabelModel
+from metal.lazy_imports import lazy_attributes
 
 __all__ = [
     "MultiXYDataset",
@@ -13,3 +9,16 @@ __all__ = [
     "MTEndModel",
     "MTLabelModel",
 ]
+
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "MultiXYDataset": ".utils",
+        "MultiYDataset": ".utils",
+        "TaskGraph": ".task_graph",
+        "TaskHierarchy": ".task_graph",
+        "MTClassifier": ".mt_classifier",
+        "MTEndModel": ".mt_end_model",
+        "MTLabelModel": ".mt_label_model",
+    },
+)
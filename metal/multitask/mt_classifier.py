@@ -205,17 +205,17 @@ class MTClassifier(Classifier):
     def _create_dataset(self, *data):
         X, Y = data
         if isinstance(X, list):
-            return MultiXYDataset(X, Y)
+            return MultiXYDataset([self._densify_sparse_input(X_t) for X_t in X], Y)
         else:
-            return MultiYDataset(X, Y)
+            return MultiYDataset(self._densify_sparse_input(X), Y)
 
     @staticmethod
-    def _to_torch(Z, dtype=None):
+    def _to_torch(Z, dtype=None, sparse=False):
         """Converts a None, list, np.ndarray, or torch.Tensor to torch.Tensor"""
         if isinstance(Z, list):
-            return [Classifier._to_torch(z, dtype=dtype) for z in Z]
+            return [Classifier._to_torch(z, dtype=dtype, sparse=sparse) for z in Z]
         else:
-            return Classifier._to_torch(Z)
+            return Classifier._to_torch(Z, sparse=sparse)
 
     @staticmethod
     def _to_numpy(Z):
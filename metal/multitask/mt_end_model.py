@@ -1,5 +1,6 @@
 import copy
 from collections import defaultdict
+from typing import Dict, List
 
 import torch
 import torch.nn as nn
@@ -7,11 +8,12 @@ import torch.nn.functional as F
 
 from metal.end_model import EndModel
 from metal.end_model.em_defaults import em_default_config
+from metal.end_model.end_model import get_input_module
 from metal.end_model.identity_module import IdentityModule
 from metal.end_model.loss import SoftCrossEntropyLoss
 from metal.multitask import MTClassifier, TaskGraph
 from metal.multitask.mt_em_defaults import mt_em_default_config
-from metal.utils import recursive_merge_dicts
+from metal.utils import inference_mode, recursive_merge_dicts
 
 
 class MTEndModel(MTClassifier, EndModel):
@@ -124,7 +126,7 @@ class MTEndModel(MTClassifier, EndModel):
         middle_layers = nn.ModuleList()
         for i in range(num_mid_layers):
             if middle_modules is None:
-                module = nn.Linear(*layer_out_dims[i : i + 2])
+                module = self._make_linear(i, *layer_out_dims[i : i + 2])
                 layer = self._make_layer(
                     module,
                     "middle",
@@ -213,6 +215,15 @@ class MTEndModel(MTClassifier, EndModel):
 
         return task_head_layers
 
+    def _accepts_sparse_input(self):
+        if isinstance(self.input_layer, list):
+            return False
+        # Task heads attached to an IdentityModule input layer get the input too
+        if isinstance(self.input_layer, IdentityModule) and self.task_map.get(0):
+            return False
+        module = get_input_module([self.input_layer, *(self.middle_layers or [])])
+        return getattr(module, "accepts_sparse_input", False)
+
     def _print(self):
         print("\n--Input Layer--")
         if isinstance(self.input_layer, list):
@@ -295,17 +306,91 @@ class MTEndModel(MTClassifier, EndModel):
     def _get_loss_fn(self):
         """Returns the loss function to use in the train_model routine"""
         criteria = self.criteria.to(self.config["device"])
-        loss_fn = lambda X, Y: sum(
-            criteria(Y_tp, Y_t) for Y_tp, Y_t in zip(self.forward(X), Y)
-        )
+        loss_fn = lambda X, Y: sum(criteria(Y_tp, Y_t) for Y_tp, Y_t in zip(self(X), Y))
         return loss_fn
 
     def predict_proba(self, X):
         """Returns a list of t [n, K_t] tensors of probabilistic (float) predictions."""
-        return [
-            F.softmax(output, dim=1).data.cpu().numpy() for output in self.forward(X)
-        ]
+        return [Y_ts.cpu().numpy() for Y_ts in self._predict_proba_batch(X)]
+
+    def _predict_proba_batch(self, X):
+        with inference_mode(), self._autocast():
+            return [F.softmax(output.float(), dim=1) for output in self(X)]
+
+    def _scriptable(self):
+        """Returns a copy of the network, plus softmax, for torch.jit.script"""
+        if isinstance(self.input_layer, list):
+            raise ValueError("Scripted export does not support multiple input modules.")
+        model = self._inference_copy().cpu()
+        model.eval()
+        head_layers = [0] * self.t
+        for l, tasks in model.task_map.items():
+            for t in tasks:
+                head_layers[t] = l
+        return _ScriptedMTEndModel(
+            model.input_layer,
+            model.middle_layers or nn.ModuleList(),
+            model.heads,
+            head_layers,
+            [list(model.task_graph.parents[t]) for t in range(self.t)],
+            model.config["pass_predictions"],
+        )
 
     def predict_task_proba(self, X, t):
         """Returns an n x k matrix of probabilities for each label of task t"""
         return self.predict_proba(X)[t]
+
+
+class _ScriptedMTEndModel(nn.Module):
+    """The network of an MTEndModel followed by a softmax for each task, with
+    the head graph flattened for torch.jit.script (see export_scripted)
+
+    Args:
+        input_layer: the (single) input layer
+        middle_layers: an nn.ModuleList of the middle layers
+        heads: an nn.ModuleList of the task heads
+        head_layers: the index of the layer each task head is attached to
+        parents: the parent tasks of each task
+        pass_predictions: if True, pass the outputs of parent tasks as
+            additional input to their children
+    """
+
+    head_layers: List[int]
+    parents: List[List[int]]
+    pass_predictions: bool
+
+    def __init__(
+        self, input_layer, middle_layers, heads, head_layers, parents, pass_predictions
+    ):
+        super().__init__()
+        self.input_layer = input_layer
+        self.middle_layers = middle_layers
+        self.heads = heads
+        self.head_layers = head_layers
+        self.parents = parents
+        self.pass_predictions = pass_predictions
+
+    def forward(self, x):
+        head_outputs: Dict[int, torch.Tensor] = {}
+        x = self.input_layer(x)
+        self._apply_heads(x, 0, head_outputs)
+        i = 1
+        for layer in self.middle_layers:
+            x = layer(x)
+            self._apply_heads(x, i, head_outputs)
+            i += 1
+        return [F.softmax(head_outputs[t], dim=1) for t in range(len(self.head_layers))]
+
+    def _apply_heads(self, x, i: int, head_outputs: Dict[int, torch.Tensor]):
+        """Executes the task heads attached to layer i on its output x"""
+        t = 0
+        for head in self.heads:
+            if self.head_layers[t] == i:
+                if self.pass_predictions and len(self.parents[t]) > 0:
+                    task_input = [x]
+                    for p in self.parents[t]:
+                        task_input.append(head_outputs[p])
+                    head_outputs[t] = head(torch.stack(task_input, dim=1))
+                else:
+                    head_outputs[t] = head(x)
+            t += 1
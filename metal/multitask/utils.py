@@ -1,7 +1,8 @@
 import numpy as np
-from scipy.sparse import issparse
 from torch.utils.data import Dataset
 
+from metal.utils import num_rows, sparse_rows
+
 
 class MultiYDataset(Dataset):
     """A dataset that group each item in X with its labels for t tasks from Y
@@ -16,14 +17,16 @@ class MultiYDataset(Dataset):
         self.X = X
         self.Y = Y
         self.t = len(Y)
-        n = len(X)
+        n = num_rows(X)
         assert np.all([len(Y_t) == n for Y_t in Y])
 
     def __getitem__(self, index):
-        return tuple([self.X[index], [self.Y[t][index] for t in range(self.t)]])
+        return tuple(
+            [sparse_rows(self.X, index), [self.Y[t][index] for t in range(self.t)],]
+        )
 
     def __len__(self):
-        return len(self.X)
+        return num_rows(self.X)
 
 
 class MultiXYDataset(Dataset):
@@ -37,26 +40,20 @@ class MultiXYDataset(Dataset):
     """
 
     def __init__(self, X, Y):
-
-        # Need to convert sparse matrices to dense here
-        # TODO: Need to handle sparse matrices better overall; maybe not use
-        # Datasets for them...?
-        if issparse(X[0]):
-            X = [Xt.toarray() for Xt in X]
-
-        # Check and set data objects
+        # Note that scipy.sparse inputs are kept sparse, and converted to
+        # torch.sparse tensors one item (or batch) at a time
         self.X = X
         self.Y = Y
         self.t = len(Y)
-        self.n = len(X[0])
+        self.n = num_rows(X[0])
 
-        assert np.all([len(X_t) == self.n for X_t in X])
+        assert np.all([num_rows(X_t) == self.n for X_t in X])
         assert np.all([len(Y_t) == self.n for Y_t in Y])
 
     def __getitem__(self, index):
         return tuple(
             [
-                [self.X[t][index] for t in range(self.t)],
+                [sparse_rows(self.X[t], index) for t in range(self.t)],
                 [self.Y[t][index] for t in range(self.t)],
             ]
         )
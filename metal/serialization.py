@@ -0,0 +1,246 @@
+"""A compact, versioned, memory-mappable file format for Classifiers
+
+A file consists of:
+    MAGIC (8 bytes)
+    the length of the header (8 bytes, little-endian)
+    the header, a JSON object with the format version, the class and config of
+        the model, its architecture, and an offset table of the weights (see
+        save_model())
+    the skeleton (only for models that cannot be rebuilt from their header)
+    the weights: the raw bytes of each parameter and buffer, each aligned to
+        ALIGNMENT bytes
+
+Stock models (e.g., an EndModel without custom modules, or a LabelModel) are
+rebuilt from their class, config and architecture (see
+Classifier._get_architecture()), so loading them unpickles nothing. Other
+models (e.g., an EndModel with a custom input module) fall back to a skeleton:
+the model pickled (with torch.save()) without its weights or training
+components. Since that is a pickle, such files are as sensitive to changes in
+the versions of metal and torch as ones saved with torch.save(), and should
+only be loaded from a trusted source.
+
+When loaded with mmap=True, the weights are memory-mapped (copy-on-write)
+rather than read, so that pages of large weights (e.g., embedding tables) are
+only read from disk when used, and forked worker processes share them. This
+requires load_state_dict(assign=True) (torch>=2.1); with older versions of
+torch, the weights are copied into the model instead.
+"""
+import copy
+import importlib
+import inspect
+import io
+import json
+import random
+import struct
+import warnings
+
+import numpy as np
+import torch
+
+MAGIC = b"METALMDL"
+FORMAT_VERSION = 2
+ALIGNMENT = 64
+
+
+def is_model_file(source):
+    """Returns True if source is a path to a file in this format"""
+    with open(source, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def save_model(model, destination, exclude=()):
+    """Saves a Classifier (or other nn.Module) in this format
+
+    The header records the class and config of the model (if the config is
+    JSON-serializable) and the architecture returned by
+    model._get_architecture(). If that is None (e.g., the model has custom
+    modules), a skeleton of the model is pickled as well.
+
+    Args:
+        model: the model to save
+        destination: the path to save the model to
+        exclude: the names of attributes of model not to save (e.g., its
+            training components)
+    """
+    state_dict = model.state_dict(keep_vars=True)
+
+    # Tied weights are stored once, and loaded as the same tensor again
+    names = {}
+    tensors = {}
+    offset = 0
+    for name, tensor in state_dict.items():
+        if not isinstance(tensor, torch.Tensor) or tensor.is_sparse:
+            raise ValueError(
+                f"Cannot save {name} ({type(tensor).__name__}) in this format."
+            )
+        if id(tensor) in names:
+            tensors[name] = {"alias": names[id(tensor)]}
+            continue
+        names[id(tensor)] = name
+        nbytes = tensor.numel() * tensor.element_size()
+        tensors[name] = {
+            "dtype": str(tensor.dtype).replace("torch.", ""),
+            "shape": list(tensor.shape),
+            "offset": offset,
+            "nbytes": nbytes,
+        }
+        offset = _align(offset + nbytes)
+
+    config = getattr(model, "config", None)
+    try:
+        json.dumps(config)
+    except (TypeError, ValueError):
+        config = None
+    architecture = None
+    if config is not None and hasattr(model, "_get_architecture"):
+        architecture = model._get_architecture()
+    if architecture is None:
+        skeleton = _pickle_skeleton(model, state_dict, exclude)
+    else:
+        skeleton = b""
+    header = {
+        "format_version": FORMAT_VERSION,
+        "class": f"{type(model).__module__}.{type(model).__qualname__}",
+        "config": config,
+        "architecture": architecture,
+        "skeleton_nbytes": len(skeleton),
+        "tensors": tensors,
+    }
+    header = json.dumps(header).encode()
+
+    with open(destination, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        _pad(f)
+        f.write(skeleton)
+        _pad(f)
+        start = f.tell()
+        for name, tensor in state_dict.items():
+            info = tensors[name]
+            if "alias" in info:
+                continue
+            f.seek(start + info["offset"])
+            data = tensor.detach().cpu().contiguous().reshape(-1)
+            f.write(data.view(torch.uint8).numpy())
+        # Make sure the file extends to the end of the last (aligned) tensor
+        f.truncate(start + offset)
+
+
+def load_model(source, mmap=True):
+    """Loads a model saved with save_model()
+
+    Args:
+        source: the path to load the model from
+        mmap: if True, memory-map the weights (copy-on-write, so they can still
+            be modified, e.g. by further training) rather than reading them
+    """
+    assign = _supports_assign()
+    if mmap and not assign:
+        warnings.warn(
+            "Memory-mapping weights requires torch>=2.1; they will be copied."
+        )
+    with open(source, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{source} is not a saved metal model.")
+        (header_nbytes,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_nbytes).decode())
+        if header["format_version"] > FORMAT_VERSION:
+            raise ValueError(
+                f"{source} has format version {header['format_version']}, but "
+                f"this version of metal only supports up to {FORMAT_VERSION}."
+            )
+        f.seek(_align(f.tell()))
+        skeleton = f.read(header["skeleton_nbytes"])
+        start = _align(f.tell())
+
+        if mmap:
+            data = np.memmap(f, dtype=np.uint8, mode="c")
+        else:
+            f.seek(start)
+            data = np.frombuffer(bytearray(f.read()), dtype=np.uint8)
+            start = 0
+
+    if header.get("architecture") is not None:
+        model = _rebuild(header["class"], header["config"], header["architecture"])
+    elif not assign:
+        raise ValueError(
+            f"{source} holds a model that cannot be rebuilt from its config "
+            f"(e.g., it has custom modules), and loading it requires torch>=2.1."
+        )
+    else:
+        model = torch.load(io.BytesIO(skeleton), weights_only=False)
+
+    state_dict = {}
+    for name, info in header["tensors"].items():
+        if "alias" in info:
+            continue
+        offset = start + info["offset"]
+        buffer = torch.from_numpy(data[offset : offset + info["nbytes"]])
+        dtype = getattr(torch, info["dtype"])
+        state_dict[name] = buffer.view(dtype).reshape(info["shape"])
+    for name, info in header["tensors"].items():
+        if "alias" in info:
+            state_dict[name] = state_dict[info["alias"]]
+    if assign:
+        model.load_state_dict(state_dict, assign=True)
+    else:
+        model.load_state_dict(state_dict)
+    return model
+
+
+def _supports_assign():
+    """Returns True if this version of torch supports
+    load_state_dict(assign=True), which loads tensors (e.g., memory-mapped
+    ones) as the weights of a model rather than copying them"""
+    signature = inspect.signature(torch.nn.Module.load_state_dict)
+    return "assign" in signature.parameters
+
+
+def _rebuild(class_path, config, architecture):
+    """Returns a model of the metal class at class_path, built from config and
+    architecture (see Classifier._from_architecture())"""
+    module_name, _, class_name = class_path.rpartition(".")
+    if module_name.split(".")[0] != "metal":
+        raise ValueError(f"Cannot rebuild a model of class {class_path}.")
+    cls = getattr(importlib.import_module(module_name), class_name)
+
+    # Building a Classifier seeds the global RNGs, which loading should not do
+    torch_state = torch.get_rng_state()
+    np_state = np.random.get_state()
+    random_state = random.getstate()
+    try:
+        return cls._from_architecture(config, architecture)
+    finally:
+        torch.set_rng_state(torch_state)
+        np.random.set_state(np_state)
+        random.setstate(random_state)
+
+
+def _pickle_skeleton(model, state_dict, exclude):
+    """Returns model pickled with meta (i.e., data-less) weights and without
+    the attributes in exclude"""
+    memo = {}
+    for tensor in state_dict.values():
+        meta = torch.empty_like(tensor, device="meta")
+        if isinstance(tensor, torch.nn.Parameter):
+            meta = torch.nn.Parameter(meta, requires_grad=tensor.requires_grad)
+        memo[id(tensor)] = meta
+
+    excluded = {k: model.__dict__.pop(k) for k in exclude if k in model.__dict__}
+    try:
+        skeleton = copy.deepcopy(model, memo)
+    finally:
+        model.__dict__.update(excluded)
+
+    buffer = io.BytesIO()
+    torch.save(skeleton, buffer)
+    return buffer.getvalue()
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def _pad(f):
+    f.write(b"\0" * (_align(f.tell()) - f.tell()))
@@ -0,0 +1,318 @@
+import asyncio
+import json
+import threading
+import time
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+
+
+class Histogram(object):
+    """A histogram with fixed bucket upper bounds (plus an overflow bucket)
+
+    Args:
+        bounds: the increasing upper bounds (inclusive) of the buckets
+    """
+
+    def __init__(self, bounds):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def add(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def to_dict(self):
+        """Returns the histogram as a JSON-serializable dict, where counts[i]
+        is the number of values <= bounds[i] (and > bounds[i-1]), and the last
+        count is that of values > bounds[-1]"""
+        return {
+            "bounds": self.bounds,
+            "counts": list(self.counts),
+            "count": self.count,
+            "sum": self.sum,
+        }
+
+
+class _Request(object):
+    """A predict request waiting in the queue of a PredictionServer"""
+
+    def __init__(self, rows, future):
+        self.rows = rows
+        self.future = future
+        self.start = time.perf_counter()
+
+
+class PredictionServer(object):
+    """Serves the predict_proba() of a Classifier over HTTP, in micro-batches
+
+    Requests are queued and coalesced into micro-batches: a batch is sent off
+    once it holds max_batch_size rows, or max_latency_ms after its first
+    request arrived, whichever comes first. Each batch is predicted with a
+    single predict_proba() call on a pool of worker threads, and the rows of
+    the result are scattered back to the requests.
+
+    The server runs on an asyncio event loop in a background thread (see
+    start() and stop()), and only listens on localhost by default. It has the
+    following endpoints:
+        POST /predict_proba: the body is a JSON object {"X": rows}, where rows
+            is a list of the rows of X (e.g., feature vectors for an EndModel
+            or rows of L for a LabelModel); the response is {"Y_s": probs},
+            where probs is the list of rows of predict_proba(X) (or, for a
+            multitask model, a t-length list of these)
+        GET /metrics: the numbers of requests and batches served, and
+            histograms of the request latencies (ms) and batch sizes (rows)
+
+    Example:
+        with PredictionServer(end_model, port=8000) as server:
+            ...  # POST to http://127.0.0.1:8000/predict_proba
+
+    Args:
+        model: a trained Classifier
+        host: the host to listen on
+        port: the port to listen on; if 0, a free port is used (see self.port)
+        max_batch_size: the maximum number of rows per micro-batch (a single
+            request with more rows is predicted as one batch)
+        max_latency_ms: the maximum time a request waits for its micro-batch
+            to fill up
+        num_threads: the number of worker threads calling predict_proba()
+        preprocess: a function mapping a list of rows to the input of
+            predict_proba(); by default, a float Tensor
+    """
+
+    latency_bounds = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+    batch_size_bounds = [1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096]
+
+    def __init__(
+        self,
+        model,
+        host="127.0.0.1",
+        port=0,
+        max_batch_size=64,
+        max_latency_ms=5,
+        num_threads=1,
+        preprocess=None,
+    ):
+        self.model = model
+        self.host = host
+        self.port = port
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000
+        self.num_threads = num_threads
+        self.preprocess = preprocess or self._to_tensor
+
+        self.latency_ms = Histogram(self.latency_bounds)
+        self.batch_size = Histogram(self.batch_size_bounds)
+        self.n_requests = 0
+        self.n_batches = 0
+
+        self.loop = None
+        self.thread = None
+        self.executor = None
+
+    @staticmethod
+    def _to_tensor(rows):
+        return torch.tensor(rows, dtype=torch.float)
+
+    def start(self):
+        """Starts serving in a background thread; returns once listening"""
+        if self.thread is not None:
+            raise Exception("The server has already been started.")
+        self.model.eval()
+        self.executor = ThreadPoolExecutor(max_workers=self.num_threads)
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+        errors = []
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            try:
+                self.loop.run_until_complete(self._start())
+            except Exception as e:
+                errors.append(e)
+                started.set()
+                return
+            started.set()
+            self.loop.run_forever()
+            self.loop.run_until_complete(self._stop())
+            self.loop.close()
+
+        self.thread = threading.Thread(target=run, daemon=True)
+        self.thread.start()
+        started.wait()
+        if errors:
+            self.thread.join()
+            self.thread = None
+            self.executor.shutdown()
+            raise errors[0]
+        return self
+
+    def stop(self):
+        """Stops serving, after finishing the batches in flight"""
+        if self.thread is None:
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.executor.shutdown()
+        self.thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def metrics(self):
+        """Returns the request and batch counts and histograms as a dict"""
+        return {
+            "requests": self.n_requests,
+            "batches": self.n_batches,
+            "latency_ms": self.latency_ms.to_dict(),
+            "batch_size": self.batch_size.to_dict(),
+        }
+
+    async def _start(self):
+        self.queue = asyncio.Queue()
+        self.batches = set()
+        self.connections = set()
+        self.server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.batcher = asyncio.ensure_future(self._batcher())
+
+    async def _stop(self):
+        self.server.close()
+        self.batcher.cancel()
+        if self.batches:
+            await asyncio.wait(self.batches)
+        for connection in self.connections:
+            connection.cancel()
+        await asyncio.gather(*self.connections, return_exceptions=True)
+        await self.server.wait_closed()
+
+    async def _batcher(self):
+        """Coalesces queued requests into micro-batches"""
+        loop = asyncio.get_event_loop()
+        while True:
+            batch = [await self.queue.get()]
+            n_rows = len(batch[0].rows)
+            deadline = batch[0].start + self.max_latency
+            while n_rows < self.max_batch_size:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    request = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(request)
+                n_rows += len(request.rows)
+            task = loop.create_task(self._predict(batch))
+            self.batches.add(task)
+            task.add_done_callback(self.batches.discard)
+
+    async def _predict(self, batch):
+        """Predicts a micro-batch on a worker thread and scatters the results"""
+        rows = [row for request in batch for row in request.rows]
+        self.n_batches += 1
+        self.batch_size.add(len(rows))
+        await self._predict_requests(batch, rows)
+
+    async def _predict_requests(self, batch, rows):
+        """Predicts the rows of the requests in batch together and scatters the
+        results; if this fails, the requests are predicted separately, so that
+        only the one(s) causing the error fail"""
+        loop = asyncio.get_event_loop()
+        try:
+            Y_s = await loop.run_in_executor(self.executor, self._predict_rows, rows)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0].future.set_exception(e)
+            else:
+                await asyncio.gather(
+                    *(self._predict_requests([r], r.rows) for r in batch)
+                )
+            return
+
+        start = 0
+        for request in batch:
+            end = start + len(request.rows)
+            if isinstance(Y_s, list):
+                result = [np.asarray(Y_t)[start:end].tolist() for Y_t in Y_s]
+            else:
+                result = np.asarray(Y_s)[start:end].tolist()
+            request.future.set_result(result)
+            start = end
+
+    def _predict_rows(self, rows):
+        """Returns predict_proba() of the preprocessed rows; this runs on a
+        worker thread, so that it doesn't block the event loop"""
+        return self.model.predict_proba(self.preprocess(rows))
+
+    async def _handle_connection(self, reader, writer):
+        """Handles the HTTP/1.1 requests of one (keep-alive) connection"""
+        connection = asyncio.current_task()
+        self.connections.add(connection)
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                body = await reader.readexactly(length) if length else b""
+
+                status, response = await self._route(method, path, body)
+                data = json.dumps(response).encode()
+                writer.write(
+                    (
+                        f"HTTP/1.1 {status}\r\n"
+                        "Content-Type: application/json\r\n"
+                        f"Content-Length: {len(data)}\r\n\r\n"
+                    ).encode()
+                    + data
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+            self.connections.discard(connection)
+
+    async def _route(self, method, path, body):
+        """Returns the (status, JSON response) for a request"""
+        if method == "GET" and path == "/metrics":
+            return "200 OK", self.metrics()
+        elif method == "POST" and path == "/predict_proba":
+            try:
+                rows = json.loads(body)["X"]
+                if not isinstance(rows, list) or not rows:
+                    raise ValueError("X must be a non-empty list of rows.")
+            except (ValueError, KeyError, TypeError) as e:
+                return "400 Bad Request", {"error": f"Invalid request: {e}"}
+            request = _Request(rows, asyncio.get_event_loop().create_future())
+            self.queue.put_nowait(request)
+            try:
+                Y_s = await request.future
+            except Exception as e:
+                return "500 Internal Server Error", {"error": repr(e)}
+            self.n_requests += 1
+            self.latency_ms.add((time.perf_counter() - request.start) * 1000)
+            return "200 OK", {"Y_s": Y_s}
+        else:
+            return "404 Not Found", {"error": f"Unknown endpoint: {method} {path}"}
@@ -1,4 +1,13 @@
-from .hyperband_tuner import HyperbandTuner
-from .random_tuner import RandomSearchTuner
+from metal.lazy_imports import lazy_attributes
 
-__all__ = ["HyperbandTuner", "RandomSearchTuner"]
+__all__ = ["ASHATuner", "HyperbandTuner", "RandomSearchTuner", "TPETuner"]
+
+__getattr__, __dir__ = lazy_attributes(
+    __name__,
+    {
+        "ASHATuner": ".asha_tuner",
+        "HyperbandTuner": ".hyperband_tuner",
+        "RandomSearchTuner": ".random_tuner",
+        "TPETuner": ".tpe_tuner",
+    },
+)
@@ -0,0 +1,200 @@
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from metal.tuners.tuner import ModelTuner
+
+
+class ASHATuner(ModelTuner):
+    """Performs hyperparameter search with Asynchronous Successive Halving
+
+    Reference: (https://arxiv.org/pdf/1810.05934.pdf)
+
+    Configurations are trained in rungs of increasing numbers of epochs
+    (min_epochs, min_epochs * reduction_factor, ..., up to max_epochs). Unlike
+    the synchronous rounds of HyperbandTuner, a configuration is promoted to
+    the next rung as soon as it is in the top 1/reduction_factor of the
+    configurations scored in its rung so far, and whenever no configuration
+    can be promoted, a new one is sampled (with config_generator()) to the
+    first rung. So with n_jobs > 1, no worker waits for the slowest
+    configuration of a rung, and the search time drops nearly linearly with
+    the number of workers. (The promotions then depend on the order in which
+    models finish training, so the search is not deterministic.)
+
+    Args:
+        model_class: (nn.Module class) The model class to train (uninitiated)
+        min_epochs: the number of epochs in the first rung
+        max_epochs: the maximum number of epochs of the last rung
+        reduction_factor: a configuration is promoted if it is in the top
+            1/reduction_factor of its rung
+        warm_start: if True, promoted configurations continue training from
+            the model and optimizer state they reached in the previous rung
+            (see HyperbandTuner), rather than training from scratch; note that
+            this keeps the training state of every configuration that may
+            still be promoted in memory
+        tuner_args: see ModelTuner (e.g., n_jobs, seed)
+    """
+
+    def __init__(
+        self,
+        model_class,
+        min_epochs=1,
+        max_epochs=27,
+        reduction_factor=3,
+        warm_start=True,
+        **tuner_args,
+    ):
+        super().__init__(model_class, **tuner_args)
+        self.reduction_factor = reduction_factor
+        self.warm_start = warm_start
+
+        # The number of epochs of each rung
+        self.rung_epochs = [min_epochs]
+        while self.rung_epochs[-1] * reduction_factor <= max_epochs:
+            self.rung_epochs.append(self.rung_epochs[-1] * reduction_factor)
+
+    def _get_job(self, configs):
+        """Returns the (trial, rung) to train next, by promoting a trial if
+        possible or else sampling a new one from configs, or None if neither is
+        possible"""
+        for k in reversed(range(len(self.rung_epochs) - 1)):
+            # A stable sort, so ties go to the configuration scored first
+            rung = sorted(self.rungs[k], key=lambda x: x[0], reverse=True)
+            for score, trial in rung[: len(rung) // self.reduction_factor]:
+                if trial not in self.promoted[k]:
+                    self.promoted[k].add(trial)
+                    return trial, k + 1
+        config = next(configs, None)
+        if config is None:
+            return None
+        self.trials.append(config)
+        return len(self.trials) - 1, 0
+
+    def search(
+        self,
+        search_space,
+        valid_data,
+        init_args=[],
+        train_args=[],
+        init_kwargs={},
+        train_kwargs={},
+        module_args={},
+        module_kwargs={},
+        max_search=None,
+        shuffle=True,
+        verbose=True,
+        clean_up=True,
+        seed=None,
+        **score_kwargs,
+    ):
+        """
+        Args:
+            search_space: see config_generator() documentation
+            valid_data: a tuple of Tensors (X,Y), a Dataset, or a DataLoader of
+                X (data) and Y (labels) for the dev split
+            init_args: (list) positional args for initializing the model
+            train_args: (list) positional args for training the model
+            init_kwargs: (dict) keyword args for initializing the model
+            train_kwargs: (dict) keyword args for training the model
+            module_args: (dict) Dictionary of lists of module args
+            module_kwargs: (dict) Dictionary of dictionaries of module kwargs
+            max_search: the number of configurations to sample; see
+                config_generator() documentation
+            shuffle: see config_generator() documentation
+
+        Returns:
+            best_model: the highest performing trained model (in any rung)
+
+        Note: Initialization is performed by ModelTuner instead of passing a
+        pre-initialized model so that tuning may be performed over all model
+        parameters, including the network architecture (which is defined before
+        the train loop).
+        """
+        self._clear_state(seed)
+        self.search_space = search_space
+        # The sampled configurations (trials), and for each rung, the list of
+        # (score, trial) of the trials scored in it and the set of trials
+        # promoted from it
+        self.trials = []
+        self.rungs = [[] for _ in self.rung_epochs]
+        self.promoted = [set() for _ in self.rung_epochs]
+        configs = self.config_generator(search_space, max_search, self.rng, shuffle)
+        kwargs = {
+            "init_args": init_args,
+            "train_args": train_args,
+            "init_kwargs": init_kwargs,
+            "train_kwargs": train_kwargs,
+            "module_args": module_args,
+            "module_kwargs": module_kwargs,
+            "verbose": verbose,
+            **score_kwargs,
+        }
+
+        # The training states to continue promoted trials from, by (trial, rung)
+        states = {}
+
+        def start(trial, k):
+            """Returns the idx, config, restore_state, and return_state of the
+            job training trial in rung k"""
+            config = {**self.trials[trial], "n_epochs": self.rung_epochs[k]}
+            restore_state = states.pop((trial, k - 1), None)
+            return_state = self.warm_start and k + 1 < len(self.rung_epochs)
+            return f"{k}_{trial}", config, restore_state, return_state
+
+        def finish(trial, k, score, state):
+            self.rungs[k].append((score, trial))
+            if state is not None:
+                states[(trial, k)] = state
+
+        if self.n_jobs == 1:
+            while True:
+                job = self._get_job(configs)
+                if job is None:
+                    break
+                idx, config, restore_state, return_state = start(*job)
+                score, model = self._test_model_config(
+                    idx,
+                    config,
+                    valid_data,
+                    restore_state=restore_state,
+                    return_state=return_state,
+                    **kwargs,
+                )
+                state = self._training_state(model) if return_state else None
+                finish(*job, score, state)
+        else:
+            with self._create_executor(self.n_jobs, valid_data, kwargs) as executor:
+                running = {}
+                while True:
+                    # Keep all workers busy
+                    while len(running) < self.n_jobs:
+                        job = self._get_job(configs)
+                        if job is None:
+                            break
+                        idx, config, restore_state, return_state = start(*job)
+                        future = self._submit_model_config(
+                            executor, idx, config, restore_state, return_state
+                        )
+                        running[future] = (job, idx, config)
+                    if not running:
+                        break
+
+                    # Record the finished jobs, which may allow new promotions
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job, idx, config = running.pop(future)
+                        score, state = self._record_worker_result(
+                            idx, config, future.result()
+                        )
+                        finish(*job, score, state)
+
+        if verbose:
+            print("=" * 60)
+            print("[SUMMARY]")
+            print(f"Best model: [{self.best_index}]")
+            print(f"Best config: {self.best_config}")
+            print(f"Best score: {self.best_score}")
+            print("=" * 60)
+
+        self._save_report()
+
+        # Return best model
+        return self._load_best_model(clean_up=clean_up)
@@ -16,6 +16,15 @@ class HyperbandTuner(ModelTuner):
             in search.
         hyperband_proportion_discard: proportion of configurations to discard
             in each round of Hyperband's SuccessiveHalving. An integer.
+        hyperband_warm_start: if True, the configurations kept in each round
+            of SuccessiveHalving continue training from the model and
+            optimizer state they reached in the previous round (so e.g. with a
+            (3, 8) round after a (9, 2) round, they train for 6 more epochs
+            rather than 8 from scratch). This requires a model_class whose
+            train_model() accepts a restore_state (e.g., an EndModel). Off by
+            default, since a continued configuration is scored by its best
+            epoch of the continued training only, and continues from its last
+            epoch even if it stopped early.
         log_dir: The directory in which to save intermediate results
             If no log_dir is given, the model tuner will attempt to keep
             all trained models in memory.
@@ -27,6 +36,7 @@ class HyperbandTuner(ModelTuner):
         model_class,
         hyperband_epochs_budget=200,
         hyperband_proportion_discard=3,
+        hyperband_warm_start=False,
         log_dir=None,
         run_dir=None,
         run_name=None,
@@ -51,6 +61,7 @@ class HyperbandTuner(ModelTuner):
         # Hyperband parameters
         self.hyperband_epochs_budget = hyperband_epochs_budget
         self.hyperband_proportion_discard = hyperband_proportion_discard
+        self.hyperband_warm_start = hyperband_warm_start
 
         # Given the budget, generate the largest hyperband schedule
         # within budget
@@ -214,37 +225,46 @@ class HyperbandTuner(ModelTuner):
             )
 
             # Successive Halving
+            states = [None] * len(configurations)
             for band_index, (n_i, r_i) in enumerate(bracket):
 
                 assert len(configurations) <= n_i
 
-                # Evaluate each configuration for r_i epochs
-                scored_configurations = []
-                for i, configuration in enumerate(configurations):
-
-                    cur_model_index = n_models_scored
-
-                    # Set epochs of the configuration
+                # Evaluate each configuration for r_i epochs (in total, so
+                # with warm starts, only for the epochs they have not trained
+                # yet); the training states are only needed for the next round
+                warm_start = self.hyperband_warm_start and band_index + 1 < len(bracket)
+                for configuration in configurations:
                     configuration["n_epochs"] = r_i
+                results = self._test_model_configs(
+                    [
+                        f"{bracket_index}_{band_index}_{i}"
+                        for i in range(len(configurations))
+                    ],
+                    configurations,
+                    valid_data,
+                    restore_states=states,
+                    return_states=warm_start,
+                    init_args=init_args,
+                    train_args=train_args,
+                    init_kwargs=init_kwargs,
+                    train_kwargs=train_kwargs,
+                    module_args=module_args,
+                    module_kwargs=module_kwargs,
+                    verbose=verbose,
+                    **score_kwargs,
+                )
 
-                    # Train model and get the score
-                    score, model = self._test_model_config(
-                        f"{band_index}_{i}",
-                        configuration,
-                        valid_data,
-                        init_args=init_args,
-                        train_args=train_args,
-                        init_kwargs=init_kwargs,
-                        train_kwargs=train_kwargs,
-                        module_args=module_args,
-                        module_kwargs=module_kwargs,
-                        verbose=verbose,
-                        **score_kwargs,
-                    )
+                if warm_start:
+                    scores, states = results
+                else:
+                    scores, states = results, [None] * len(configurations)
 
-                    # Add score and model to list
+                # Add scores and models to list
+                scored_configurations = []
+                for score, configuration, state in zip(scores, configurations, states):
                     scored_configurations.append(
-                        (score, cur_model_index, configuration)
+                        (score, n_models_scored, configuration, state)
                     )
                     n_models_scored += 1
 
@@ -255,6 +275,7 @@ class HyperbandTuner(ModelTuner):
                 if band_index + 1 < len(bracket):
                     n_to_keep, _ = bracket[band_index + 1]
                     configurations = [x[2] for x in scored_configurations][:n_to_keep]
+                    states = [x[3] for x in scored_configurations][:n_to_keep]
 
         print("=" * 60)
         print(f"[SUMMARY]")
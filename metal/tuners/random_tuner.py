@@ -57,20 +57,20 @@ class RandomSearchTuner(ModelTuner):
         configs = self.config_generator(search_space, max_search, self.rng, shuffle)
 
         # Commence search
-        for i, config in enumerate(configs):
-            score, model = self._test_model_config(
-                i,
-                config,
-                valid_data,
-                init_args=init_args,
-                train_args=train_args,
-                init_kwargs=init_kwargs,
-                train_kwargs=train_kwargs,
-                module_args=module_args,
-                module_kwargs=module_kwargs,
-                verbose=verbose,
-                **score_kwargs,
-            )
+        configs = list(configs)
+        self._test_model_configs(
+            list(range(len(configs))),
+            configs,
+            valid_data,
+            init_args=init_args,
+            train_args=train_args,
+            init_kwargs=init_kwargs,
+            train_kwargs=train_kwargs,
+            module_args=module_args,
+            module_kwargs=module_kwargs,
+            verbose=verbose,
+            **score_kwargs,
+        )
 
         if verbose:
             print("=" * 60)
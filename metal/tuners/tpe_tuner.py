@@ -0,0 +1,238 @@
+import math
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import numpy as np
+from scipy.stats import norm, truncnorm
+
+from metal.tuners.tuner import ModelTuner
+
+
+class TPETuner(ModelTuner):
+    """Performs hyperparameter search with a Tree-structured Parzen Estimator
+
+    Reference: Bergstra et al., Algorithms for Hyper-Parameter Optimization
+    (https://papers.nips.cc/paper/4443-algorithms-for-hyper-parameter-optimization.pdf)
+
+    After n_startup random configurations (from config_generator()), each
+    new configuration is proposed from the scores of those tried so far (see
+    self.run_stats): they are split into the top gamma fraction ("good") and
+    the rest ("bad"), the densities l(x) of the good and g(x) of the bad
+    values of each searched parameter are estimated (with Parzen windows for
+    range parameters and smoothed frequencies for lists of values), and of
+    n_candidates values sampled from l(x), the one maximizing l(x) / g(x) is
+    proposed. So the search concentrates on the regions where good scores
+    were found, typically reaching a given score in fewer trials than
+    RandomSearchTuner.
+
+    The search_space syntax is that of config_generator(); as there, range
+    parameters are searched on a linear or log scale. If n_jobs > 1, the
+    models are trained asynchronously (as in ASHATuner): whenever a worker
+    is done, the next configuration is proposed from the scores so far, so
+    the search is not deterministic.
+
+    Args:
+        model_class: (nn.Module class) The model class to train (uninitiated)
+        n_startup: the number of random configurations to try first
+        gamma: the fraction of the configurations tried so far considered good
+        n_candidates: the number of values to sample from l(x) per parameter
+        tuner_args: see ModelTuner (e.g., n_jobs, seed)
+    """
+
+    def __init__(
+        self, model_class, n_startup=10, gamma=0.25, n_candidates=24, **tuner_args
+    ):
+        super().__init__(model_class, **tuner_args)
+        self.n_startup = n_startup
+        self.gamma = gamma
+        self.n_candidates = n_candidates
+
+    def search(
+        self,
+        search_space,
+        valid_data,
+        init_args=[],
+        train_args=[],
+        init_kwargs={},
+        train_kwargs={},
+        module_args={},
+        module_kwargs={},
+        max_search=None,
+        shuffle=True,
+        verbose=True,
+        clean_up=True,
+        seed=None,
+        **score_kwargs,
+    ):
+        """
+        Args:
+            search_space: see config_generator() documentation
+            valid_data: a tuple of Tensors (X,Y), a Dataset, or a DataLoader of
+                X (data) and Y (labels) for the dev split
+            init_args: (list) positional args for initializing the model
+            train_args: (list) positional args for training the model
+            init_kwargs: (dict) keyword args for initializing the model
+            train_kwargs: (dict) keyword args for training the model
+            module_args: (dict) Dictionary of lists of module args
+            module_kwargs: (dict) Dictionary of dictionaries of module kwargs
+            max_search: (int) the total number of configurations to try
+            shuffle: see config_generator() documentation
+
+        Returns:
+            best_model: the highest performing trained model
+
+        Note: Initialization is performed by ModelTuner instead of passing a
+        pre-initialized model so that tuning may be performed over all model
+        parameters, including the network architecture (which is defined before
+        the train loop).
+        """
+        if not max_search:
+            raise ValueError("TPETuner requires max_search.")
+        self._clear_state(seed)
+        self.search_space = search_space
+        rand_state = np.random.RandomState(self.rng.randrange(2 ** 31))
+
+        # Start with (at least one) random configurations
+        n_startup = min(max(self.n_startup, 1), max_search)
+        startup = self.config_generator(search_space, n_startup, self.rng, shuffle)
+        kwargs = {
+            "init_args": init_args,
+            "train_args": train_args,
+            "init_kwargs": init_kwargs,
+            "train_kwargs": train_kwargs,
+            "module_args": module_args,
+            "module_kwargs": module_kwargs,
+            "verbose": verbose,
+            **score_kwargs,
+        }
+
+        def next_config():
+            """Returns the next config to try, or None if there is no random
+            configuration left and no score to propose one from yet"""
+            config = next(startup, None)
+            if config is None and self.run_stats:
+                config = self._propose_config(rand_state)
+            return config
+
+        if self.n_jobs == 1:
+            for idx in range(max_search):
+                self._test_model_config(idx, next_config(), valid_data, **kwargs)
+        else:
+            # As soon as a worker is done, propose its next config from all
+            # the scores so far, rather than waiting for the slowest worker
+            with self._create_executor(self.n_jobs, valid_data, kwargs) as executor:
+                running = {}
+                n_searched = 0
+                while n_searched < max_search or running:
+                    while n_searched < max_search and len(running) < self.n_jobs:
+                        config = next_config()
+                        if config is None:
+                            break
+                        future = self._submit_model_config(executor, n_searched, config)
+                        running[future] = (n_searched, config)
+                        n_searched += 1
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        idx, config = running.pop(future)
+                        self._record_worker_result(idx, config, future.result())
+
+        if verbose:
+            print("=" * 60)
+            print("[SUMMARY]")
+            print(f"Best model: [{self.best_index}]")
+            print(f"Best config: {self.best_config}")
+            print(f"Best score: {self.best_score}")
+            print("=" * 60)
+
+        self._save_report()
+
+        # Return best model
+        return self._load_best_model(clean_up=clean_up)
+
+    def _propose_config(self, rand_state):
+        """Returns the next config to try, given the scores in self.run_stats"""
+        run_stats = sorted(self.run_stats, key=lambda x: x["score"], reverse=True)
+        n_good = max(1, int(math.ceil(self.gamma * len(run_stats))))
+        good = [x["search_params"] for x in run_stats[:n_good]]
+        bad = [x["search_params"] for x in run_stats[n_good:]]
+
+        config = {}
+        for k, v in self.search_space.items():
+            if isinstance(v, dict):
+                config[k] = self._propose_range(v, good, bad, k, rand_state)
+            elif isinstance(v, list):
+                config[k] = self._propose_choice(v, good, bad, k, rand_state)
+            else:
+                config[k] = v
+        return config
+
+    def _propose_range(self, v, good, bad, k, rand_state):
+        """Returns the proposed value of the range parameter k"""
+        scale = v.get("scale", "linear")
+        if scale not in ["linear", "log"]:
+            raise ValueError(f"Unrecognized scale '{scale}' for parameter {k}")
+        log = scale == "log"
+        transform = np.log if log else np.asarray
+        low, high = transform(min(v["range"])), transform(max(v["range"]))
+
+        l = _ParzenEstimator(transform([x[k] for x in good]), low, high)
+        g = _ParzenEstimator(transform([x[k] for x in bad]), low, high)
+        candidates = l.sample(self.n_candidates, rand_state)
+        best = candidates[np.argmax(l.log_pdf(candidates) - g.log_pdf(candidates))]
+        return float(np.exp(best) if log else best)
+
+    def _propose_choice(self, v, good, bad, k, rand_state):
+        """Returns the proposed value of the list parameter k"""
+
+        def probs(params):
+            # The frequencies of each value, smoothed with a uniform prior
+            counts = np.ones(len(v))
+            for x in params:
+                counts[v.index(x[k])] += 1
+            return counts / counts.sum()
+
+        l, g = probs(good), probs(bad)
+        candidates = rand_state.choice(len(v), size=self.n_candidates, p=l)
+        best = candidates[np.argmax(np.log(l[candidates]) - np.log(g[candidates]))]
+        return v[best]
+
+
+class _ParzenEstimator(object):
+    """A density on [low, high], mixing a uniform prior with a Gaussian
+    (truncated to [low, high]) around each of the observations mus, with a
+    bandwidth of the distance to its farthest neighbor (as in hyperopt)"""
+
+    def __init__(self, mus, low, high):
+        self.low, self.high = low, high
+        self.mus = np.sort(np.asarray(mus, dtype=float))
+        width = high - low
+        if len(self.mus):
+            points = np.concatenate([[low], self.mus, [high]])
+            sigmas = np.maximum(points[1:-1] - points[:-2], points[2:] - points[1:-1])
+            self.sigmas = np.clip(sigmas, width / min(100, len(self.mus) + 1), width)
+        else:
+            self.sigmas = np.array([])
+        # The prior has the weight of one observation
+        self.weights = np.ones(len(self.mus) + 1) / (len(self.mus) + 1)
+
+    def sample(self, n, rand_state):
+        components = rand_state.choice(len(self.weights), size=n, p=self.weights)
+        samples = rand_state.uniform(self.low, self.high, size=n)
+        for i in np.unique(components[components < len(self.mus)]):
+            mask = components == i
+            mu, sigma = self.mus[i], self.sigmas[i]
+            a, b = (self.low - mu) / sigma, (self.high - mu) / sigma
+            samples[mask] = truncnorm.rvs(
+                a, b, loc=mu, scale=sigma, size=mask.sum(), random_state=rand_state
+            )
+        return samples
+
+    def log_pdf(self, x):
+        x = np.asarray(x, dtype=float)[:, None]
+        pdf = self.weights[-1] / (self.high - self.low) * np.ones(len(x))
+        if len(self.mus):
+            mass = norm.cdf(self.high, self.mus, self.sigmas) - norm.cdf(
+                self.low, self.mus, self.sigmas
+            )
+            pdfs = norm.pdf(x, self.mus, self.sigmas) / mass
+            pdf = pdf + pdfs @ self.weights[:-1]
+        return np.log(pdf)
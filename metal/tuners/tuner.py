@@ -2,11 +2,11 @@ import json
 import os
 import pickle
 import random
+from concurrent.futures import ProcessPoolExecutor
 from itertools import cycle, product
 from time import strftime, time
 
 import numpy as np
-import pandas as pd
 
 from metal.utils import recursive_merge_dicts
 
@@ -29,6 +29,8 @@ class ModelTuner(object):
         log_writer_class: a metal.utils.LogWriter class for logging the full
             model search.
         validation_metric: The metric to use in scoring and selecting models.
+        n_jobs: (int) The number of configs to train in parallel, each in its
+            own worker process (see _test_model_configs()).
 
         Saves model search logs and tuner report to 'log_dir/run_dir/run_name/.'
     """
@@ -43,11 +45,13 @@ class ModelTuner(object):
         log_writer_class=None,
         seed=None,
         validation_metric="accuracy",
+        n_jobs=1,
     ):
         self.model_class = model_class
         self.module_classes = module_classes
         self.log_writer_class = log_writer_class
         self.validation_metric = validation_metric
+        self.n_jobs = n_jobs
 
         # Set logging subdirectory + make sure exists
         self.init_date = strftime("%Y_%m_%d")
@@ -89,6 +93,13 @@ class ModelTuner(object):
         # Reset the seed
         if seed is not None:
             self.rng = random.Random(seed)
+            self.search_seed = seed
+
+    def _trial_seed(self, idx):
+        """Returns the model seed for the config with index idx, which only
+        depends on the search seed and idx (and so not on the order in which
+        configs are trained)"""
+        return random.Random(f"{self.search_seed}_{idx}").randrange(10 ** 6)
 
     def _test_model_config(
         self,
@@ -102,16 +113,181 @@ class ModelTuner(object):
         module_args={},
         module_kwargs={},
         verbose=False,
+        restore_state=None,
+        return_state=False,
+        **score_kwargs,
+    ):
+        score, model, search_params = self._train_model_config(
+            idx,
+            config,
+            valid_data,
+            init_args=init_args,
+            train_args=train_args,
+            init_kwargs=init_kwargs,
+            train_kwargs=train_kwargs,
+            module_args=module_args,
+            module_kwargs=module_kwargs,
+            verbose=verbose,
+            restore_state=restore_state,
+            return_state=return_state,
+            **score_kwargs,
+        )
+        self._record_model_config(idx, config, search_params, score, model)
+        return score, model
+
+    def _test_model_configs(
+        self,
+        idxs,
+        configs,
+        valid_data,
+        restore_states=None,
+        return_states=False,
+        **kwargs,
+    ):
+        """Trains and scores a model for each of configs, like
+        _test_model_config(), and returns their scores
+
+        If self.n_jobs > 1, the models are trained in a pool of self.n_jobs
+        worker processes, which split the cores between them (see
+        torch.set_num_threads()). The tuner, valid_data, and kwargs are sent to
+        each worker once, with their Tensors in shared memory (see
+        torch.multiprocessing), and the results and best model are recorded
+        here, in the order of configs.
+
+        Args:
+            restore_states: an optional list with a training state (see
+                Classifier._bundle_training_state()) or None per config, from
+                which to continue training the config's model rather than
+                training it from scratch
+            return_states: if True, also return the list of the training states
+                of the trained models, e.g. to continue training them later
+
+        Returns:
+            scores: the list of scores of the models
+            [Optionally: states: the list of their training states]
+        """
+        restore_states = restore_states or [None] * len(configs)
+        if self.n_jobs == 1 or len(configs) <= 1:
+            scores, states = [], []
+            for idx, config, state in zip(idxs, configs, restore_states):
+                score, model = self._test_model_config(
+                    idx,
+                    config,
+                    valid_data,
+                    restore_state=state,
+                    return_state=return_states,
+                    **kwargs,
+                )
+                scores.append(score)
+                if return_states:
+                    states.append(self._training_state(model))
+            return (scores, states) if return_states else scores
+
+        n_workers = min(self.n_jobs, len(configs))
+        scores, states = [], []
+        with self._create_executor(n_workers, valid_data, kwargs) as executor:
+            futures = [
+                self._submit_model_config(executor, idx, config, state, return_states)
+                for idx, config, state in zip(idxs, configs, restore_states)
+            ]
+            for idx, config, future in zip(idxs, configs, futures):
+                score, state = self._record_worker_result(idx, config, future.result())
+                scores.append(score)
+                states.append(state)
+        return (scores, states) if return_states else scores
+
+    def _create_executor(self, n_workers, valid_data, kwargs):
+        """Returns a pool of n_workers worker processes, which split the cores
+        between them, to train models with _submit_model_config()
+
+        Args:
+            valid_data: the valid_data of _train_model_config()
+            kwargs: the other kwargs of _train_model_config() shared by all
+                configs (e.g., train_args)
+        """
+        import torch.multiprocessing as mp
+
+        num_threads = max(1, (os.cpu_count() or 1) // n_workers)
+        return ProcessPoolExecutor(
+            n_workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self, valid_data, kwargs, num_threads),
+        )
+
+    def _submit_model_config(
+        self, executor, idx, config, restore_state=None, return_state=False
+    ):
+        """Submits training a model with config to executor (see
+        _create_executor()), returning a Future of the result to pass to
+        _record_worker_result()"""
+        return executor.submit(
+            _train_in_worker, idx, config, pickle.dumps(restore_state), return_state
+        )
+
+    def _record_worker_result(self, idx, config, result):
+        """Records the result of _submit_model_config(), returning the score
+        and training state (or None) of the model"""
+        score, model, search_params, state = result
+        # Only unpickle the models that will be saved as the best
+        if score > self.best_score:
+            model = pickle.loads(model)
+        self._record_model_config(idx, config, search_params, score, model)
+        return score, pickle.loads(state)
+
+    @staticmethod
+    def _training_state(model):
+        """Returns (and releases) the training state of a model trained with
+        return_state=True, after its last epoch (see
+        Classifier._bundle_training_state())"""
+        state = getattr(model, "training_state", None)
+        model.training_state = None
+        return state
+
+    def _train_model_config(
+        self,
+        idx,
+        config,
+        valid_data,
+        init_args=[],
+        train_args=[],
+        init_kwargs={},
+        train_kwargs={},
+        module_args={},
+        module_kwargs={},
+        verbose=False,
+        restore_state=None,
+        return_state=False,
         **score_kwargs,
     ):
+        """Trains and scores a model with config, returning the score, the
+        model, and the searched params of config
 
+        If restore_state is not None, the model's training is continued from
+        it (see Classifier._bundle_training_state()) up to the config's
+        n_epochs. If return_state is True, the model keeps its training state
+        after its last epoch, for _training_state().
+        """
         # Integrating generated config into init kwargs and train kwargs
         init_kwargs["verbose"] = verbose
         init_kwargs = recursive_merge_dicts(init_kwargs, config, misses="insert")
         train_kwargs = recursive_merge_dicts(train_kwargs, config, misses="insert")
 
+        # Give each model its own deterministic seed, unless one is given
+        if init_kwargs.get("seed") is None:
+            init_kwargs["seed"] = self._trial_seed(idx)
+
         # Also make sure train kwargs includes validation metric
         train_kwargs["validation_metric"] = self.validation_metric
+        if return_state:
+            train_kwargs["keep_training_state"] = True
+
+        # Give each model its own checkpoint directory, so that models trained
+        # in parallel don't overwrite (or prune) each other's checkpoints
+        checkpoint_dir = train_kwargs.get(
+            "checkpoint_dir", os.path.join(self.log_subdir, "checkpoints")
+        )
+        train_kwargs["checkpoint_dir"] = os.path.join(checkpoint_dir, str(idx))
 
         # Initialize modules if provided
         for module_name, module_class in self.module_classes.items():
@@ -153,6 +329,8 @@ class ModelTuner(object):
             }
             log_writer = self.log_writer_class(**writer_config)
 
+        if restore_state is not None:
+            train_kwargs["restore_state"] = restore_state
         model.train_model(
             *train_args,
             **train_kwargs,
@@ -167,7 +345,10 @@ class ModelTuner(object):
             verbose=False,  # Score is already printed in train_model above
             **score_kwargs,
         )
+        return score, model, search_params
 
+    def _record_model_config(self, idx, config, search_params, score, model):
+        """Records the score of a model, saving it if it is the best so far"""
         # If score better than best_score, save
         if score > self.best_score:
             self.best_score = score
@@ -185,7 +366,6 @@ class ModelTuner(object):
                 "score": score,
             }
         )
-        return score, model
 
     def _save_best_model(self, model):
         with open(self.save_path, "wb") as f:
@@ -208,6 +388,7 @@ class ModelTuner(object):
 
     def run_stats_df(self):
         """Returns self.run_stats over search params as pandas dataframe."""
+        import pandas as pd
 
         run_stats_df = []
         for x in self.run_stats:
@@ -349,3 +530,33 @@ class ModelTuner(object):
             for k, v in ranges.items():
                 config[k] = float(v(rng.random()))
             yield config
+
+
+# The tuner and shared search arguments of a worker process (see
+# ModelTuner._test_model_configs())
+_worker = {}
+
+
+def _init_worker(tuner, valid_data, kwargs, num_threads):
+    import torch
+
+    torch.set_num_threads(num_threads)
+    _worker["tuner"] = tuner
+    _worker["valid_data"] = valid_data
+    _worker["kwargs"] = kwargs
+
+
+def _train_in_worker(idx, config, restore_state, return_state):
+    tuner = _worker["tuner"]
+    score, model, search_params = tuner._train_model_config(
+        idx,
+        config,
+        _worker["valid_data"],
+        restore_state=pickle.loads(restore_state),
+        return_state=return_state,
+        **_worker["kwargs"],
+    )
+    state = tuner._training_state(model) if return_state else None
+    # The model and state are returned pickled, rather than with their Tensors
+    # in shared memory, since only some of them are kept
+    return score, pickle.dumps(model), search_params, pickle.dumps(state)
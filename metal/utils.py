@@ -1,3 +1,4 @@
+import contextlib
 import copy
 import random
 from collections import defaultdict
@@ -6,13 +7,16 @@ import numpy as np
 import torch
 from scipy.sparse import issparse
 from torch.utils.data import Dataset
+from torch.utils.data.dataloader import default_collate
 
 
 class MetalDataset(Dataset):
     """A dataset that group each item in X with its label from Y
 
     Args:
-        X: an n-dim iterable of items
+        X: an n-dim iterable of items, or an [n, d] scipy.sparse matrix; in the
+            latter case, X is kept sparse and each item (or batch) of rows is
+            returned as a torch.sparse tensor
         Y: a torch.Tensor of labels
             This may be predicted (int) labels [n] or probabilistic (float) labels [n, k]
     """
@@ -20,13 +24,122 @@ class MetalDataset(Dataset):
     def __init__(self, X, Y):
         self.X = X
         self.Y = Y
-        assert len(X) == len(Y)
+        assert num_rows(X) == len(Y)
 
     def __getitem__(self, index):
-        return tuple([self.X[index], self.Y[index]])
+        return tuple([sparse_rows(self.X, index), self.Y[index]])
 
     def __len__(self):
-        return len(self.X)
+        return num_rows(self.X)
+
+
+class TensorBatchLoader(object):
+    """An in-memory alternative to a DataLoader over a Dataset of Tensors
+
+    Rather than building each batch from batch_size calls to
+    dataset.__getitem__() followed by a collate, each batch is sliced out of
+    the underlying Tensors at once (one indexing op per Tensor), which
+    preserves their dtypes. This requires that dataset[idxs] accept a
+    LongTensor of indices, which holds for TensorDataset, MetalDataset,
+    MultiYDataset, and MultiXYDataset when their contents are torch.Tensors.
+
+    Args:
+        dataset: a Dataset whose contents are all torch.Tensors
+        batch_size: the (maximum) number of items per batch
+        shuffle: if True, iterate over a new random permutation each epoch
+        drop_last: if True, drop the last batch if it is incomplete
+        sampler: if not None, an iterable of the indices to load each epoch
+            (e.g., a DistributedSampler), which replaces shuffle
+
+    Other kwargs (e.g., num_workers, pin_memory) are accepted for
+    compatibility with the DataLoader config but ignored.
+    """
+
+    # The DataLoader kwargs that this loader can stand in for
+    supported_kwargs = set(
+        ["batch_size", "shuffle", "drop_last", "sampler", "num_workers", "pin_memory"]
+    )
+
+    def __init__(
+        self,
+        dataset,
+        batch_size=1,
+        shuffle=False,
+        drop_last=False,
+        sampler=None,
+        **kwargs,
+    ):
+        self.dataset = dataset
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.sampler = sampler
+
+    def __iter__(self):
+        if self.sampler is not None:
+            idxs = torch.tensor(list(self.sampler), dtype=torch.long)
+        elif self.shuffle:
+            idxs = torch.randperm(len(self.dataset))
+        else:
+            idxs = None
+        n = self._num_items()
+        for i in range(len(self)):
+            start, end = i * self.batch_size, min((i + 1) * self.batch_size, n)
+            if idxs is None:
+                yield self.dataset[start:end]
+            else:
+                yield self.dataset[idxs[start:end]]
+
+    def _num_items(self):
+        return len(self.dataset) if self.sampler is None else len(self.sampler)
+
+    def __len__(self):
+        n = self._num_items()
+        if self.drop_last:
+            return n // self.batch_size
+        else:
+            return (n + self.batch_size - 1) // self.batch_size
+
+
+def num_rows(X):
+    """Returns the number of items (rows) in X, which may be scipy.sparse"""
+    return X.shape[0] if issparse(X) else len(X)
+
+
+def sparse_rows(X, index):
+    """Returns X[index], converting the selected rows to a torch.sparse tensor
+    if X is a scipy.sparse matrix (so that X itself is never densified)"""
+    if not issparse(X):
+        return X[index]
+    if isinstance(index, torch.Tensor):
+        index = index.numpy()
+    elif isinstance(index, int):
+        index = [index]
+    return sparse_to_torch(X[index])
+
+
+def sparse_to_torch(X):
+    """Converts a scipy.sparse matrix to a (coalesced) torch.sparse tensor"""
+    X = X.tocoo()
+    indices = torch.from_numpy(np.vstack([X.row, X.col]).astype(np.int64))
+    values = torch.from_numpy(X.data)
+    return torch.sparse_coo_tensor(indices, values, X.shape).coalesce()
+
+
+def sparse_collate_fn(batch):
+    """A collate_fn for DataLoaders over datasets with scipy.sparse inputs
+
+    Concatenates the [1, d] torch.sparse rows of each item into a single
+    [batch_size, d] torch.sparse tensor, and otherwise defers to the default
+    collate_fn.
+    """
+    elem = batch[0]
+    if isinstance(elem, torch.Tensor) and elem.is_sparse:
+        return torch.cat(batch, dim=0)
+    elif isinstance(elem, (tuple, list)):
+        return [sparse_collate_fn(samples) for samples in zip(*batch)]
+    else:
+        return default_collate(batch)
 
 
 def rargmax(x, eps=1e-8):
@@ -59,8 +172,7 @@ def pred_to_prob(Y_h, k):
     assert (Y_h <= k).all()
     n = Y_h.shape[0]
     Y_s = torch.zeros((n, k), dtype=Y_h.dtype, device=Y_h.device)
-    for i, j in enumerate(Y_h):
-        Y_s[i, j - 1] = 1.0
+    Y_s[torch.arange(n, device=Y_h.device), Y_h.long() - 1] = 1
     return Y_s
 
 
@@ -357,3 +469,31 @@ def place_on_gpu(data):
         return data.cuda()
     else:
         return ValueError(f"Data type {type(data)} not recognized.")
+
+
+def inference_mode():
+    """Returns a context manager disabling autograd for inference
+
+    Uses torch.inference_mode() where available (torch>=1.9), and otherwise
+    falls back to torch.no_grad()."""
+    if hasattr(torch, "inference_mode"):
+        return torch.inference_mode()
+    return torch.no_grad()
+
+
+def autocast(precision="fp32", device="cpu"):
+    """Returns a context manager running forward passes in the given precision
+
+    Args:
+        precision: 'fp32' (no autocasting) or 'bf16' (autocast eligible ops,
+            e.g. linear layers, convolutions, and LSTMs, to bfloat16; requires
+            torch>=1.10)
+        device: the device of the model ('cpu' or a cuda device)
+    """
+    if precision == "fp32":
+        return contextlib.nullcontext()
+    elif precision == "bf16":
+        device_type = "cpu" if device == "cpu" else "cuda"
+        return torch.autocast(device_type, dtype=torch.bfloat16)
+    else:
+        raise ValueError(f"Unrecognized precision: {precision}")
@@ -42,7 +42,7 @@ setuptools.setup(
     long_description=long_description,
     license="Apache License 2.0",
     packages=setuptools.find_packages(),
-    python_requires=">=3.6",
+    python_requires=">=3.7",
     install_requires=[
         "networkx>=2.2",
         "numpy",
@@ -53,13 +53,13 @@ setuptools.setup(
         "scikit-learn",
     ],
     include_package_data=True,
+    entry_points={"console_scripts": ["metal = metal.cli:main"]},
     keywords="machine-learning ai information-extraction weak-supervision mtl multitask multi-task-learning",
     classifiers=[
         "Intended Audience :: Science/Research",
         "Topic :: Scientific/Engineering :: Information Analysis",
         "License :: OSI Approved :: Apache Software License",
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.6",
         "Programming Language :: Python :: 3.7",
     ],
     project_urls={  # Optional
@@ -319,6 +319,32 @@ class LSTMTest(unittest.TestCase):
         # Clean up
         rmtree(tuner.log_rootdir)
 
+    def test_lstm_export_scripted(self):
+        """Confirm that the scripted module handles variable sequence lengths"""
+        X = torch.randint(1, MAX_INT + 1, (100, SEQ_LEN)).long()
+        for i in range(100):
+            X[i, np.random.randint(1, SEQ_LEN + 1) :] = 0
+
+        for lstm_reduction in ["mean", "max", "last", "attention"]:
+            lstm_module = LSTMModule(
+                4,
+                10,
+                verbose=False,
+                lstm_reduction=lstm_reduction,
+                encoder_class=EmbeddingsEncoder,
+                encoder_kwargs={"vocab_size": MAX_INT + 1},
+            )
+            em = EndModel(
+                k=MAX_INT,
+                input_module=lstm_module,
+                layer_out_dims=[20, MAX_INT],
+                seed=1,
+                verbose=False,
+            )
+            np.testing.assert_allclose(
+                em.export_scripted()(X).numpy(), em.predict_proba(X), rtol=1e-5
+            )
+
 
 if __name__ == "__main__":
     unittest.main()
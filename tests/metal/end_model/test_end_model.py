@@ -1,10 +1,18 @@
 import os
+import subprocess
+import sys
 import unittest
 
 import numpy as np
+import scipy.sparse as sparse
 import torch
 import torch.nn as nn
 
+try:
+    import torch.ao.nn.quantized.dynamic as nnqd
+except ImportError:
+    import torch.nn.quantized.dynamic as nnqd
+
 from metal.end_model import EndModel, LogisticRegression
 from metal.end_model.identity_module import IdentityModule
 from metal.metrics import METRICS
@@ -75,6 +83,29 @@ class EndModelTest(unittest.TestCase):
         score = em.score((Xs[2], Ys[2]), verbose=False)
         self.assertGreater(score, 0.95)
 
+    def test_bf16(self):
+        em = EndModel(
+            seed=1, layer_out_dims=[2, 10, 2], precision="bf16", verbose=False,
+        )
+        dtypes = set()
+        em.network[-1].register_forward_hook(
+            lambda module, input, output: dtypes.add(output.dtype)
+        )
+        Xs, Ys = self.single_problem
+        em.train_model(
+            (Xs[0], Ys[0]), valid_data=(Xs[1], Ys[1]), n_epochs=5, checkpoint=False
+        )
+        # The forward passes run in bf16, but the weights stay in fp32
+        self.assertEqual(dtypes, {torch.bfloat16})
+        self.assertEqual(em.network[-1].weight.dtype, torch.float32)
+        self.assertEqual(em.predict_proba(Xs[2]).dtype, np.float32)
+        score = em.score((Xs[2], Ys[2]), verbose=False)
+        self.assertGreater(score, 0.95)
+
+        with self.assertRaises(ValueError):
+            em.update_config({"precision": "fp8"})
+            em.predict_proba(Xs[2])
+
     def test_singletask_extras(self):
         """Test batchnorm and dropout"""
         em = EndModel(
@@ -118,6 +149,54 @@ class EndModelTest(unittest.TestCase):
         score = em.score((Xs[2], Ys[2]), verbose=False)
         self.assertGreater(score, 0.95)
 
+    def test_sparse_input(self):
+        """Test training and scoring directly on scipy.sparse inputs"""
+        Xs, Ys = self.single_problem
+        Xs = [sparse.csr_matrix(X.numpy()) for X in Xs]
+        em = EndModel(
+            seed=1,
+            batchnorm=False,
+            dropout=0.0,
+            layer_out_dims=[2, 10, 2],
+            verbose=False,
+        )
+        self.assertTrue(em._accepts_sparse_input())
+        em.train_model(
+            (Xs[0], Ys[0]), valid_data=(Xs[1], Ys[1]), n_epochs=5, checkpoint=False
+        )
+        score = em.score((Xs[2], Ys[2]), verbose=False)
+        self.assertGreater(score, 0.95)
+        np.testing.assert_allclose(
+            em.predict_proba(Xs[2]),
+            em.predict_proba(torch.from_numpy(Xs[2].toarray()).float()),
+            rtol=1e-5,
+        )
+
+    def test_sparse_input_custom_module(self):
+        """Test that scipy.sparse inputs are densified for a custom input module
+        which doesn't accept torch.sparse inputs"""
+        Xs, Ys = self.single_problem
+        Xs = [sparse.csr_matrix(X.numpy()) for X in Xs]
+        em = EndModel(
+            seed=1,
+            input_module=nn.Linear(2, 10),
+            batchnorm=False,
+            dropout=0.0,
+            layer_out_dims=[10, 2],
+            verbose=False,
+        )
+        self.assertFalse(em._accepts_sparse_input())
+        em.train_model(
+            (Xs[0], Ys[0]), valid_data=(Xs[1], Ys[1]), n_epochs=5, checkpoint=False
+        )
+        score = em.score((Xs[2], Ys[2]), verbose=False)
+        self.assertGreater(score, 0.95)
+        np.testing.assert_allclose(
+            em.predict_proba(Xs[2]),
+            em.predict_proba(torch.from_numpy(Xs[2].toarray()).float()),
+            rtol=1e-5,
+        )
+
     def test_scoring(self):
         """Test the metrics whole way through"""
         em = EndModel(
@@ -200,6 +279,83 @@ class EndModelTest(unittest.TestCase):
         # Clean up
         os.remove(SAVE_PATH)
 
+    def test_export_quantized(self):
+        em = EndModel(seed=1, layer_out_dims=[2, 200, 200, 2], verbose=False)
+        Xs, Ys = self.single_problem
+        em.train_model(
+            (Xs[0], Ys[0]), valid_data=(Xs[1], Ys[1]), n_epochs=5, checkpoint=False
+        )
+        SAVE_PATH = "test_save_model.pkl"
+        QUANTIZED_PATH = "test_save_model_int8.pkl"
+        em.save(SAVE_PATH)
+        em_q = em.export_quantized(QUANTIZED_PATH, (Xs[1], Ys[1]), tolerance=0.01)
+
+        # All linear layers (including the first, a SparseInputLinear) are
+        # quantized
+        layers = [m for m in em_q.modules() if isinstance(m, nn.Linear)]
+        self.assertEqual(len(layers), 0)
+        layers = [m for m in em_q.modules() if isinstance(m, nnqd.Linear)]
+        self.assertEqual(len(layers), 3)
+
+        # The quantized model is smaller and scores about the same
+        self.assertLess(os.path.getsize(QUANTIZED_PATH), os.path.getsize(SAVE_PATH) / 2)
+        em_2 = EndModel.load(QUANTIZED_PATH)
+        self.assertFalse(hasattr(em_2, "optimizer"))
+        score = em.score((Xs[2], Ys[2]), verbose=False)
+        score_2 = em_2.score((Xs[2], Ys[2]), verbose=False)
+        self.assertEqual(score_2, em_q.score((Xs[2], Ys[2]), verbose=False))
+        self.assertAlmostEqual(score, score_2, delta=0.02)
+
+        # If the score drops by more than the tolerance, nothing is saved
+        os.remove(QUANTIZED_PATH)
+        with self.assertRaises(ValueError):
+            em.export_quantized(QUANTIZED_PATH, (Xs[1], Ys[1]), tolerance=-1)
+        self.assertFalse(os.path.exists(QUANTIZED_PATH))
+
+        # Clean up
+        os.remove(SAVE_PATH)
+
+    def test_export_quantized_logreg(self):
+        em = EndModel(seed=1, layer_out_dims=[2, 2], verbose=False)
+        Xs, Ys = self.single_problem
+        em.train_model((Xs[0], Ys[0]), n_epochs=5, checkpoint=False)
+        QUANTIZED_PATH = "test_save_model_int8.pkl"
+        em_q = em.export_quantized(QUANTIZED_PATH, (Xs[1], Ys[1]), tolerance=1.0)
+        self.assertIsInstance(em_q.network[-1], nnqd.Linear)
+
+        # scipy.sparse inputs are densified for the quantized layer
+        X = sparse.csr_matrix(Xs[2].numpy())
+        np.testing.assert_allclose(
+            em_q.predict_proba(X), em_q.predict_proba(Xs[2]), rtol=1e-5
+        )
+        os.remove(QUANTIZED_PATH)
+
+    def test_export_scripted(self):
+        em = EndModel(seed=1, layer_out_dims=[2, 10, 2], verbose=False)
+        Xs, Ys = self.single_problem
+        em.train_model(
+            (Xs[0], Ys[0]), valid_data=(Xs[1], Ys[1]), n_epochs=3, checkpoint=False
+        )
+        SAVE_PATH = "test_save_model.pt"
+        scripted = em.export_scripted(SAVE_PATH)
+
+        # The softmax is included, and torch.sparse input is still supported
+        Y_s = em.predict_proba(Xs[2])
+        np.testing.assert_allclose(scripted(Xs[2]).numpy(), Y_s, rtol=1e-5)
+        np.testing.assert_allclose(scripted(Xs[2].to_sparse()).numpy(), Y_s, rtol=1e-5)
+
+        # The saved module can be loaded and run without importing metal
+        code = (
+            "import sys, torch; "
+            f"m = torch.jit.load({SAVE_PATH!r}); "
+            "print(m(torch.zeros(3, 2)).shape[1], 'metal' in sys.modules)"
+        )
+        output = subprocess.check_output([sys.executable, "-c", code], cwd=os.getcwd())
+        self.assertEqual(output.decode().split(), ["2", "False"])
+
+        # Clean up
+        os.remove(SAVE_PATH)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -82,6 +82,16 @@ class LossTest(unittest.TestCase):
             float(sce1(Y_ps, Y_s)) * 10, float(sce2(Y_ps, Y_s)), places=3
         )
 
+    def test_hard_labels(self):
+        Y = torch.tensor([1, 3, 2, 3], dtype=torch.long)
+        Y_s = pred_to_prob(Y, k=3).float()
+        Y_ps = torch.randn(4, 3)
+        weight = torch.tensor([1, 2, 3], dtype=torch.float)
+        for reduction in ["none", "mean", "sum"]:
+            for w in [None, weight]:
+                sce = SoftCrossEntropyLoss(weight=w, reduction=reduction)
+                self.assertTrue(torch.allclose(sce(Y_ps, Y), sce(Y_ps, Y_s)))
+
 
 if __name__ == "__main__":
     unittest.main()
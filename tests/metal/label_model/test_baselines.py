@@ -0,0 +1,92 @@
+import unittest
+
+import numpy as np
+import scipy.sparse as sparse
+import torch
+
+from metal.label_model.baselines import MajorityLabelVoter
+
+
+class BaselinesTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        np.random.seed(1)
+        cls.n = 500
+        cls.m = 7
+        cls.k = 3
+        L = np.random.randint(0, cls.k + 1, size=(cls.n, cls.m))
+        # Make some rows all abstains
+        L[:10] = 0
+        cls.L = L
+
+    def _reference_proba(self, L, k, lf_weights=None):
+        n, m = L.shape
+        w = np.ones(m) if lf_weights is None else lf_weights
+        Y_p = np.zeros((n, k))
+        for i in range(n):
+            counts = np.zeros(k)
+            for j in range(m):
+                if L[i, j]:
+                    counts[L[i, j] - 1] += w[j]
+            # Classes without votes can't win
+            voted = np.isin(np.arange(1, k + 1), L[i])
+            if voted.any():
+                counts[~voted] = -np.inf
+            Y_p[i, :] = np.where(counts == max(counts), 1, 0)
+        Y_p /= Y_p.sum(axis=1).reshape(-1, 1)
+        return Y_p
+
+    def test_majority_label_voter(self):
+        mv = MajorityLabelVoter(k=self.k, verbose=False)
+        target = self._reference_proba(self.L, self.k)
+        np.testing.assert_array_equal(mv.predict_proba(self.L), target)
+        np.testing.assert_array_equal(
+            mv.predict_proba(sparse.csr_matrix(self.L), chunk_size=64), target
+        )
+        np.testing.assert_array_equal(
+            mv.predict_proba(torch.from_numpy(self.L).float()), target
+        )
+
+        # All-abstain rows are uniform
+        np.testing.assert_array_equal(target[:10], np.ones((10, self.k)) / self.k)
+
+    def test_majority_label_voter_weights(self):
+        lf_weights = np.random.random(self.m)
+        target = self._reference_proba(self.L, self.k, lf_weights=lf_weights)
+
+        mv = MajorityLabelVoter(k=self.k, verbose=False)
+        Y_p = mv.predict_proba(
+            sparse.csr_matrix(self.L), lf_weights=lf_weights, chunk_size=100
+        )
+        np.testing.assert_array_equal(Y_p, target)
+
+        mv.train_model(lf_weights=lf_weights)
+        np.testing.assert_array_equal(mv.predict_proba(self.L), target)
+
+        with self.assertRaises(ValueError):
+            mv.predict_proba(self.L, lf_weights=np.ones(self.m + 1))
+
+    def test_majority_label_voter_negative_weights(self):
+        lf_weights = np.random.random(self.m) - 0.5
+        target = self._reference_proba(self.L, self.k, lf_weights=lf_weights)
+        mv = MajorityLabelVoter(k=self.k, verbose=False)
+        Y_p = mv.predict_proba(self.L, lf_weights=lf_weights, chunk_size=100)
+        np.testing.assert_array_equal(Y_p, target)
+
+        # A class without votes never beats the voted classes
+        L = np.array([[1, 2, 0]])
+        Y_p = mv.predict_proba(L, lf_weights=[-1.0, -2.0, 1.0])
+        np.testing.assert_array_equal(Y_p, [[1.0, 0.0, 0.0]])
+
+    def test_majority_label_voter_score(self):
+        Y = np.random.randint(1, self.k + 1, size=self.n)
+        L = self.L.copy()
+        L[:, 0] = Y
+        L[:, 1] = Y
+        mv = MajorityLabelVoter(k=self.k, verbose=False)
+        score = mv.score((sparse.csr_matrix(L), Y), verbose=False)
+        self.assertGreater(score, 0.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,6 @@
 import copy
 import os
+import tempfile
 import unittest
 from shutil import rmtree
 
@@ -49,6 +50,8 @@ class CheckpointerTest(unittest.TestCase):
             n_epochs=5,
             checkpoint=True,
             checkpoint_every=1,
+            # Keep the final model rather than restoring the best one
+            checkpoint_best=False,
         )
         test_model = copy.deepcopy(em.state_dict())
 
@@ -94,6 +97,70 @@ class CheckpointerTest(unittest.TestCase):
             model_path="checkpoints/model_checkpoint_2.pth",
         )
 
+    def test_checkpoint_keep(self):
+        """Confirm that only the most recent checkpoint_keep checkpoints are kept
+        and that the best model is restored (from memory) after training"""
+        em = EndModel(
+            seed=1,
+            batchnorm=False,
+            dropout=0.0,
+            layer_out_dims=[2, 10, 2],
+            verbose=False,
+        )
+        Xs, Ys = self.single_problem
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            em.train_model(
+                (Xs[0], Ys[0]),
+                valid_data=(Xs[1], Ys[1]),
+                n_epochs=6,
+                checkpoint=True,
+                checkpoint_dir=checkpoint_dir,
+                checkpoint_every=1,
+                checkpoint_keep=2,
+                lr=0.001,
+            )
+            self.assertEqual(
+                sorted(os.listdir(checkpoint_dir)),
+                ["best_model.pth", "model_checkpoint_5.pth", "model_checkpoint_6.pth"],
+            )
+            best_state = torch.load(os.path.join(checkpoint_dir, "best_model.pth"))
+        self.assertIsNone(em.checkpointer.best_state)
+        self.assertEqual(best_state["iteration"], em.checkpointer.best_iteration)
+        self.assertEqual(
+            em.score((Xs[1], Ys[1]), verbose=False), em.checkpointer.best_score
+        )
+
+    def test_early_stopping(self):
+        """Confirm that training stops once the checkpoint metric plateaus"""
+        em = EndModel(
+            seed=1,
+            batchnorm=False,
+            dropout=0.0,
+            layer_out_dims=[2, 10, 2],
+            verbose=False,
+        )
+        Xs, Ys = self.single_problem
+        with tempfile.TemporaryDirectory() as checkpoint_dir:
+            em.train_model(
+                (Xs[0], Ys[0]),
+                valid_data=(Xs[1], Ys[1]),
+                n_epochs=50,
+                checkpoint=True,
+                checkpoint_dir=checkpoint_dir,
+                # Require an unattainable improvement
+                early_stopping_patience=3,
+                early_stopping_min_delta=1.0,
+                keep_training_state=True,
+            )
+        # The first evaluation sets the reference score; three more without
+        # improvement stop training
+        self.assertEqual(em.logger.unit_total, 4)
+        # The kept training state is that of the last epoch, not the best one
+        self.assertEqual(em.training_state["iteration"], 3)
+        self.assertEqual(
+            em.score((Xs[1], Ys[1]), verbose=False), em.checkpointer.best_score
+        )
+
     def test_checkpoint_metric(self):
         """Confirm that a non-standard checkpoint_metric can be used"""
         pass
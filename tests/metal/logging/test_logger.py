@@ -1,8 +1,15 @@
+import tempfile
 import unittest
 
 import numpy as np
 import torch
 
+from metal.end_model import EndModel
+from metal.end_model.em_defaults import em_default_config
+from metal.logging import Logger
+from metal.logging.logger import OnlineStats
+from metal.metrics import metric_score
+
 
 class LoggerTest(unittest.TestCase):
     @classmethod
@@ -42,6 +49,150 @@ class LoggerTest(unittest.TestCase):
         """Confirm non-default train metrics can be passed"""
         pass
 
+    def test_online_train_metrics(self):
+        """Confirm train metrics are calculated from the stored training outputs"""
+        em = EndModel(seed=1, layer_out_dims=[2, 10, 2], verbose=False)
+        config = dict(em_default_config["train_config"]["logger_config"])
+        config["log_train_metrics"] = ["accuracy"]
+        logger = Logger(config, epoch_size=4, verbose=False)
+        self.assertTrue(logger.record_train_outputs)
+
+        # Probabilistic labels are scored against their most likely label
+        logger.add_train_batch(
+            em, torch.tensor([[2.0, 1.0], [1.0, 2.0]]), torch.tensor([1, 1])
+        )
+        logger.add_train_batch(
+            em,
+            torch.tensor([[2.0, 1.0], [1.0, 2.0]]),
+            torch.tensor([[0.9, 0.1], [0.2, 0.8]]),
+        )
+        metrics_dict = logger.calculate_metrics(em, None, None, {})
+        self.assertEqual(metrics_dict["train/accuracy"], 0.75)
+        self.assertIsNone(logger.train_stats)
+
+        # Training with online metrics leaves no hooks or outputs on the model
+        Xs, Ys = self.single_problem
+        em.train_model(
+            (Xs[0], Ys[0]),
+            valid_data=(Xs[1], Ys[1]),
+            n_epochs=2,
+            checkpoint=False,
+            log_train_metrics=["loss", "accuracy"],
+        )
+        self.assertFalse(em._forward_hooks)
+        self.assertIsNone(em._train_outputs)
+        self.assertGreater(em.score((Xs[2], Ys[2]), verbose=False), 0.9)
+
+    def test_online_stats(self):
+        """Confirm metrics from running statistics match metric_score()"""
+        rng = np.random.RandomState(1)
+        k = 3
+        stats = OnlineStats(k)
+        golds, preds, probs = [], [], []
+        for _ in range(5):
+            Y_s = rng.dirichlet(np.ones(k), size=100)
+            Y_p = Y_s.argmax(axis=1) + 1
+            Y_p[rng.rand(100) < 0.1] = 0
+            Y = rng.randint(0, k + 1, size=100)
+            stats.update(Y_p, Y, Y_s)
+            golds.append(Y)
+            preds.append(Y_p)
+            probs.append(Y_s)
+        gold, pred, prob = [np.concatenate(x) for x in [golds, preds, probs]]
+
+        for metric in ["accuracy", "coverage", "precision", "recall", "f1"]:
+            for ignore_in_gold in [[], [0]]:
+                self.assertAlmostEqual(
+                    stats.score(metric, ignore_in_gold=ignore_in_gold),
+                    metric_score(gold, pred, metric, ignore_in_gold=ignore_in_gold),
+                )
+        # roc-auc is approximated by binning the probabilities
+        self.assertAlmostEqual(
+            stats.score("roc-auc"),
+            metric_score(gold, pred, "roc-auc", probs=prob, ignore_in_gold=[0]),
+            places=2,
+        )
+
+    def test_valid_sample(self):
+        """Confirm intermediate valid metrics can be calculated on a subsample"""
+        Xs, Ys = self.single_problem
+        em = EndModel(seed=1, layer_out_dims=[2, 10, 2], verbose=False)
+        em.train_model(
+            (Xs[0], Ys[0]),
+            valid_data=(Xs[1], Ys[1]),
+            n_epochs=1,
+            checkpoint=False,
+            log_unit="batches",
+            log_train_every=10,
+            log_valid_every=10,
+            log_valid_sample_size=100,
+            log_valid_sample_stratify=True,
+        )
+        sample_loader = em.logger.valid_sample_loader
+        self.assertAlmostEqual(len(sample_loader.dataset), 100, delta=2)
+
+        # The first log after an epoch ends uses the full valid set...
+        valid_loader = em._create_data_loader((Xs[1], Ys[1]))
+        full_accuracy = em.score(valid_loader, verbose=False)
+        metrics_dict = em.logger.calculate_metrics(em, None, valid_loader, {})
+        self.assertNotIn("valid/accuracy_ci", metrics_dict)
+        self.assertEqual(metrics_dict["valid/accuracy"], full_accuracy)
+
+        # ...while later logs use the sample and report a confidence interval
+        metrics_dict = em.logger.calculate_metrics(em, None, valid_loader, {})
+        self.assertGreater(metrics_dict["valid/accuracy_ci"], 0)
+        self.assertLess(metrics_dict["valid/accuracy_ci"], 0.5)
+
+        # Candidate best checkpoints are scored on the full valid set
+        metrics_dict = em.logger.calculate_metrics(
+            em, None, valid_loader, {}, full_valid_check=lambda m: True
+        )
+        self.assertNotIn("valid/accuracy_ci", metrics_dict)
+        self.assertEqual(metrics_dict["valid/accuracy"], full_accuracy)
+
+    def test_async(self):
+        """Confirm that background metrics calculation matches the foreground"""
+        Xs, Ys = self.single_problem
+        models, best_states = [], []
+        for log_async in [False, True]:
+            em = EndModel(seed=1, layer_out_dims=[2, 10, 2], verbose=False)
+            with tempfile.TemporaryDirectory() as checkpoint_dir:
+                em.train_model(
+                    (Xs[0], Ys[0]),
+                    valid_data=(Xs[1], Ys[1]),
+                    n_epochs=2,
+                    checkpoint_dir=checkpoint_dir,
+                    log_unit="batches",
+                    log_train_every=5,
+                    log_valid_every=5,
+                    log_async=log_async,
+                    optimizer="adam",
+                )
+                best_states.append(torch.load(f"{checkpoint_dir}/best_model.pth"))
+            self.assertIsNone(em.evaluator)
+            models.append(em)
+
+        em_sync, em_async = models
+        self.assertEqual(
+            em_sync.checkpointer.best_iteration, em_async.checkpointer.best_iteration
+        )
+        self.assertEqual(
+            em_sync.checkpointer.best_score, em_async.checkpointer.best_score
+        )
+        np.testing.assert_array_equal(
+            em_sync.predict_proba(Xs[2]), em_async.predict_proba(Xs[2])
+        )
+
+        # The best checkpoint pairs its weights with the matching optimizer state
+        sync_state, async_state = best_states
+        self.assertEqual(sync_state["lr_scheduler"], async_state["lr_scheduler"])
+        sync_optimizer = sync_state["optimizer"]["state"]
+        async_optimizer = async_state["optimizer"]["state"]
+        self.assertEqual(sync_optimizer.keys(), async_optimizer.keys())
+        for i, param_state in sync_optimizer.items():
+            for key, value in param_state.items():
+                self.assertTrue(torch.equal(value, async_optimizer[i][key]))
+
     def test_valid_metrics(self):
         """Confirm non-default valid metrics can be passed"""
         pass
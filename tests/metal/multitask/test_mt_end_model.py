@@ -171,6 +171,21 @@ class MTEndModelTest(unittest.TestCase):
                     task_specific_scores_score_task_method[i],
                 )
 
+    def test_export_scripted(self):
+        """The scripted module executes the head graph, with softmax"""
+        em = MTEndModel(
+            layer_out_dims=[2, 8, 4],
+            task_graph=TaskGraph([2, 2], []),
+            seed=1,
+            verbose=False,
+            task_head_layers=[1, 2],
+        )
+        X = self.Xs[2]
+        Y_ps = em.export_scripted()(X)
+        self.assertEqual(len(Y_ps), 2)
+        for Y_p, Y_s in zip(Y_ps, em.predict_proba(X)):
+            np.testing.assert_allclose(Y_p.numpy(), Y_s, rtol=1e-5)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+
+import numpy as np
+import scipy.sparse as sparse
+import torch
+from torch.utils.data import DataLoader, TensorDataset
+
+from metal.end_model import EndModel
+from metal.label_model.baselines import MajorityLabelVoter
+
+
+class ClassifierTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.Y_s = np.array(
+            [[0.9, 0.1, 0.0], [0.4, 0.4, 0.2], [0.2, 0.4, 0.4], [1 / 3, 1 / 3, 1 / 3]]
+        )
+
+    def test_break_ties(self):
+        em = EndModel(seed=1, layer_out_dims=[2, 3], verbose=False)
+        Y_s = self.Y_s
+
+        self.assertEqual(list(em._break_ties(Y_s, "abstain")), [1, 0, 0, 0])
+        self.assertEqual(list(em._break_ties(Y_s, 3)), [1, 3, 3, 3])
+        with self.assertRaises(ValueError):
+            em._break_ties(Y_s, "foo")
+
+        # Random tie-breaking only selects among the tied labels...
+        Y_s = np.tile(Y_s, (100, 1))
+        Y_h = em._break_ties(Y_s, "random").reshape(100, 4)
+        self.assertTrue((Y_h[:, 0] == 1).all())
+        self.assertEqual(set(Y_h[:, 1]), {1, 2})
+        self.assertEqual(set(Y_h[:, 2]), {2, 3})
+        self.assertEqual(set(Y_h[:, 3]), {1, 2, 3})
+
+        # ...and is reproducible given the classifier's seed
+        em_2 = EndModel(seed=1, layer_out_dims=[2, 3], verbose=False)
+        Y_h_2 = em_2._break_ties(Y_s, "random").reshape(100, 4)
+        np.testing.assert_array_equal(Y_h, Y_h_2)
+
+    def test_get_predictions(self):
+        em = EndModel(seed=1, layer_out_dims=[2, 3], eval_batch_size=40, verbose=False)
+        X = torch.randn(100, 2)
+        Y = torch.randint(1, 4, (100,))
+
+        # Predictions are made in eval_batch_size batches without autograd
+        batches = []
+        em.register_forward_hook(
+            lambda module, input, output: batches.append(
+                (len(output), output.requires_grad)
+            )
+        )
+        Y_p, Y_gold, Y_s = em._get_predictions((X, Y), "abstain", return_probs=True)
+        self.assertEqual(batches, [(40, False), (40, False), (20, False)])
+
+        np.testing.assert_array_equal(Y_gold, Y.numpy())
+        np.testing.assert_allclose(Y_s, em.predict_proba(X), rtol=1e-6)
+        np.testing.assert_array_equal(Y_p, em._break_ties(Y_s, "abstain"))
+
+    def test_predict_stream(self):
+        em = EndModel(seed=1, layer_out_dims=[2, 3], verbose=False)
+        X = torch.randn(100, 2)
+        Y_s = em.predict_proba(X)
+
+        streams = [
+            em.predict_proba_stream(X, batch_size=30),
+            em.predict_proba_stream(X[i : i + 25] for i in range(0, 100, 25)),
+            em.predict_proba_stream(DataLoader(TensorDataset(X), batch_size=40)),
+        ]
+        for stream, n_batches in zip(streams, [4, 4, 3]):
+            batches = list(stream)
+            self.assertEqual(len(batches), n_batches)
+            np.testing.assert_allclose(np.vstack(batches), Y_s, rtol=1e-6)
+
+        batches = list(em.predict_stream(X, "abstain", return_probs=True))
+        Y_p = np.hstack([Y_pb for Y_pb, Y_sb in batches])
+        np.testing.assert_array_equal(Y_p, em._break_ties(Y_s, "abstain"))
+
+        # Label models stream over (sparse) label matrices
+        L = sparse.random(100, 5, density=0.5, format="csr", random_state=1)
+        L.data = np.random.RandomState(1).randint(1, 4, size=L.nnz).astype(float)
+        mv = MajorityLabelVoter(k=3, verbose=False)
+        batches = list(mv.predict_proba_stream(L, batch_size=30))
+        self.assertEqual(len(batches), 4)
+        np.testing.assert_array_equal(np.vstack(batches), mv.predict_proba(L))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+import io
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+
+import numpy as np
+import scipy.sparse as sparse
+
+from metal.cli import main
+from metal.label_model import MajorityLabelVoter
+from metal.metrics import metric_score
+
+
+class CLITest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        np.random.seed(1)
+        n, m, k = 1000, 5, 3
+        cls.Y = np.random.randint(1, k + 1, n)
+        # Each LF votes the gold label 70% of the time, and abstains or votes
+        # randomly otherwise
+        L = np.where(np.random.rand(n, m) < 0.7, cls.Y[:, None], 0)
+        noise = np.random.rand(n, m) < 0.2
+        L[noise] = np.random.randint(0, k + 1, noise.sum())
+        cls.L = L
+        cls.k = k
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.dir = self.tmp_dir.name
+        self.L_npz = self._path("L.npz")
+        self.L_npy = self._path("L.npy")
+        self.Y_npy = self._path("Y.npy")
+        sparse.save_npz(self.L_npz, sparse.csr_matrix(self.L))
+        np.save(self.L_npy, self.L)
+        np.save(self.Y_npy, self.Y)
+
+        self.model_path = self._path("model.metal")
+        main(
+            [
+                "fit-label-model",
+                self.L_npz,
+                "--k",
+                str(self.k),
+                "--model",
+                "majority-vote",
+                "--output",
+                self.model_path,
+            ]
+        )
+        self.Y_s = MajorityLabelVoter(k=self.k).predict_proba(self.L)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _path(self, name):
+        return os.path.join(self.dir, name)
+
+    def test_predict_npy(self):
+        output = self._path("Y_s.npy")
+        main(["predict", self.model_path, self.L_npz, "--output", output])
+        Y_s = np.load(output)
+        self.assertEqual(Y_s.dtype, np.float32)
+        np.testing.assert_allclose(Y_s, self.Y_s)
+
+        # The chunks of a .npz matrix are sent to the worker processes
+        main(
+            [
+                "predict",
+                self.model_path,
+                self.L_npz,
+                "--output",
+                output,
+                "--chunk-size",
+                "128",
+                "--n-jobs",
+                "2",
+            ]
+        )
+        np.testing.assert_allclose(np.load(output), self.Y_s)
+
+    def test_predict_stream(self):
+        # Chunked, in a pool of worker processes, from a memory-mapped matrix
+        output = self._path("Y_s.bin")
+        main(
+            [
+                "predict",
+                self.model_path,
+                self.L_npy,
+                "--output",
+                output,
+                "--dtype",
+                "float64",
+                "--chunk-size",
+                "128",
+                "--n-jobs",
+                "2",
+            ]
+        )
+        Y_s = np.fromfile(output, dtype="<f8").reshape(-1, self.k)
+        np.testing.assert_array_equal(Y_s, self.Y_s)
+
+    def test_score(self):
+        stdout = io.StringIO()
+        with redirect_stdout(stdout):
+            main(
+                [
+                    "score",
+                    self.model_path,
+                    self.L_npz,
+                    self.Y_npy,
+                    "--metric",
+                    "accuracy",
+                    "coverage",
+                    "--break-ties",
+                    "abstain",
+                    "--chunk-size",
+                    "300",
+                ]
+            )
+        model = MajorityLabelVoter(k=self.k)
+        Y_p = model.predict(self.L, break_ties="abstain")
+        accuracy = metric_score(self.Y, Y_p, "accuracy", ignore_in_gold=[0])
+        self.assertEqual(stdout.getvalue().splitlines()[0], f"accuracy: {accuracy:.4f}")
+        self.assertTrue(stdout.getvalue().splitlines()[1].startswith("coverage: "))
+
+    def test_lf_summary(self):
+        names = self._path("lf_names.txt")
+        with open(names, "w") as f:
+            f.write("\n".join(f"lf_{j}" for j in range(self.L.shape[1])))
+        output = self._path("summary.csv")
+        main(
+            [
+                "lf-summary",
+                self.L_npy,
+                "--Y",
+                self.Y_npy,
+                "--lf-names",
+                names,
+                "--output",
+                output,
+            ]
+        )
+        with open(output) as f:
+            lines = f.read().splitlines()
+        self.assertIn("Emp. Acc.", lines[0])
+        self.assertEqual(len(lines), self.L.shape[1] + 1)
+        self.assertTrue(lines[1].startswith("lf_0,"))
+
+    def test_bad_input(self):
+        with self.assertRaises(SystemExit):
+            with redirect_stdout(io.StringIO()):
+                main(["predict", self.model_path, self.L_npz])
+        with self.assertRaises(ValueError):
+            main(["lf-summary", self.Y_npy.replace(".npy", ".txt")])
+
+
+if __name__ == "__main__":
+    unittest.main()
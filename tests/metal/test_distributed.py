@@ -0,0 +1,103 @@
+import unittest
+from unittest import mock
+
+import torch
+
+from metal.contrib.baselines.sparse_logreg import SparseLogisticRegression
+from metal.end_model import EndModel
+from metal.multitask import MTEndModel, TaskGraph
+from metal.utils import TensorBatchLoader
+
+
+class DistributedTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        torch.manual_seed(1)
+        n = 1000
+        cls.X = torch.randn(n, 5)
+        cls.Y = (cls.X[:, 0] > 0).long() + 1
+        cls.n_train = 800
+
+    def test_shard_data_loader(self):
+        em = EndModel(seed=1, layer_out_dims=[5, 2], verbose=False)
+        loader = em._create_data_loader((self.X, self.Y), batch_size=64, shuffle=True)
+        self.assertIsInstance(loader, TensorBatchLoader)
+
+        # The shards of all processes are disjoint and cover the dataset
+        idxs = []
+        for rank in range(2):
+            with mock.patch.multiple(
+                "torch.distributed",
+                is_available=lambda: True,
+                get_world_size=lambda: 2,
+                get_rank=lambda: rank,
+            ):
+                shard = em._shard_data_loader(loader)
+            self.assertEqual(len(shard), 8)
+            X_shard = torch.cat([X for X, Y in shard])
+            idxs.extend((self.X == x).all(dim=1).nonzero().item() for x in X_shard)
+        self.assertEqual(sorted(idxs), list(range(len(self.X))))
+
+    def test_end_model(self):
+        em = EndModel(seed=1, layer_out_dims=[5, 10, 2], verbose=False)
+        em.train_model(
+            (self.X[: self.n_train], self.Y[: self.n_train]),
+            valid_data=(self.X[self.n_train :], self.Y[self.n_train :]),
+            n_epochs=5,
+            n_procs=2,
+            checkpoint=False,
+        )
+        score = em.score(
+            (self.X[self.n_train :], self.Y[self.n_train :]), verbose=False
+        )
+        self.assertGreater(score, 0.95)
+
+    def test_mt_end_model(self):
+        Ys = [self.Y, 3 - self.Y]
+        em = MTEndModel(
+            layer_out_dims=[5, 10, 2],
+            task_graph=TaskGraph([2, 2], []),
+            seed=1,
+            verbose=False,
+        )
+        em.train_model(
+            (self.X[: self.n_train], [Y[: self.n_train] for Y in Ys]),
+            valid_data=(self.X[self.n_train :], [Y[self.n_train :] for Y in Ys]),
+            n_epochs=5,
+            n_procs=2,
+            checkpoint=False,
+        )
+        score = em.score(
+            (self.X[self.n_train :], [Y[self.n_train :] for Y in Ys]),
+            reduce="mean",
+            verbose=False,
+        )
+        self.assertGreater(score, 0.95)
+
+    def test_hogwild(self):
+        # Sparse features: each example has up to 20 of 1000 feature indices,
+        # and the label is determined by whether feature 1 is present
+        F, N, S = 1000, 1000, 20
+        X = torch.randint(2, F, (N, S))
+        X[torch.rand(N, S) < 0.5] = 0
+        Y = torch.randint(1, 3, (N,))
+        X[:, 0] = torch.where(Y == 1, torch.ones(N).long(), X[:, 0])
+
+        em = SparseLogisticRegression(seed=1, input_dim=F, verbose=False)
+        em.train_model(
+            (X[:800], Y[:800]),
+            valid_data=(X[800:], Y[800:]),
+            n_epochs=5,
+            optimizer="sgd",
+            lr=0.1,
+            n_procs=2,
+            dist_config={"hogwild": True},
+            checkpoint=False,
+        )
+        self.assertEqual(float(em.network[-1].W.weight.data[0, :].abs().sum()), 0.0)
+        score = em.score((X[800:], Y[800:]), verbose=False)
+        self.assertGreater(score, 0.95)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import json
+import subprocess
+import sys
+import unittest
+
+
+def run_python(code):
+    """Runs code in a fresh interpreter and returns what it prints, as JSON"""
+    output = subprocess.check_output([sys.executable, "-c", code])
+    return json.loads(output)
+
+
+class ImportsTest(unittest.TestCase):
+    def test_import_metal(self):
+        # Importing metal does not import torch, any other heavy dependency, or
+        # the submodules that use them
+        modules = run_python(
+            "import sys, json\n"
+            "import metal\n"
+            "print(json.dumps(sorted(sys.modules)))"
+        )
+        for module in ["torch", "pandas", "sklearn", "networkx", "IPython"]:
+            self.assertNotIn(module, modules)
+        metal_modules = [m for m in modules if m.split(".")[0] == "metal"]
+        self.assertEqual(metal_modules, ["metal", "metal.lazy_imports"])
+
+    def test_optional_dependencies(self):
+        # The models only import the (optional) dependencies they use
+        modules = run_python(
+            "import sys, json\n"
+            "from metal import EndModel, MajorityLabelVoter\n"
+            "import metal.analysis\n"
+            "print(json.dumps(sorted(sys.modules)))"
+        )
+        self.assertIn("torch", modules)
+        for module in [
+            "pandas",
+            "sklearn",
+            "networkx",
+            "IPython",
+            "tensorboardX",
+            "matplotlib",
+        ]:
+            self.assertNotIn(module, modules)
+
+    def test_lazy_attributes(self):
+        import metal
+        import metal.multitask
+
+        self.assertIn("EndModel", dir(metal))
+        self.assertIs(metal.EndModel, metal.end_model.end_model.EndModel)
+        self.assertIs(metal.multitask.TaskGraph, metal.multitask.task_graph.TaskGraph)
+        with self.assertRaises(AttributeError):
+            metal.NotAModel
+
+        namespace = {}
+        exec("from metal.label_model import *", namespace)
+        self.assertIn("LabelModel", namespace)
+
+
+if __name__ == "__main__":
+    unittest.main()
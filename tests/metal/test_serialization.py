@@ -0,0 +1,131 @@
+import json
+import os
+import struct
+import unittest
+
+import numpy as np
+import scipy.sparse as sparse
+import torch
+
+from metal.contrib.modules import EmbeddingsEncoder, LSTMModule
+from metal.end_model import EndModel
+from metal.label_model import LabelModel
+from metal.label_model.baselines import MajorityLabelVoter
+from metal.serialization import MAGIC, is_model_file, load_model
+
+SAVE_PATH = "test_save_model.metal"
+
+
+class SerializationTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        torch.manual_seed(1)
+        np.random.seed(1)
+
+    def tearDown(self):
+        if os.path.exists(SAVE_PATH):
+            os.remove(SAVE_PATH)
+
+    def _header(self, path):
+        with open(path, "rb") as f:
+            f.read(len(MAGIC))
+            (nbytes,) = struct.unpack("<Q", f.read(8))
+            return json.loads(f.read(nbytes).decode())
+
+    def test_end_model(self):
+        X = torch.randn(100, 4)
+        Y = (X[:, 0] > 0).long() + 1
+        em = EndModel(seed=1, layer_out_dims=[4, 8, 2], verbose=False)
+        em.train_model((X, Y), n_epochs=2, checkpoint=False)
+        em.save(SAVE_PATH, format="metal")
+        self.assertTrue(is_model_file(SAVE_PATH))
+
+        # A stock EndModel is rebuilt from the class and config in the header,
+        # so no skeleton is pickled
+        header = self._header(SAVE_PATH)
+        self.assertEqual(header["class"], "metal.end_model.end_model.EndModel")
+        self.assertEqual(header["config"]["layer_out_dims"], [4, 8, 2])
+        self.assertEqual(header["architecture"], {})
+        self.assertEqual(header["skeleton_nbytes"], 0)
+        self.assertEqual(set(header["tensors"]), set(em.state_dict()))
+
+        # Loading does not reseed the global RNGs
+        torch.manual_seed(2)
+        expected = torch.rand(1)
+        torch.manual_seed(2)
+        em_2 = EndModel.load(SAVE_PATH)
+        self.assertTrue(torch.equal(torch.rand(1), expected))
+
+        # The training components are not saved
+        self.assertFalse(hasattr(em_2, "optimizer"))
+        self.assertEqual(em_2.seed, em.seed)
+        np.testing.assert_array_equal(em_2.predict_proba(X), em.predict_proba(X))
+
+        # The weights are memory-mapped copy-on-write, so the model can be
+        # trained further without modifying the file
+        em_2.train_model((X, Y), n_epochs=2, checkpoint=False)
+        em_3 = EndModel.load(SAVE_PATH, mmap=False)
+        np.testing.assert_array_equal(em_3.predict_proba(X), em.predict_proba(X))
+        self.assertFalse(np.array_equal(em_2.predict_proba(X), em.predict_proba(X)))
+
+    def test_embeddings(self):
+        lstm_module = LSTMModule(
+            8,
+            10,
+            verbose=False,
+            encoder_class=EmbeddingsEncoder,
+            encoder_kwargs={"vocab_size": 10000},
+        )
+        em = EndModel(
+            k=3, input_module=lstm_module, layer_out_dims=[20, 3], verbose=False
+        )
+        em.save(SAVE_PATH, format="metal")
+
+        # An EndModel with a custom input module falls back to a skeleton
+        header = self._header(SAVE_PATH)
+        self.assertIsNone(header["architecture"])
+        self.assertGreater(header["skeleton_nbytes"], 0)
+
+        em_2 = load_model(SAVE_PATH)
+        weight = em_2.network[0][0].encoder.embeddings.weight
+        self.assertTrue(torch.equal(weight, lstm_module.encoder.embeddings.weight))
+
+        X = torch.randint(1, 10000, (5, 7))
+        np.testing.assert_array_equal(em_2.predict_proba(X), em.predict_proba(X))
+
+    def test_label_model(self):
+        L = sparse.csr_matrix(np.random.randint(0, 3, size=(100, 5)))
+        lm = MajorityLabelVoter(k=2, seed=1, verbose=False)
+        lm.train_model(L, lf_weights=[1.0, 2.0, 1.0, 0.5, 1.0])
+        lm.save(SAVE_PATH, format="metal")
+        header = self._header(SAVE_PATH)
+        self.assertEqual(header["skeleton_nbytes"], 0)
+        lm_2 = MajorityLabelVoter.load(SAVE_PATH)
+        self.assertIsInstance(lm_2, MajorityLabelVoter)
+        self.assertEqual(lm_2.lf_weights, [1.0, 2.0, 1.0, 0.5, 1.0])
+        np.testing.assert_array_equal(lm_2.predict_proba(L), lm.predict_proba(L))
+
+    def test_untrained_label_model(self):
+        lm = LabelModel(k=3, seed=1, verbose=False)
+        lm.save(SAVE_PATH, format="metal")
+        header = self._header(SAVE_PATH)
+        self.assertEqual(header["architecture"], {"k": 3})
+        self.assertEqual(header["skeleton_nbytes"], 0)
+        lm_2 = LabelModel.load(SAVE_PATH)
+        self.assertEqual(lm_2.k, 3)
+        self.assertEqual(lm_2.config, lm.config)
+
+    def test_torch_format(self):
+        em = EndModel(seed=1, layer_out_dims=[4, 2], verbose=False)
+        em.save(SAVE_PATH)
+        self.assertFalse(is_model_file(SAVE_PATH))
+        em_2 = EndModel.load(SAVE_PATH, weights_only=False)
+        X = torch.randn(10, 4)
+        np.testing.assert_array_equal(em_2.predict_proba(X), em.predict_proba(X))
+
+        with self.assertRaises(ValueError):
+            em.save(SAVE_PATH, format="foo")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+import http.client
+import json
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+
+from metal.end_model import EndModel
+from metal.label_model.baselines import MajorityLabelVoter
+from metal.multitask import MTEndModel, TaskGraph
+from metal.serving import Histogram, PredictionServer
+
+
+def request(port, method, path, body=None):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    connection.request(method, path, body=None if body is None else json.dumps(body))
+    response = connection.getresponse()
+    result = response.status, json.loads(response.read())
+    connection.close()
+    return result
+
+
+class ServingTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        torch.manual_seed(1)
+        cls.X = torch.randn(40, 4)
+
+    def test_histogram(self):
+        hist = Histogram([1, 10])
+        for value in [0.5, 1, 5, 10, 20]:
+            hist.add(value)
+        self.assertEqual(hist.to_dict()["counts"], [2, 2, 1])
+        self.assertEqual(hist.to_dict()["count"], 5)
+
+    def test_micro_batching(self):
+        em = EndModel(seed=1, layer_out_dims=[4, 8, 3], verbose=False)
+        Y_s = em.predict_proba(self.X)
+        with PredictionServer(em, max_batch_size=64, max_latency_ms=200) as server:
+            # Concurrent requests are coalesced into micro-batches...
+            with ThreadPoolExecutor(max_workers=20) as pool:
+                responses = list(
+                    pool.map(
+                        lambda i: request(
+                            server.port,
+                            "POST",
+                            "/predict_proba",
+                            {"X": self.X[2 * i : 2 * i + 2].tolist()},
+                        ),
+                        range(20),
+                    )
+                )
+            status, metrics = request(server.port, "GET", "/metrics")
+
+        # ...and each gets its own rows of the predictions back
+        for i, (status, response) in enumerate(responses):
+            self.assertEqual(status, 200)
+            np.testing.assert_allclose(
+                response["Y_s"], Y_s[2 * i : 2 * i + 2], rtol=1e-5
+            )
+
+        self.assertEqual(metrics["requests"], 20)
+        self.assertLess(metrics["batches"], 20)
+        self.assertEqual(metrics["batch_size"]["sum"], 40)
+        self.assertEqual(metrics["latency_ms"]["count"], 20)
+
+    def test_max_batch_size(self):
+        em = EndModel(seed=1, layer_out_dims=[4, 3], verbose=False)
+        with PredictionServer(em, max_batch_size=4, max_latency_ms=1000) as server:
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                list(
+                    pool.map(
+                        lambda i: request(
+                            server.port, "POST", "/predict_proba", {"X": [[0.0] * 4]}
+                        ),
+                        range(8),
+                    )
+                )
+            # Full batches are sent off without waiting for max_latency_ms
+            counts = server.metrics()["batch_size"]["counts"]
+            self.assertEqual(sum(counts[3:]), 0)
+            latency = server.metrics()["latency_ms"]
+            self.assertLess(latency["sum"] / latency["count"], 1000)
+
+    def test_models(self):
+        # Label models take rows of L
+        L = np.random.RandomState(1).randint(0, 4, size=(10, 5))
+        mv = MajorityLabelVoter(k=3, verbose=False)
+        with PredictionServer(mv) as server:
+            status, response = request(
+                server.port, "POST", "/predict_proba", {"X": L.tolist()}
+            )
+        self.assertEqual(status, 200)
+        np.testing.assert_allclose(response["Y_s"], mv.predict_proba(L))
+
+        # Multitask models return a list of predictions per task
+        em = MTEndModel(
+            layer_out_dims=[4, 8], task_graph=TaskGraph([2, 3], []), verbose=False
+        )
+        with PredictionServer(em) as server:
+            status, response = request(
+                server.port, "POST", "/predict_proba", {"X": self.X[:3].tolist()}
+            )
+        self.assertEqual(status, 200)
+        for Y_p, Y_s in zip(response["Y_s"], em.predict_proba(self.X[:3])):
+            np.testing.assert_allclose(Y_p, Y_s, rtol=1e-5)
+
+    def test_errors(self):
+        em = EndModel(seed=1, layer_out_dims=[4, 3], verbose=False)
+        with PredictionServer(em, max_latency_ms=200) as server:
+            self.assertEqual(request(server.port, "GET", "/foo")[0], 404)
+            self.assertEqual(
+                request(server.port, "POST", "/predict_proba", {"Y": []})[0], 400
+            )
+            # A malformed request does not fail the others in its batch
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                bad, good = pool.map(
+                    lambda X: request(server.port, "POST", "/predict_proba", {"X": X}),
+                    [[[0.0] * 3], [[0.0] * 4]],
+                )
+        self.assertEqual(bad[0], 500)
+        self.assertEqual(good[0], 200)
+
+        # Retrying the requests of a failed batch separately doesn't count as
+        # more batches
+        metrics = server.metrics()
+        self.assertEqual(metrics["batch_size"]["sum"], 2)
+        self.assertEqual(metrics["batch_size"]["count"], metrics["batches"])
+
+    def test_preprocess(self):
+        em = EndModel(seed=1, layer_out_dims=[4, 3], verbose=False)
+        threads = []
+
+        def preprocess(rows):
+            threads.append(threading.current_thread())
+            return torch.tensor(rows, dtype=torch.float)
+
+        with PredictionServer(em, preprocess=preprocess) as server:
+            loop_thread = server.thread
+            status, response = request(
+                server.port, "POST", "/predict_proba", {"X": self.X[:3].tolist()}
+            )
+        self.assertEqual(status, 200)
+        np.testing.assert_allclose(
+            response["Y_s"], em.predict_proba(self.X[:3]), rtol=1e-5
+        )
+        # The rows are preprocessed on a worker thread, not the event loop's
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], loop_thread)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,7 +5,14 @@ import numpy as np
 import scipy.sparse as sparse
 import torch
 
-from metal.utils import pred_to_prob, rargmax, recursive_merge_dicts, split_data
+from metal.utils import (
+    MetalDataset,
+    TensorBatchLoader,
+    pred_to_prob,
+    rargmax,
+    recursive_merge_dicts,
+    split_data,
+)
 
 
 class UtilsTest(unittest.TestCase):
@@ -86,6 +93,27 @@ class UtilsTest(unittest.TestCase):
         Ws = split_data(W, splits=splits, shuffle=True, seed=123)
         self.assertEqual(Ws[0].shape, (3, 4))
 
+    def test_tensor_batch_loader(self):
+        X = torch.arange(10).view(5, 2)
+        Y = torch.tensor([1, 2, 1, 2, 1])
+        dataset = MetalDataset(X, Y)
+
+        loader = TensorBatchLoader(dataset, batch_size=2)
+        batches = list(loader)
+        self.assertEqual(len(loader), 3)
+        self.assertEqual(len(batches), 3)
+        self.assertTrue(torch.equal(batches[0][0], X[:2]))
+        self.assertTrue(torch.equal(batches[2][1], Y[4:]))
+        self.assertEqual(batches[0][0].dtype, torch.long)
+
+        loader = TensorBatchLoader(dataset, batch_size=2, shuffle=True, drop_last=True)
+        batches = list(loader)
+        self.assertEqual(len(batches), 2)
+        Xb = torch.cat([b[0] for b in batches])
+        Yb = torch.cat([b[1] for b in batches])
+        self.assertEqual(len(set(Xb[:, 0].tolist())), 4)
+        self.assertTrue(torch.equal(Y[Xb[:, 0] // 2], Yb))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,87 @@
+import json
+import unittest
+from collections import Counter
+from shutil import rmtree
+
+import torch
+
+from metal.end_model import EndModel
+from metal.tuners.asha_tuner import ASHATuner
+
+
+class ASHATunerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        torch.manual_seed(1)
+        X = torch.rand(600, 2) * 2 - 1
+        Y = (X[:, 0] > X[:, 1]).long() + 1
+        cls.train = (X[:400], Y[:400])
+        cls.valid = (X[400:], Y[400:])
+
+    def test_rung_epochs(self):
+        tuner = ASHATuner(None, min_epochs=1, max_epochs=27, reduction_factor=3)
+        self.assertEqual(tuner.rung_epochs, [1, 3, 9, 27])
+        tuner = ASHATuner(None, min_epochs=2, max_epochs=1000, reduction_factor=10)
+        self.assertEqual(tuner.rung_epochs, [2, 20, 200])
+        rmtree(tuner.log_rootdir)
+
+    def test_promotion(self):
+        tuner = ASHATuner(None, min_epochs=1, max_epochs=9, reduction_factor=2)
+        rmtree(tuner.log_rootdir)
+        tuner.trials = [{"a": i} for i in range(4)]
+        tuner.rungs = [[(0.5, 0), (0.9, 1), (0.7, 2)], [], []]
+        tuner.promoted = [set(), set(), set()]
+        configs = iter([{"a": 4}])
+
+        # The best of 3 trials is in the top half, and is promoted first
+        self.assertEqual(tuner._get_job(configs), (1, 1))
+        # Then no trial can be promoted, so a new one is sampled
+        self.assertEqual(tuner._get_job(configs), (4, 0))
+        self.assertEqual(tuner.trials[4], {"a": 4})
+        self.assertIsNone(tuner._get_job(configs))
+
+        # Once 4 trials are scored, the second best is promoted too; higher
+        # rungs are promoted from first
+        tuner.rungs[0].append((0.1, 4))
+        tuner.rungs[1] = [(0.8, 1), (0.6, 3)]
+        self.assertEqual(tuner._get_job(configs), (1, 2))
+        self.assertEqual(tuner._get_job(configs), (2, 1))
+
+    def test_search(self):
+        search_space = {"lr": {"range": [0.001, 0.1], "scale": "log"}}
+        for n_jobs in [1, 2]:
+            tuner = ASHATuner(
+                EndModel,
+                min_epochs=1,
+                max_epochs=4,
+                reduction_factor=2,
+                n_jobs=n_jobs,
+                seed=123,
+            )
+            model = tuner.search(
+                search_space,
+                self.valid,
+                init_kwargs={"layer_out_dims": [2, 10, 2], "verbose": False},
+                train_args=[self.train],
+                train_kwargs={"checkpoint": False},
+                max_search=8,
+                verbose=False,
+            )
+            self.assertGreater(model.score(self.valid, verbose=False), 0.8)
+
+            # All trials are scored in the first rung, and fewer in each next
+            # one (a trial is promoted if it is in the top half of its rung at
+            # the time, so more than half may be promoted eventually)
+            with open(tuner.report_path) as f:
+                report = json.load(f)
+            rung_sizes = Counter(int(x["idx"].split("_")[0]) for x in report)
+            self.assertEqual(rung_sizes[0], 8)
+            self.assertGreater(rung_sizes[0], rung_sizes[1])
+            self.assertGreater(rung_sizes[1], rung_sizes[2])
+            self.assertGreater(rung_sizes[2], 0)
+            self.assertEqual(tuner.best_score, max(x["score"] for x in report))
+            rmtree(tuner.log_rootdir)
+
+
+if __name__ == "__main__":
+    unittest.main()
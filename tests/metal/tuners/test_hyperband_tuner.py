@@ -1,5 +1,10 @@
 import unittest
+from shutil import rmtree
+from unittest import mock
 
+import torch
+
+from metal.end_model import EndModel
 from metal.tuners.hyperband_tuner import HyperbandTuner
 
 
@@ -32,6 +37,56 @@ class HyperbandTunerModelTunerTest(unittest.TestCase):
 
         self.assertEqual(hyperband_tuner.hyperband_schedule, expected_schedule)
 
+    def test_warm_start(self):
+        torch.manual_seed(1)
+        X = torch.rand(600, 2) * 2 - 1
+        Y = (X[:, 0] > X[:, 1]).long() + 1
+
+        search_space = {"lr": {"range": [0.001, 0.1], "scale": "log"}}
+        for warm_start in [False, True]:
+            tuner = HyperbandTuner(
+                EndModel,
+                hyperband_epochs_budget=40,
+                hyperband_proportion_discard=2,
+                hyperband_warm_start=warm_start,
+                seed=123,
+            )
+            # Count the epochs trained (_update_scheduler is called once per
+            # epoch)
+            with mock.patch.object(
+                EndModel,
+                "_update_scheduler",
+                autospec=True,
+                side_effect=EndModel._update_scheduler,
+            ) as update_scheduler:
+                model = tuner.search(
+                    search_space,
+                    (X[400:], Y[400:]),
+                    init_kwargs={"layer_out_dims": [2, 10, 2], "verbose": False},
+                    train_args=[(X[:400], Y[:400])],
+                    train_kwargs={"checkpoint": False},
+                    verbose=False,
+                )
+            self.assertGreater(model.score((X[400:], Y[400:]), verbose=False), 0.8)
+            rmtree(tuner.log_rootdir)
+
+            # Each trial (in every round of every bracket) has its own index
+            idxs = [stats["idx"] for stats in tuner.run_stats]
+            self.assertEqual(len(set(idxs)), len(idxs))
+
+            n_epochs = 0
+            for bracket in tuner.hyperband_schedule:
+                prev_r_i = 0
+                for n_i, r_i in bracket:
+                    n_epochs += n_i * (r_i - prev_r_i if warm_start else r_i)
+                    prev_r_i = r_i
+            self.assertEqual(update_scheduler.call_count, n_epochs)
+            if not warm_start:
+                cost = tuner.compute_schedule_cost(tuner.hyperband_schedule)
+                self.assertEqual(n_epochs, cost)
+            else:
+                self.assertLess(n_epochs, 0.9 * cost)
+
 
 if __name__ == "__main__":
     unittest.main()
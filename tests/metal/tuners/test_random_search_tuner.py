@@ -1,4 +1,5 @@
 import json
+import os
 import unittest
 from shutil import rmtree
 
@@ -120,6 +121,50 @@ class RandomSearchModelTunerTest(unittest.TestCase):
         # Clean up
         rmtree(tuner.log_rootdir)
 
+    def test_parallel_search(self):
+        Xs, Ys = self.single_problem
+        init_kwargs = {"layer_out_dims": [2, 10, 2], "verbose": False}
+        search_space = {"lr": {"range": [0.001, 0.1], "scale": "log"}}
+
+        # Each model gets a seed from the tuner seed and its index, so a
+        # search in a pool of processes finds the same models
+        results = []
+        for n_jobs in [1, 2]:
+            tuner = RandomSearchTuner(EndModel, seed=123, n_jobs=n_jobs)
+            model = tuner.search(
+                search_space,
+                (Xs[1], Ys[1]),
+                init_kwargs=init_kwargs,
+                train_args=[(Xs[0], Ys[0])],
+                train_kwargs={"n_epochs": 2, "checkpoint_every": 1},
+                max_search=4,
+                verbose=False,
+            )
+            self.assertEqual(len(tuner.run_stats), 4)
+            # Each model is checkpointed in its own directory
+            for idx in range(4):
+                checkpoint_dir = os.path.join(tuner.log_subdir, "checkpoints", str(idx))
+                self.assertEqual(
+                    sorted(os.listdir(checkpoint_dir)),
+                    [
+                        "best_model.pth",
+                        "model_checkpoint_1.pth",
+                        "model_checkpoint_2.pth",
+                    ],
+                )
+            results.append((tuner.run_stats, tuner.best_index, model))
+            rmtree(tuner.log_rootdir)
+
+        (stats_1, best_1, model_1), (stats_2, best_2, model_2) = results
+        self.assertEqual(
+            [x["search_params"] for x in stats_1], [x["search_params"] for x in stats_2]
+        )
+        self.assertEqual([x["score"] for x in stats_1], [x["score"] for x in stats_2])
+        self.assertEqual(best_1, best_2)
+        np.testing.assert_array_equal(
+            model_1.predict_proba(Xs[2]), model_2.predict_proba(Xs[2])
+        )
+
 
 if __name__ == "__main__":
     unittest.main()
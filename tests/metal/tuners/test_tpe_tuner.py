@@ -0,0 +1,85 @@
+import math
+import unittest
+from shutil import rmtree
+
+import numpy as np
+
+from metal.tuners.tpe_tuner import TPETuner, _ParzenEstimator
+
+
+class QuadraticModel(object):
+    """A stand-in for a model whose (validation) score peaks at lr=0.01,
+    momentum=0.9, and optimizer="adam" """
+
+    def __init__(self, lr=1.0, momentum=0.0, optimizer="sgd", **kwargs):
+        self.lr = lr
+        self.momentum = momentum
+        self.optimizer = optimizer
+
+    def train_model(self, *args, **kwargs):
+        pass
+
+    def score(self, *args, **kwargs):
+        return (
+            -((math.log10(self.lr) + 2) ** 2)
+            - (self.momentum - 0.9) ** 2
+            - (self.optimizer != "adam")
+        )
+
+
+class TPETunerTest(unittest.TestCase):
+    search_space = {
+        "lr": {"range": [1e-5, 1], "scale": "log"},
+        "momentum": {"range": [0.0, 1.0]},
+        "optimizer": ["sgd", "adam", "rmsprop"],
+        "n_epochs": 1,
+    }
+
+    def _search(self, **kwargs):
+        tuner = TPETuner(QuadraticModel, seed=123, **kwargs)
+        tuner.search(
+            self.search_space, None, max_search=40, verbose=False, shuffle=True
+        )
+        rmtree(tuner.log_rootdir)
+        return tuner
+
+    def test_parzen_estimator(self):
+        rand_state = np.random.RandomState(1)
+        l = _ParzenEstimator([0.2, 0.25, 0.3], 0.0, 1.0)
+        samples = l.sample(1000, rand_state)
+        self.assertTrue(((samples >= 0) & (samples <= 1)).all())
+        self.assertGreater(np.mean(np.abs(samples - 0.25) < 0.2), 0.5)
+
+        # The density integrates to 1
+        x = np.linspace(0, 1, 10001)
+        self.assertAlmostEqual(np.trapz(np.exp(l.log_pdf(x)), x), 1.0, places=3)
+
+        # With no observations, it is uniform
+        g = _ParzenEstimator([], 0.0, 1.0)
+        np.testing.assert_allclose(g.log_pdf([0.1, 0.9]), [0.0, 0.0])
+
+    def test_search(self):
+        tuner = self._search(n_startup=10)
+        self.assertEqual(len(tuner.run_stats), 40)
+        for x in tuner.run_stats:
+            self.assertTrue(1e-5 <= x["search_params"]["lr"] <= 1)
+            self.assertIn(x["search_params"]["optimizer"], ["sgd", "adam", "rmsprop"])
+        self.assertEqual(tuner.best_config["n_epochs"], 1)
+
+        # The proposals improve on the random startup configs
+        scores = [x["score"] for x in tuner.run_stats]
+        self.assertGreater(np.mean(scores[-10:]), np.mean(scores[:10]))
+
+    def test_parallel_proposals(self):
+        tuner = self._search(n_startup=10, n_jobs=4)
+        self.assertEqual(len(tuner.run_stats), 40)
+
+    def test_max_search(self):
+        tuner = TPETuner(QuadraticModel)
+        rmtree(tuner.log_rootdir)
+        with self.assertRaises(ValueError):
+            tuner.search(self.search_space, None)
+
+
+if __name__ == "__main__":
+    unittest.main()